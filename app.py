@@ -1,25 +1,47 @@
 #import statements
 from flask import Flask 
-from flask import request, jsonify 
-import uuid #this is for generating unique ids for receipts
-import re #for regex patterns
-import math #for rounding up
-from datetime import datetime
-from uuid import UUID
+from flask import request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+import os #for reading configuration from the environment
+from time import perf_counter_ns
+import fastjson #orjson when installed, the json module otherwise
+#the receipt logic lives in core.py (shared with the ASGI app), the store and scoring
+#function are imported here too for code that reaches them through this module
+from core import (receipts_details, points_calculator, validate_id, NDJSON_TYPES, parse_ndjson,
+                  process_receipt, process_batch, lookup_points, lookup_points_batch, lookup_breakdown,
+                  MAX_LINE, READ_CHUNK, read_lines, process_lines, request_metrics, render_metrics)
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
 
-#Create a Flask application instance which will act as our server 
-app = Flask(__name__)
+#json provider that decodes request bodies (request.get_json) and encodes jsonify responses
+#through fastjson, keeping Flask's error handling (415/400) and sorted, compact output
+class FastJSONProvider(DefaultJSONProvider):
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return fastjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self._app.debug or not isinstance(obj, dict):
+            return super().response(obj) #indented in debug mode, like before
+        return self._app.response_class(fastjson.encode_body(obj, sort_keys=True) + b"\n", mimetype=self.mimetype)
 
-#Our in-memory storage for receipts (python dictionary for key value pairs)
-receipts_details = dict()
+#Flask application that counts and times every request by route (its endpoint name) and status,
+#see metrics.py; for streamed responses the time is until the response starts
+class ReceiptApp(Flask):
+    def full_dispatch_request(self):
+        start = perf_counter_ns()
+        try:
+            response = super().full_dispatch_request()
+        except Exception:
+            request_metrics.request(request.endpoint or "unmatched", 500, perf_counter_ns() - start)
+            raise
+        request_metrics.request(request.endpoint or "unmatched", response.status_code, perf_counter_ns() - start)
+        return response
 
-#function to validate our unique id
-def validate_id(token):
-    try:
-        UUID(token, version=4)
-        return True
-    except ValueError:
-        return False
+#Create a Flask application instance which will act as our server 
+app = ReceiptApp(__name__)
+app.json = FastJSONProvider(app)
 
 #Defining the routes for our receipt processor
 #our home page on opening on any browser
@@ -35,98 +57,45 @@ def receipt_processor():
     stores receipt details, 
     returns id  """
 
+    timer = request_metrics.timer() #None unless stage timing is on
     receipt = request.get_json() #receive json receipt data
-    
-    if not receipt:
-        return jsonify({"error":"The receipt is invalid."}), 400
-    
-    #validation for all required fields
-    required = ["retailer","purchaseDate","purchaseTime","items","total"]
-    missing = [item for item in required if item not in receipt]
-    if missing:
-        return jsonify({"error":"The receipt is invalid."}), 400
-    
-    #validation for purchaseDate: YYYY-MM-DD
-    try:
-        datetime.strptime(receipt["purchaseDate"], "%Y-%m-%d")
-    except ValueError:
-        return jsonify({"error": "The receipt is invalid."}), 400
-    
-    #validation for purchaseTime: HH:MM (24hr format)
-    try:
-        datetime.strptime(receipt["purchaseTime"], "%H:%M")
-    except ValueError:
-        return jsonify({"error": "The receipt is invalid."}), 400
-    
-    #validation for total amount: 
-    if not re.match(r"^\d+\.\d{2}$", receipt["total"]):
-        return jsonify({"error": "The receipt is invalid."}), 400
-    
-    #validation for items:
-    if not isinstance(receipt["items"], list) or len(receipt["items"]) == 0:
-        return jsonify({"error": "The receipt is invalid."}), 400
-    
-    # Validation for every item in the item list:
-    for item in receipt["items"]:
-        if "shortDescription" not in item or "price" not in item:
-            return jsonify({"error": "The receipt is invalid."}), 400
-        if not isinstance(item["shortDescription"], str) or not item["shortDescription"].strip():
-            return jsonify({"error": "The receipt is invalid."}), 400
-        if not re.match(r"^\d+\.\d{2}$", item["price"]):
-            return jsonify({"error": "The receipt is invalid."}), 400
-    
-    receipt_id = str(uuid.uuid4()) #Generate a unique id
-    receipts_details[receipt_id] = receipt #Store the receipt in memory
-    return jsonify({"id": receipt_id}), 200
-
-#function to write the logic to follow rules for awarding points for a particular receipt
-def points_calculator(receipt):
-    points = 0
-
-    #Rule 1 : One point for every alphanumeric character in the retailer name.
-    retailerName = receipt.get("retailer","")
-    pattern = re.sub(r'[^a-zA-Z0-9]', '', retailerName)
-    points += len(pattern)
-
-    #Rule 2 : 50 points if the total is a round dollar amount with no cents.
-    amount = float(receipt.get("total","0"))
-    if amount.is_integer():
-        points += 50
-    
-    #Rule 3 : 25 points if the total is a multiple of 0.25.
-    if amount % 0.25 == 0:
-        points +=25
-    
-    #Rule 4 : 5 points for every two items on the receipt.
-    items = receipt.get("items", [])
-    two_item_count = (len(items) // 2)
-    points += (two_item_count * 5)
-
-    """Rule 5 : If the trimmed length of the item description is a multiple of 3, 
-    multiply the price by 0.2 and round up to the nearest integer. 
-    The result is the number of points earned."""
-    for item in items:
-        trimmed = item.get("shortDescription","").strip() #trimming the whitespaces
-        price = float(item.get("price","0"))
-        if len(trimmed) % 3 == 0:
-            points += math.ceil(price * 0.2) #used ceil since we are asked to round "up"
-    
-    #Rule 6 : 6 points if the day in the purchase date is odd.
-    date = receipt.get("purchaseDate","")
-    if date: 
-        day = int(date.split("-")[-1]) #extract the day from YYYY-MM-DD format 
-        if day % 2 == 1: #checking the odd day condition
-            points += 6 
-    
-    #Rule 7 : 10 points if the time of purchase is after 2:00pm and before 4:00pm.
-    time = receipt.get("purchaseTime", "")
-    if time:
-        hr, min = map(int, time.split(":")) #we extract the hour and minute
-        if 14 <= hr <=15:   #allows 2:00pm to 3:59pm
-            if not (hr==14 and min==0): #excluding 2:00pm and only consider if it is 2:01pm
-                points += 10
-    
-    return points
+    if timer is None:
+        body, status = process_receipt(receipt)
+        return jsonify(body), status
+    timer.lap("json_decode")
+    body, status = process_receipt(receipt, timer)
+    return timed_response("receipt_processor", timer, jsonify(body), status)
+
+#API to submit many receipts in one request (POST)
+@app.route('/receipts/process:batch', methods=['POST'])
+def receipt_batch_processor():
+    """ accepts a json array (or NDJSON body) of receipts,
+    validates and stores every receipt in one pass,
+    returns per-item ids or per-item errors in order """
+
+    body, status = process_batch(read_batch_body())
+    return jsonify(body), status
+
+#function to read the batch body as a list of receipts, None if the body is not usable
+def read_batch_body():
+    if request.mimetype in NDJSON_TYPES:
+        return parse_ndjson(request.get_data())
+
+    receipts = request.get_json(silent=True)
+    if not isinstance(receipts, list):
+        return None
+    return receipts
+
+#API to submit an NDJSON stream of receipts of any size (POST)
+@app.route('/receipts/process:stream', methods=['POST'])
+def receipt_stream_processor():
+    """ accepts an NDJSON body (plain or chunked), one receipt per line,
+    validates and stores each receipt as its line arrives,
+    streams back one NDJSON result line per receipt, in order """
+
+    #the body is read while the response is written, so neither is ever held in memory whole
+    lines = process_lines(read_lines(request.stream.read))
+    return app.response_class(stream_with_context(lines), mimetype="application/x-ndjson")
 
 #API to return points for a receipt (GET)
 @app.route('/receipts/<id>/points', methods=['GET'])
@@ -134,19 +103,57 @@ def get_points(id):
     """ Accepts receipt ID, 
     returns points earned for that receipt """
 
-    if not validate_id(id):  # Ensure valid UUID format
-        return jsonify({"error": "The receipt is invalid."}), 400
+    timer = request_metrics.timer() #None unless stage timing is on
+    if timer is None:
+        body, status = lookup_points(id)
+        return jsonify(body), status
+    body, status = lookup_points(id, timer)
+    return timed_response("get_points", timer, jsonify(body), status)
+
+#function to finish a request whose stages were timed: the json_encode stage is the response
+#just made, the stages are recorded and with stage timing "header" sent as Server-Timing
+def timed_response(route, timer, response, status):
+    timer.lap("json_encode")
+    request_metrics.stages(route, timer)
+    if request_metrics.stage_timing == "header":
+        response.headers["Server-Timing"] = timer.header()
+    return response, status
+
+#API to return the points each rule awarded a receipt (GET)
+@app.route('/receipts/<id>/points/breakdown', methods=['GET'])
+def get_points_breakdown(id):
+    """ Accepts receipt ID,
+    returns its points and the points of every rule, in rule order """
+
+    body, status = lookup_breakdown(id)
+    return jsonify(body), status
+
+#API to return points for many receipts at once (POST)
+@app.route('/receipts/points:batch', methods=['POST'])
+def get_points_batch():
+    """ accepts a json list of receipt IDs (or {"ids": [...]}),
+    returns a map of id -> points, not-found or invalid-id """
+
+    body, status = lookup_points_batch(request.get_json(silent=True))
+    return jsonify(body), status
+
+#API to expose the request metrics in the Prometheus text format (GET)
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """ returns request counts, error counts, latency and scoring time histograms
+    and the store size, for Prometheus to scrape """
+
+    return app.response_class(render_metrics(), content_type=METRICS_CONTENT_TYPE)
 
-    if id in receipts_details:
-        #temporarily returning 20 points till I come up with logic for all the rules
-        #return jsonify({"points": 20}), 200 
+#API to summarize the stage timings of receipt_processor and get_points (GET)
+@app.route('/metrics/stages', methods=['GET'])
+def metrics_stages():
+    """ returns, by route and stage, how many requests were timed and their mean,
+    p50 and p99 time in microseconds (empty while stage timing is off) """
 
-        points = points_calculator(receipts_details[id]) #awarding points based on rules
-        return jsonify({"points": points}), 200
-    
-    return jsonify({"error":"No receipt found for that ID."}), 404
+    return jsonify(request_metrics.stage_summary())
 
-#This is to run our receipt processor App
+#This is to run our receipt processor App with the development server
+#(for production use serve.py, which runs it under gunicorn)
 if __name__ == '__main__':
-    app.run(debug=True, host="0.0.0.0")
-    
\ No newline at end of file
+    app.run(debug=True, host="0.0.0.0", port=int(os.environ.get("PORT", "5000")))
@@ -0,0 +1,274 @@
+#ASGI version of the receipt API, served from an asyncio event loop
+#same routes, validation and points_calculator semantics as the Flask app in app.py: both are thin
+#http layers over core.py. run it with `python asgi.py` (uvicorn) or any ASGI server as asgi:app
+#
+#calls to the in-memory stores return in microseconds, so they run on the event loop; calls to a
+#store that can wait on disk or on other processes (see ReceiptStore.blocking_reads and
+#blocking_writes: sqlite, shm, indexed, fsync=always, snapshots) are moved to a worker thread
+import asyncio
+import os
+from time import perf_counter_ns
+
+import fastjson #orjson when installed, the json module otherwise
+from core import (receipts_details, NDJSON_TYPES, MAX_LINE, parse_ndjson, process_lines,
+                  process_receipt, process_batch, lookup_points, lookup_points_batch, lookup_breakdown,
+                  request_metrics, render_metrics)
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+JSON_HEADERS = [(b"content-type", b"application/json")]
+NDJSON_HEADERS = [(b"content-type", b"application/x-ndjson")]
+TEXT_HEADERS = [(b"content-type", b"text/html; charset=utf-8")]
+METRICS_HEADERS = [(b"content-type", METRICS_CONTENT_TYPE.encode())]
+
+#a blocking call on the event loop would stall every connection, so those go to a thread
+BLOCKING_READS = receipts_details.blocking_reads
+BLOCKING_WRITES = receipts_details.blocking_writes
+
+#content types request.get_json() accepts in the Flask app
+def is_json(mimetype):
+    return mimetype == "application/json" or (mimetype.startswith("application/") and mimetype.endswith("+json"))
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    #every request is counted and timed by route and status, like the Flask app (see metrics.py)
+    start = perf_counter_ns()
+    route, status = await handle(scope, receive, send)
+    request_metrics.request(route, status, perf_counter_ns() - start)
+
+#function to answer one http request, returns the route name (the Flask endpoint name) and the status
+async def handle(scope, receive, send):
+    method, path = scope["method"], scope["path"]
+
+    #our home page on opening on any browser
+    if path == "/":
+        if method != "GET":
+            return "unmatched", await respond(send, 405, {"error": "Method not allowed."})
+        return "home", await respond_text(send, 200, "Receipt Processor Application")
+
+    #API to return points for a receipt (GET)
+    if path.startswith("/receipts/") and path.endswith("/points") and path.count("/") == 3:
+        if method != "GET":
+            return "unmatched", await respond(send, 405, {"error": "Method not allowed."})
+        timer = request_metrics.timer() #None unless stage timing is on
+        body, status = await run_read(lookup_points, path[len("/receipts/"):-len("/points")], timer)
+        return "get_points", await respond_timed(send, status, body, "get_points", timer)
+
+    #API to return the points each rule awarded a receipt (GET)
+    if path.startswith("/receipts/") and path.endswith("/points/breakdown") and path.count("/") == 4:
+        if method != "GET":
+            return "unmatched", await respond(send, 405, {"error": "Method not allowed."})
+        body, status = await run_read(lookup_breakdown, path[len("/receipts/"):-len("/points/breakdown")])
+        return "get_points_breakdown", await respond(send, status, body)
+
+    #API to submit an NDJSON stream of receipts of any size (POST)
+    if path == "/receipts/process:stream":
+        if method != "POST":
+            return "unmatched", await respond(send, 405, {"error": "Method not allowed."})
+        await stream_receipts(receive, send)
+        return "receipt_stream_processor", 200
+
+    #API to expose the request metrics in the Prometheus text format (GET)
+    if path == "/metrics":
+        if method != "GET":
+            return "unmatched", await respond(send, 405, {"error": "Method not allowed."})
+        #the store size can be a query (sqlite), like any other store read
+        text = await asyncio.to_thread(render_metrics) if BLOCKING_READS else render_metrics()
+        payload = text.encode()
+        return "metrics", await send_response(send, 200, METRICS_HEADERS, payload)
+
+    #API to summarize the stage timings of receipt_processor and get_points (GET)
+    if path == "/metrics/stages":
+        if method != "GET":
+            return "unmatched", await respond(send, 405, {"error": "Method not allowed."})
+        return "metrics_stages", await respond(send, 200, request_metrics.stage_summary())
+
+    route = ROUTES.get(path)
+    if route is None:
+        return "unmatched", await respond(send, 404, {"error": "Not found."})
+    if method != "POST":
+        return "unmatched", await respond(send, 405, {"error": "Method not allowed."})
+
+    data = await read_body(receive)
+    result = await route(data, content_type(scope))
+    if isinstance(result, int):
+        return route.__name__, await respond_text(send, result, ERROR_PAGES[result]) #the same plain error pages as Flask
+    body, status, timer = result if len(result) == 3 else (*result, None) #a timed route adds its StageTimer
+    return route.__name__, await respond_timed(send, status, body, route.__name__, timer)
+
+#API to submit and process the receipt (POST)
+#like request.get_json() in the Flask app: a body that is not json is 415, malformed json is 400
+async def receipt_processor(data, mimetype):
+    if not is_json(mimetype):
+        return 415
+    timer = request_metrics.timer() #None unless stage timing is on
+    try:
+        receipt = fastjson.loads(data)
+    except ValueError:
+        return 400
+    if timer is None:
+        return await run_write(process_receipt, receipt)
+    timer.lap("json_decode")
+    return *(await run_write(process_receipt, receipt, timer)), timer
+
+#API to submit many receipts in one request, a json array or NDJSON body (POST)
+async def receipt_batch_processor(data, mimetype):
+    if mimetype in NDJSON_TYPES:
+        receipts = parse_ndjson(data)
+    else:
+        receipts = decode(data)
+        if not isinstance(receipts, list):
+            receipts = None
+    return await run_write(process_batch, receipts)
+
+#API to return points for many receipts at once (POST)
+async def get_points_batch(data, mimetype):
+    return await run_read(lookup_points_batch, decode(data))
+
+#the lines of each body chunk are stored and answered as the chunk arrives, so memory holds
+#one chunk (and at most one partial line) however large the body is
+async def stream_receipts(receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": NDJSON_HEADERS})
+    async for lines in body_lines(receive):
+        results = await run_write(process_chunk, lines)
+        if results:
+            await send({"type": "http.response.body", "body": results, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+#function to process the lines of one chunk, returns their result lines
+def process_chunk(lines):
+    return b"".join(process_lines(lines))
+
+#yields the complete lines of each body chunk (None for a line over MAX_LINE, like core.read_lines)
+async def body_lines(receive):
+    pending, size, skipping = [], 0, False
+    more = True
+    while more:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+        more = message.get("more_body", False)
+        pieces = message.get("body", b"").split(b"\n")
+        tail = pieces.pop() #after the last newline of the chunk, continued by the next chunk
+        lines = []
+        for piece in pieces:
+            if skipping:
+                skipping = False #end of a line already answered as too long
+            elif size + len(piece) >= MAX_LINE:
+                lines.append(None)
+            else:
+                pending.append(piece)
+                lines.append(b"".join(pending))
+            pending, size = [], 0
+        if not skipping:
+            pending.append(tail)
+            size += len(tail)
+            if size >= MAX_LINE:
+                lines.append(None)
+                pending, size, skipping = [], 0, True
+        if not more and size:
+            lines.append(b"".join(pending)) #last line without a newline
+        yield lines
+
+ROUTES = {
+    "/receipts/process": receipt_processor,
+    "/receipts/process:batch": receipt_batch_processor,
+    "/receipts/points:batch": get_points_batch,
+}
+
+#status pages for bodies the routes refuse before reaching core.py
+ERROR_PAGES = {
+    400: "<!doctype html>\n<html lang=en>\n<title>400 Bad Request</title>\n<h1>Bad Request</h1>\n"
+         "<p>The browser (or proxy) sent a request that this server could not understand.</p>\n",
+    415: "<!doctype html>\n<html lang=en>\n<title>415 Unsupported Media Type</title>\n<h1>Unsupported Media Type</h1>\n"
+         "<p>Did not attempt to load JSON data because the request Content-Type was not &#39;application/json&#39;.</p>\n",
+}
+
+async def run_write(function, *args):
+    if BLOCKING_WRITES:
+        return await asyncio.to_thread(function, *args)
+    return function(*args)
+
+async def run_read(function, *args):
+    if BLOCKING_READS:
+        return await asyncio.to_thread(function, *args)
+    return function(*args)
+
+#function to decode a json body, None if it is not json
+def decode(data):
+    try:
+        return fastjson.loads(data)
+    except ValueError:
+        return None
+
+def content_type(scope):
+    for name, value in scope.get("headers", ()):
+        if name == b"content-type":
+            return value.decode("latin-1").split(";")[0].strip().lower()
+    return ""
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+#the respond functions return the status they sent
+async def respond(send, status, body):
+    return await send_response(send, status, JSON_HEADERS, fastjson.encode_body(body))
+
+#function to respond to a request whose stages may have been timed (timer is None when not):
+#like the Flask app, json_encode is the body just encoded, the stages are recorded and with stage
+#timing "header" sent as Server-Timing
+async def respond_timed(send, status, body, route, timer):
+    if timer is None:
+        return await respond(send, status, body)
+    payload = fastjson.encode_body(body)
+    timer.lap("json_encode")
+    request_metrics.stages(route, timer)
+    headers = JSON_HEADERS
+    if request_metrics.stage_timing == "header":
+        headers = headers + [(b"server-timing", timer.header().encode())]
+    return await send_response(send, status, headers, payload)
+
+async def respond_text(send, status, text):
+    return await send_response(send, status, TEXT_HEADERS, text.encode())
+
+async def send_response(send, status, headers, payload):
+    await send({"type": "http.response.start", "status": status,
+                "headers": headers + [(b"content-length", str(len(payload)).encode())]})
+    await send({"type": "http.response.body", "body": payload})
+    return status
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            receipts_details.close() #flush and close a write-ahead log, if there is one
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+#serving with uvicorn, configured like serve.py (HOST, PORT, WEB_WORKERS, WEB_KEEPALIVE, WEB_BACKLOG)
+def main():
+    import uvicorn
+    uvicorn.run("asgi:app",
+                host=os.environ.get("HOST", "0.0.0.0"),
+                port=int(os.environ.get("PORT", "5000")),
+                workers=int(os.environ.get("WEB_WORKERS", "1")),
+                timeout_keep_alive=int(os.environ.get("WEB_KEEPALIVE", "5")),
+                backlog=int(os.environ.get("WEB_BACKLOG", "2048")),
+                access_log=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+""" concurrent-connection throughput and latency of the Flask app under gunicorn (serve.py)
+versus the ASGI app under uvicorn (asgi.py). an asyncio client keeps --connections keep-alive
+connections busy, each alternating a receipt POST with several points GETs.
+
+usage: python benchmarks/bench_asgi.py [--connections 64] [--seconds 10] [--threads 8] """
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from common import make_receipt, summary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+async def request(reader, writer, method, path, body=b""):
+    head = f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+    writer.write(head.encode() + body)
+    headers = await reader.readuntil(b"\r\n\r\n")
+    length = 0
+    for line in headers.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    return await reader.readexactly(length)
+
+async def connection(port, deadline, gets, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    receipt = json.dumps(make_receipt(5)).encode()
+    clock = time.perf_counter_ns
+    while time.perf_counter() < deadline:
+        start = clock()
+        receipt_id = json.loads(await request(reader, writer, "POST", "/receipts/process", receipt))["id"]
+        latencies.append((clock() - start) / 1000)
+        for _ in range(gets):
+            start = clock()
+            await request(reader, writer, "GET", f"/receipts/{receipt_id}/points")
+            latencies.append((clock() - start) / 1000)
+    writer.close()
+
+async def load(port, connections, seconds, gets):
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(connection(port, deadline, gets, latencies) for _ in range(connections)))
+    return latencies
+
+def wait_until_up(port):
+    import http.client
+    for _ in range(100):
+        try:
+            client = http.client.HTTPConnection("127.0.0.1", port)
+            client.request("GET", "/")
+            client.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+def run(name, script, env, args):
+    server = subprocess.Popen([sys.executable, script], cwd=ROOT, env=env, start_new_session=True,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(args.port)
+        latencies = asyncio.run(load(args.port, args.connections, args.seconds, args.gets))
+        print(f"{name:<22} {len(latencies) / args.seconds:9.0f} req/s   " + summary("", latencies).strip())
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--gets", type=int, default=4, help="points GETs per receipt POST")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--port", type=int, default=5098)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PORT=str(args.port), WEB_WORKERS="1", WEB_THREADS=str(args.threads))
+    print(f"{args.connections} concurrent keep-alive connections, {args.seconds:.0f}s")
+    run("flask + gunicorn", "serve.py", env, args)
+    run("asgi + uvicorn", "asgi.py", env, args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+""" per-id throughput of GET /receipts/<id>/points versus POST /receipts/points:batch.
+a quarter of the ids are unknown or malformed so every branch of the batch loop is hit.
+
+usage: python benchmarks/bench_batch_points.py [--ids 10000] """
+import argparse
+import random
+import time
+import uuid
+
+from common import make_receipt
+import app as receipt_app
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ids", type=int, default=10000)
+    args = parser.parse_args()
+
+    client = receipt_app.app.test_client()
+    rng = random.Random(1)
+    stored = args.ids * 3 // 4
+    receipts = [make_receipt(5, rng) for _ in range(stored)]
+    results = client.post("/receipts/process:batch", json=receipts).get_json()["results"]
+    ids = [result["id"] for result in results]
+    while len(ids) < args.ids:
+        ids.append(str(uuid.uuid4()) if len(ids) % 2 else "not-a-receipt-id")
+    rng.shuffle(ids)
+
+    start = time.perf_counter()
+    for receipt_id in ids:
+        client.get(f"/receipts/{receipt_id}/points")
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    client.post("/receipts/points:batch", json=ids)
+    batch = time.perf_counter() - start
+
+    print(f"{args.ids} ids ({stored} stored)")
+    print(f"single GET   {args.ids / single:12.0f} ids/s")
+    print(f"batch POST   {args.ids / batch:12.0f} ids/s")
+    print(f"speedup      {single / batch:12.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+""" per-receipt cost of POST /receipts/process versus POST /receipts/process:batch
+with a json array and with an NDJSON body.
+
+usage: python benchmarks/bench_batch_submit.py [--receipts 2000] [--items 5] """
+import argparse
+import json
+import random
+import time
+
+from common import make_receipt
+import app as receipt_app
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--receipts", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=5)
+    args = parser.parse_args()
+
+    client = receipt_app.app.test_client()
+    rng = random.Random(1)
+    receipts = [make_receipt(args.items, rng) for _ in range(args.receipts)]
+    ndjson = "\n".join(json.dumps(receipt) for receipt in receipts)
+
+    def single():
+        for receipt in receipts:
+            client.post("/receipts/process", json=receipt)
+
+    def batch_json():
+        client.post("/receipts/process:batch", json=receipts)
+
+    def batch_ndjson():
+        client.post("/receipts/process:batch", data=ndjson, content_type="application/x-ndjson")
+
+    print(f"{args.receipts} receipts, {args.items} items each")
+    for name, fn in (("single POST", single), ("batch json array", batch_json), ("batch NDJSON", batch_ndjson)):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<18} {elapsed * 1e6 / args.receipts:8.1f}us/receipt  {args.receipts / elapsed:10.0f} receipts/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+""" cost of explaining a receipt: GET /receipts/<id>/points/breakdown next to GET /receipts/<id>/points,
+and what keeping the breakdown at ingest costs.
+
+lookup : core.lookup_points and core.lookup_breakdown on a stored receipt (breakdown kept at ingest),
+         and lookup_breakdown on a receipt stored without one (rescored on every request)
+http   : both GETs through the Flask test client
+ingest : parse_and_score per receipt, and the memory of a stored record with and without its breakdown
+
+usage: python benchmarks/bench_breakdown.py [--items 5] [--requests 20000] """
+import argparse
+import json
+import random
+import sys
+
+from common import make_receipt, latencies, summary
+from decoder import parse_and_score
+from ids import format_id, new_key
+from records import ReceiptRecord
+import app as receipt_app
+import core
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    receipt = make_receipt(args.items, random.Random(1))
+    record, points, _ = parse_and_score(receipt)
+    kept, bare = new_key(), new_key()
+    core.receipts_details.put(kept, record, points)
+    core.receipts_details.put(bare, ReceiptRecord(*record.state()[:6]), points)
+    kept_id, bare_id = format_id(kept), format_id(bare)
+
+    print(f"{args.items} items, {args.requests} requests")
+    cases = [
+        ("lookup_points", lambda: core.lookup_points(kept_id)),
+        ("lookup_breakdown", lambda: core.lookup_breakdown(kept_id)),
+        ("lookup_breakdown (rescored)", lambda: core.lookup_breakdown(bare_id)),
+    ]
+    client = receipt_app.app.test_client()
+    cases += [
+        ("GET points", lambda: client.get(f"/receipts/{kept_id}/points")),
+        ("GET points/breakdown", lambda: client.get(f"/receipts/{kept_id}/points/breakdown")),
+    ]
+    for name, fn in cases:
+        latencies(fn, 500) #warm up
+        print(summary(name, latencies(fn, args.requests)))
+
+    body = json.dumps(receipt).encode()
+    print(summary("ingest parse_and_score", latencies(lambda: parse_and_score(json.loads(body)), args.requests)))
+    print(f"breakdown array: {sys.getsizeof(record.breakdown)} bytes per stored record")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+""" bulk rescoring throughput: points_calculator one dict at a time versus
+bulk_scoring.score_columns on prebuilt columns (and including the column build).
+
+usage: python benchmarks/bench_bulk_scoring.py [--receipts 200000] [--items 10] """
+import argparse
+import random
+import time
+
+import numpy as np
+
+from common import make_receipt
+from core import points_calculator
+from bulk_scoring import receipts_to_columns, score_columns
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--receipts", type=int, default=200000)
+    parser.add_argument("--items", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    receipts = [make_receipt(args.items, rng) for _ in range(args.receipts)]
+
+    start = time.perf_counter()
+    expected = [points_calculator(receipt) for receipt in receipts]
+    loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = [np.asarray(column, dtype=np.int64) for column in receipts_to_columns(receipts)]
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    points = score_columns(*columns)
+    vectorized = time.perf_counter() - start
+    assert points.tolist() == expected
+
+    n = args.receipts
+    print(f"{n} receipts, {args.items} items each")
+    print(f"points_calculator loop        {n / loop:14.0f} receipts/s")
+    print(f"score_columns (columns ready) {n / vectorized:14.0f} receipts/s")
+    print(f"column build + score_columns  {n / (build + vectorized):14.0f} receipts/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+""" CPU time per submitted receipt, from body bytes to the record and points that get stored:
+before : decode the body, validate_receipt, parse_receipt, score_cents (three walks of the receipt)
+after  : decode the body, parse_and_score (one walk)
+
+usage: python benchmarks/bench_decoder.py [--receipts 20000] [--items 1,5,50,500] """
+import argparse
+import json
+import random
+import time
+
+from common import make_receipt
+import fastjson
+from decoder import parse_and_score
+from scoring import parse_receipt, score_cents
+from validator import validate_receipt
+
+def before(body):
+    receipt = fastjson.loads(body)
+    if validate_receipt(receipt):
+        return None
+    record = parse_receipt(receipt)
+    return record, score_cents(record)
+
+def after(body):
+    record, points, errors = parse_and_score(fastjson.loads(body))
+    return None if errors else (record, points)
+
+def cpu_per_receipt(fn, bodies):
+    start = time.process_time()
+    for body in bodies:
+        fn(body)
+    return (time.process_time() - start) / len(bodies) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--receipts", type=int, default=20000)
+    parser.add_argument("--items", default="1,5,50,500")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    print("CPU us per receipt")
+    print(f"{'items':>6} {'before':>10} {'after':>10} {'saved':>10} {'saved %':>8}")
+    for items in (int(value) for value in args.items.split(",")):
+        count = max(200, args.receipts // max(1, items // 5))
+        bodies = [json.dumps(make_receipt(items, rng)).encode() for _ in range(min(count, 1000))]
+        bodies = [bodies[index % len(bodies)] for index in range(count)]
+        assert all(before(body) == after(body) for body in bodies[:100])
+        cpu_per_receipt(before, bodies[:100]) #warm up
+        old, new = cpu_per_receipt(before, bodies), cpu_per_receipt(after, bodies)
+        print(f"{items:>6} {old:10.2f} {new:10.2f} {old - new:10.2f} {(old - new) / old * 100:7.1f}%")
+
+if __name__ == '__main__':
+    main()
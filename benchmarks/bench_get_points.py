@@ -0,0 +1,45 @@
+""" GET /receipts/<id>/points latency under a hot-key workload:
+the same receipt is polled over and over, like our mobile clients do.
+
+before : every request rescoring the raw receipt dict with points_calculator
+         (the receipt is stored unparsed and its cached points are dropped first)
+after  : points scored once at submission, every request is a dictionary lookup
+
+usage: python benchmarks/bench_get_points.py [--items 50] [--requests 5000] """
+import argparse
+import random
+
+from common import make_receipt, latencies, summary
+from ids import parse_id
+import app as receipt_app
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    client = receipt_app.app.test_client()
+    receipt = make_receipt(args.items, random.Random(1))
+    receipt_id = client.post("/receipts/process", json=receipt).get_json()["id"]
+    url = f"/receipts/{receipt_id}/points"
+    key = parse_id(receipt_id)
+    stored = receipt_app.receipts_details.get(key)
+
+    def before():
+        receipt_app.receipts_details.put(key, receipt, None)
+        client.get(url)
+
+    def after():
+        receipt_app.receipts_details.put(key, stored.receipt, stored.points)
+        client.get(url)
+
+    for fn in (before, after): #warm up
+        latencies(fn, 200)
+
+    print(f"hot key, {args.items} items, {args.requests} requests")
+    print(summary("before (rescore per GET)", latencies(before, args.requests)))
+    print(summary("after (cached at ingest)", latencies(after, args.requests)))
+
+if __name__ == '__main__':
+    main()
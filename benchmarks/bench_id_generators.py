@@ -0,0 +1,51 @@
+""" receipt ids per second from each id generator, on one thread and spread over threads.
+str(uuid4()) is what store_receipt did before ids were ints, for reference.
+
+usage: python benchmarks/bench_id_generators.py [--ids 500000] [--threads 1,4] """
+import argparse
+import threading
+import time
+import uuid
+
+import common #noqa: F401, puts the repo root on the path
+from ids import create_id_generator
+
+GENERATORS = {
+    "str(uuid4())": lambda: str(uuid.uuid4()),
+    "uuid4": create_id_generator("uuid4"),
+    "buffered": create_id_generator("buffered"),
+    "uuid7": create_id_generator("uuid7"),
+}
+
+def run(generator, threads, count):
+    per_thread = count // threads
+    barrier = threading.Barrier(threads + 1)
+    def work():
+        barrier.wait()
+        for _ in range(per_thread):
+            generator()
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ids", type=int, default=500_000)
+    parser.add_argument("--threads", default="1,4")
+    args = parser.parse_args()
+
+    thread_counts = [int(value) for value in args.threads.split(",")]
+    print(f"{args.ids} ids, ids/s")
+    print(f"{'generator':<14}" + "".join(f"{f'{threads} threads':>14}" for threads in thread_counts))
+    for name, generator in GENERATORS.items():
+        run(generator, 1, 10000) #warm up
+        rates = [run(generator, threads, args.ids) for threads in thread_counts]
+        print(f"{name:<14}" + "".join(f"{rate:14.0f}" for rate in rates))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+""" receipt ids as uuid strings versus 128-bit ints.
+memory : bytes per million stored receipts taken by the keys and the dict that holds them,
+         measured with tracemalloc (the receipts themselves are the same either way)
+lookup : validate the id of a GET /receipts/<id>/points and look it up in the store, the
+         way core.lookup_points did before (UUID() + str key) and does now (parse_id + int key)
+
+usage: python benchmarks/bench_ids.py [--receipts 1000000] [--lookups 200000] """
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from uuid import UUID
+
+from common import make_receipt
+from ids import new_key, parse_id, format_id
+from scoring import parse_receipt
+from storage import StoredReceipt
+
+#function to measure the memory of a dict from make_key(text) to stored for every id text
+def measure(texts, make_key, stored):
+    gc.collect()
+    tracemalloc.start()
+    receipts = {make_key(text): stored for text in texts}
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del receipts
+    return size
+
+#function for the old lookup path: validate with a UUID object, look up the string
+def before(receipts, receipt_id):
+    try:
+        UUID(receipt_id, version=4)
+    except ValueError:
+        return None
+    return receipts.get(receipt_id)
+
+#function for the new lookup path: parse once, look up the int
+def after(receipts, receipt_id):
+    key = parse_id(receipt_id)
+    if key is None:
+        return None
+    return receipts.get(key)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--receipts", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    args = parser.parse_args()
+
+    stored = StoredReceipt(parse_receipt(make_receipt(5, random.Random(1))), 28)
+    keys = [new_key() for _ in range(args.receipts)]
+    texts = [format_id(key) for key in keys]
+    #keys are made inside the measurement: a fresh copy of every id string, or the parsed int
+    strings = measure(texts, lambda text: "".join(text), stored)
+    ints = measure(texts, parse_id, stored)
+    per_million = 1_000_000 / args.receipts
+    print(f"{args.receipts} receipts, MB per million receipts (keys + dict)")
+    print(f"{'uuid string keys':<20} {strings * per_million / 1e6:8.1f}")
+    print(f"{'int keys':<20} {ints * per_million / 1e6:8.1f}")
+    print(f"{'saved':<20} {(strings - ints) * per_million / 1e6:8.1f}")
+
+    sample = keys[:args.lookups // 2]
+    ids = [format_id(key) for key in sample] + [format_id(new_key()) for _ in sample] #half hits, half misses
+    random.Random(1).shuffle(ids)
+    by_string = {format_id(key): stored for key in sample}
+    by_int = {key: stored for key in sample}
+    print(f"\nvalidate_id + lookup, {len(ids)} ids (half misses), ns per id")
+    results = {}
+    for name, lookup, receipts in (("before (UUID + str)", before, by_string), ("after (parse_id + int)", after, by_int)):
+        start = time.perf_counter()
+        for receipt_id in ids:
+            lookup(receipts, receipt_id)
+        results[name] = (time.perf_counter() - start) / len(ids) * 1e9
+        print(f"{name:<24} {results[name]:8.0f}")
+    first, second = results.values()
+    print(f"{'speedup':<24} {first / second:8.2f}x")
+
+if __name__ == '__main__':
+    main()
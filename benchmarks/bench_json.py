@@ -0,0 +1,61 @@
+""" json decode and encode cost of POST /receipts/process on 1-item and 500-item receipts.
+
+codec : decoding the request body and encoding the {"id": ...} response,
+        json module (what request.get_json and jsonify did) versus fastjson
+flask : the whole request through the Flask test client, with the app's json provider
+        switched between Flask's default one and FastJSONProvider
+
+usage: python benchmarks/bench_json.py [--requests 2000] [--items 1,500] """
+import argparse
+import json
+import random
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+from common import make_receipt
+import fastjson
+import app as receipt_app
+
+def per_call(fn, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - start) / count * 1e6
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--items", default="1,500")
+    args = parser.parse_args()
+
+    if fastjson.orjson is None:
+        print("orjson is not installed: fastjson falls back to the json module")
+    flask_app = receipt_app.app
+    client = flask_app.test_client()
+    providers = {"json module": DefaultJSONProvider(flask_app), "fastjson": receipt_app.FastJSONProvider(flask_app)}
+    response = {"id": "adb6b560-0eef-42bc-9d16-df48f30e89b2"}
+    print(f"{args.requests} requests per case, us per request")
+    print(f"{'items':>6} {'case':<8} {'json module':>12} {'fastjson':>12} {'speedup':>8}")
+    for items in (int(value) for value in args.items.split(",")):
+        body = json.dumps(make_receipt(items, random.Random(1))).encode()
+        codec = {
+            "json module": lambda: (json.loads(body), json.dumps(response, separators=(",", ":"), sort_keys=True)),
+            "fastjson": lambda: (fastjson.loads(body), fastjson.encode_body(response, sort_keys=True)),
+        }
+        timings = {name: per_call(fn, args.requests) for name, fn in codec.items()}
+        print(f"{items:>6} {'codec':<8} {timings['json module']:12.1f} {timings['fastjson']:12.1f} "
+              f"{timings['json module'] / timings['fastjson']:7.2f}x")
+
+        timings = {}
+        for name, provider in providers.items():
+            flask_app.json = provider
+            post = lambda: client.post("/receipts/process", data=body, content_type="application/json")
+            per_call(post, 100) #warm up
+            timings[name] = per_call(post, args.requests)
+        print(f"{items:>6} {'flask':<8} {timings['json module']:12.1f} {timings['fastjson']:12.1f} "
+              f"{timings['json module'] / timings['fastjson']:7.2f}x")
+    flask_app.json = providers["fastjson"]
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+""" bytes per stored receipt: the raw json receipt dict the app used to keep, the integer-cents
+namedtuple that came after it, and the compact ReceiptRecord, measured with tracemalloc.
+every receipt is decoded from its own json text so nothing is shared by accident.
+
+usage: python benchmarks/bench_memory.py [--receipts 1000000] [--items 5] """
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+from collections import namedtuple
+
+from common import make_receipt
+from scoring import parse_receipt, to_cents
+
+ParsedReceipt = namedtuple("ParsedReceipt", ["retailer", "purchaseDate", "purchaseTime", "total_cents", "items"])
+
+def as_namedtuple(receipt):
+    return ParsedReceipt(receipt["retailer"], receipt["purchaseDate"], receipt["purchaseTime"], to_cents(receipt["total"]),
+                         tuple((item["shortDescription"], to_cents(item["price"])) for item in receipt["items"]))
+
+def measure(texts, convert):
+    gc.collect()
+    tracemalloc.start()
+    kept = [convert(json.loads(text)) for text in texts]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size / len(texts)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--receipts", type=int, default=1_000_000)
+    parser.add_argument("--items", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    templates = [json.dumps(make_receipt(args.items, rng)) for _ in range(1000)]
+    texts = [templates[index % len(templates)] for index in range(args.receipts)]
+
+    print(f"{args.receipts} receipts, {args.items} items each, bytes per receipt")
+    for name, convert in (("raw json dict", lambda receipt: receipt),
+                          ("integer-cents namedtuple", as_namedtuple),
+                          ("ReceiptRecord", parse_receipt)):
+        print(f"{name:<26} {measure(texts, convert):10.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+""" cost of the request metrics (metrics.py): nanoseconds per recorded request, and what the
+instrumentation adds to a whole request.
+
+record : Metrics.request and Metrics.scoring per call, from 1 thread and from 8 threads at once,
+         next to the same counting done in shared dicts under one lock; the cost of calling an
+         empty function the same way is subtracted
+flask  : GET /receipts/<id>/points through the Flask test client with ReceiptApp (which records
+         every request) and with plain Flask dispatching
+
+usage: python benchmarks/bench_metrics.py [--calls 200000] [--requests 20000] """
+import argparse
+import random
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Flask
+
+from common import make_receipt, latencies
+from metrics import Metrics, LATENCY_BUCKETS, nanoseconds
+import app as receipt_app
+
+#the same numbers kept the usual way: shared dicts, one lock around every update
+class LockedMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.latency = {}
+        self.bounds = nanoseconds(LATENCY_BUCKETS)
+
+    def request(self, route, status, duration):
+        with self.lock:
+            self.requests[(route, status)] = self.requests.get((route, status), 0) + 1
+            histogram = self.latency.setdefault(route, [0] * (len(self.bounds) + 2))
+            histogram[bisect_left(self.bounds, duration)] += 1
+            histogram[-1] += duration
+
+def noop(route, status, duration):
+    pass
+
+#function to time calls of fn(route, status, duration) from threads at once, in ns per call
+def per_call(fn, calls, threads):
+    durations = [random.randrange(10_000, 5_000_000) for _ in range(1024)]
+    def work():
+        for index in range(calls // threads):
+            fn("get_points", 200, durations[index & 1023])
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter_ns()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter_ns() - start) / calls
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    print("ns per recorded request")
+    print(f"{'threads':>8} {'Metrics':>10} {'locked':>10}")
+    for threads in (1, 8):
+        empty = min(per_call(noop, args.calls, threads) for _ in range(3))
+        sharded = min(per_call(Metrics().request, args.calls, threads) for _ in range(3)) - empty
+        locked = min(per_call(LockedMetrics().request, args.calls, threads) for _ in range(3)) - empty
+        print(f"{threads:>8} {sharded:10.0f} {locked:10.0f}")
+    metrics = Metrics()
+    empty = per_call(noop, args.calls, 1)
+    scoring = per_call(lambda route, status, duration: metrics.scoring(duration), args.calls, 1)
+    print(f"Metrics.scoring: {scoring - empty:.0f} ns per call")
+
+    flask_app = receipt_app.app
+    client = flask_app.test_client()
+    receipt_id = client.post("/receipts/process", json=make_receipt(5, random.Random(1))).get_json()["id"]
+    url = f"/receipts/{receipt_id}/points"
+    latencies(lambda: client.get(url), 1000) #warm up
+    results = {"with metrics": [], "without": []}
+    for _ in range(5): #alternating rounds, the best median of each
+        for name in results:
+            if name == "without":
+                flask_app.full_dispatch_request = Flask.full_dispatch_request.__get__(flask_app)
+            samples = sorted(latencies(lambda: client.get(url), args.requests // 5))
+            results[name].append(samples[len(samples) // 2])
+            flask_app.__dict__.pop("full_dispatch_request", None)
+    best = {name: min(values) for name, values in results.items()}
+    print(f"GET points p50: with metrics {best['with metrics']:.1f}us, without {best['without']:.1f}us, "
+          f"added {best['with metrics'] - best['without']:.1f}us (clock reads, request.endpoint and Metrics.request)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+""" lookups/s of the on-disk points index at a large number of entries (50 million by default),
+for ids that are in the index and ids that are not. the index is filled with synthetic
+entries (random ids, made-up log offsets), so no receipt log of that size is needed.
+
+usage: python benchmarks/bench_points_index.py [--entries 50000000] [--lookups 1000000] [--directory DIR] """
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import common #puts the repo root on sys.path
+from points_index import MAX_LOAD, SLOT, PointsIndex
+
+def rate(n, fn):
+    start = time.perf_counter()
+    fn()
+    return n / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=50000000)
+    parser.add_argument("--lookups", type=int, default=1000000)
+    parser.add_argument("--directory", default=None, help="where to put the index file (default a temp dir)")
+    args = parser.parse_args()
+
+    capacity = 2
+    while capacity * MAX_LOAD < args.entries:
+        capacity *= 2
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        index = PointsIndex(os.path.join(directory, "bench.index"), capacity)
+        every = max(1, args.entries // args.lookups)
+        sample = []
+        start = time.perf_counter()
+        put, urandom = index.put, os.urandom
+        for number in range(args.entries):
+            key = urandom(16)
+            put(key, number * 200, 200, number & 0xFFF)
+            if number % every == 0:
+                sample.append(key)
+        build = time.perf_counter() - start
+        random.Random(1).shuffle(sample)
+        missing = [os.urandom(16) for _ in range(len(sample))]
+        lookup = index.lookup
+
+        def hits():
+            for key in sample:
+                lookup(key)
+        def misses():
+            for key in missing:
+                lookup(key)
+
+        print(f"{args.entries} entries, {capacity} slots, index file {capacity * SLOT.size / (1 << 30):.2f} GiB, built in {build:.0f}s")
+        print(f"{'hits':<8}{rate(len(sample), hits):>14.0f} lookups/s")
+        print(f"{'misses':<8}{rate(len(missing), misses):>14.0f} lookups/s")
+        index.close()
+
+if __name__ == '__main__':
+    main()
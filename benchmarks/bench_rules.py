@@ -0,0 +1,36 @@
+""" throughput of points_calculator versus the compiled rule set (rules.score_receipt), both
+scoring raw receipt dicts, for a few receipt sizes.
+
+usage: python benchmarks/bench_rules.py [--receipts 50000] [--items 1,5,10,50] """
+import argparse
+import random
+import time
+
+from common import make_receipt
+from core import points_calculator
+from rules import score_receipt
+
+def rate(fn, values):
+    start = time.perf_counter()
+    for value in values:
+        fn(value)
+    return len(values) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--receipts", type=int, default=50000)
+    parser.add_argument("--items", default="1,5,10,50")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    print("receipts/s, best of 3")
+    print(f"{'items':>6} {'points_calculator':>18} {'score_receipt':>14} {'speedup':>8}")
+    for items in (int(value) for value in args.items.split(",")):
+        receipts = [make_receipt(items, rng) for _ in range(max(1000, args.receipts // items))]
+        assert all(score_receipt(receipt) == points_calculator(receipt) for receipt in receipts)
+        old = max(rate(points_calculator, receipts) for _ in range(3))
+        new = max(rate(score_receipt, receipts) for _ in range(3))
+        print(f"{items:>6} {old:18.0f} {new:14.0f} {new / old:7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+""" throughput of points_calculator on raw receipt dicts versus the integer-cents path
+(scoring.score_cents on receipts parsed once at ingest).
+
+usage: python benchmarks/bench_scoring.py [--receipts 20000] [--items 10] """
+import argparse
+import random
+import time
+
+from common import make_receipt
+from core import points_calculator
+from scoring import parse_receipt, score_cents
+
+def rate(fn, values):
+    start = time.perf_counter()
+    for value in values:
+        fn(value)
+    return len(values) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--receipts", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    receipts = [make_receipt(args.items, rng) for _ in range(args.receipts)]
+    parsed = [parse_receipt(receipt) for receipt in receipts]
+
+    print(f"{args.receipts} receipts, {args.items} items each")
+    print(f"points_calculator (float, dict)  {rate(points_calculator, receipts):10.0f} receipts/s")
+    print(f"score_cents (int, parsed)        {rate(score_cents, parsed):10.0f} receipts/s")
+    print(f"parse_receipt + score_cents      {rate(lambda r: score_cents(parse_receipt(r)), receipts):10.0f} receipts/s")
+
+if __name__ == '__main__':
+    main()
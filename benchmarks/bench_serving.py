@@ -0,0 +1,81 @@
+""" load test: requests/second of the development server (`python app.py`, what the container
+used to run) versus the production entry point (`python serve.py`, gunicorn).
+each client process holds one keep-alive connection and alternates a receipt POST with
+several points GETs for that receipt.
+
+usage: python benchmarks/bench_serving.py [--clients 8] [--seconds 10] [--workers 1] [--threads 8] """
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from common import make_receipt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def client(port, seconds, gets_per_post, results):
+    receipt = json.dumps(make_receipt(5))
+    headers = {"Content-Type": "application/json"}
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    done = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        connection.request("POST", "/receipts/process", receipt, headers)
+        receipt_id = json.loads(connection.getresponse().read())["id"]
+        for _ in range(gets_per_post):
+            connection.request("GET", f"/receipts/{receipt_id}/points")
+            connection.getresponse().read()
+        done += 1 + gets_per_post
+    results.put(done)
+
+def wait_until_up(port):
+    for _ in range(100):
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port)
+            connection.request("GET", "/")
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+def run(name, command, env, args):
+    server = subprocess.Popen(command, cwd=ROOT, env=env, start_new_session=True,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(args.port)
+        results = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=client, args=(args.port, args.seconds, args.gets, results))
+                   for _ in range(args.clients)]
+        for process in clients:
+            process.start()
+        total = sum(results.get() for _ in clients)
+        for process in clients:
+            process.join()
+        print(f"{name:<36} {total / args.seconds:10.0f} requests/s")
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--gets", type=int, default=4, help="points GETs per receipt POST")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--port", type=int, default=5099)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PORT=str(args.port), WEB_WORKERS=str(args.workers), WEB_THREADS=str(args.threads))
+    print(f"{args.clients} keep-alive clients, {args.seconds:.0f}s each")
+    run("dev server (python app.py)", [sys.executable, "app.py"], env, args)
+    run(f"gunicorn ({args.workers} workers x {args.threads} threads)", [sys.executable, "serve.py"], env, args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+""" throughput of the shared-memory store with several processes on the same file,
+against one process. every process runs a mix of one put per --reads gets.
+
+usage: python benchmarks/bench_shm.py [--operations 200000] [--processes 1,2,4] [--reads 4] """
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from common import make_receipt
+from ids import new_key
+from scoring import parse_receipt
+from shm_store import SharedMemoryStore
+
+def work(path, count, reads, start_event, done):
+    store = SharedMemoryStore(path)
+    record = parse_receipt(make_receipt(5, random.Random(1)))
+    ids = [new_key() for _ in range(count)]
+    put, get = store.put, store.get
+    start_event.wait()
+    for receipt_id in ids:
+        put(receipt_id, record, 10)
+        for _ in range(reads):
+            get(receipt_id)
+    store.close()
+    done.put(time.perf_counter())
+
+def run(path, processes, operations, reads):
+    per_process = operations // processes // (reads + 1)
+    start_event = multiprocessing.Event()
+    done = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=work, args=(path, per_process, reads, start_event, done)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    time.sleep(0.5) #let every worker open the file and build its ids
+    start = time.perf_counter()
+    start_event.set()
+    finished = max(done.get() for _ in workers)
+    for worker in workers:
+        worker.join()
+    return per_process * processes * (reads + 1) / (finished - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--operations", type=int, default=200000)
+    parser.add_argument("--processes", default="1,2,4")
+    parser.add_argument("--reads", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.operations} operations (1 put : {args.reads} gets), operations/s")
+    with tempfile.TemporaryDirectory(dir="/dev/shm" if os.path.isdir("/dev/shm") else None) as directory:
+        for processes in [int(value) for value in args.processes.split(",")]:
+            path = os.path.join(directory, f"receipts-{processes}.shm")
+            SharedMemoryStore(path, capacity=1 << 17, data_bytes=64 << 20).close()
+            print(f"{processes} processes{run(path, processes, args.operations, args.reads):>14.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+""" where the time of a request goes, by stage (metrics.py StageTimer), and what timing the
+stages costs.
+
+stages : POST /receipts/process and GET /receipts/<id>/points through the Flask test client with
+         stage timing on, then the mean, p50 and p99 of every stage from /metrics/stages, and
+         each stage's share of the timed total
+cost   : p50 of the same requests with stage timing off, on and header (alternating rounds)
+
+usage: python benchmarks/bench_stages.py [--requests 20000] [--items 5] """
+import argparse
+import random
+
+from common import make_receipt, latencies
+from metrics import Metrics
+import app as receipt_app
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    receipts = [make_receipt(args.items, rng) for _ in range(1000)]
+    client = receipt_app.app.test_client()
+    receipt_id = client.post("/receipts/process", json=receipts[0]).get_json()["id"]
+    requests = {
+        "receipt_processor": lambda index: client.post("/receipts/process", json=receipts[index % 1000]),
+        "get_points": lambda index: client.get(f"/receipts/{receipt_id}/points"),
+    }
+
+    metrics = receipt_app.request_metrics
+    metrics.stage_timing = "on"
+    for route, send in requests.items():
+        counter = iter(range(10 ** 9))
+        latencies(lambda: send(next(counter)), 1000) #warm up
+    receipt_app.request_metrics = Metrics("on") #count only the measured requests
+    for route, send in requests.items():
+        counter = iter(range(10 ** 9))
+        latencies(lambda: send(next(counter)), args.requests)
+    summary = receipt_app.request_metrics.stage_summary()
+    receipt_app.request_metrics = metrics
+
+    for route, stages in summary.items():
+        total = sum(stage["mean_us"] for stage in stages.values())
+        print(f"{route}: {total:.1f}us timed per request ({args.items} items per receipt)")
+        print(f"{'stage':>14} {'mean us':>8} {'p50 us':>7} {'p99 us':>7} {'share':>6}")
+        for name, stage in sorted(stages.items(), key=lambda entry: -entry[1]["mean_us"]):
+            p99 = "-" if stage["p99_us"] is None else f"{stage['p99_us']:g}"
+            print(f"{name:>14} {stage['mean_us']:8.2f} {stage['p50_us']:7g} {p99:>7} {stage['mean_us'] / total * 100:5.1f}%")
+
+    print("request p50 us by stage timing setting")
+    print(f"{'route':>18} {'off':>7} {'on':>7} {'header':>7}")
+    for route, send in requests.items():
+        results = {"off": [], "on": [], "header": []}
+        counter = iter(range(10 ** 9))
+        for _ in range(5): #alternating rounds, the best median of each
+            for setting in results:
+                metrics.stage_timing = setting
+                samples = sorted(latencies(lambda: send(next(counter)), args.requests // 5))
+                results[setting].append(samples[len(samples) // 2])
+        print(f"{route:>18} " + " ".join(f"{min(values):7.1f}" for values in results.values()))
+    metrics.stage_timing = "off"
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+""" cold start time of the durable store: loading a snapshot of N receipts plus a short log tail,
+optionally compared with replaying a log holding all N receipts.
+the default of 10M receipts needs several GB of memory, use --receipts for a smaller run.
+
+usage: python benchmarks/bench_startup.py [--receipts 10000000] [--tail 100000] [--full-log] """
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from common import make_receipt
+from ids import new_key
+from scoring import parse_receipt, score_cents
+from snapshot import write_snapshot
+from storage import InMemoryStore, StoredReceipt
+from wal import DurableStore, WriteAheadLog
+
+def generate(n, templates):
+    for index in range(n):
+        template = templates[index % len(templates)]
+        yield new_key(), StoredReceipt(template, score_cents(template))
+
+def write_log(path, entries):
+    log = WriteAheadLog(path, fsync="never")
+    for receipt_id, (receipt, points) in entries:
+        log.append(receipt_id, receipt, points)
+    log.close()
+
+def boot(wal_path, snapshot_path):
+    start = time.perf_counter()
+    store = DurableStore(InMemoryStore(), wal_path, fsync="never", snapshot_path=snapshot_path)
+    elapsed = time.perf_counter() - start
+    count = store.count()
+    store.close()
+    return elapsed, count
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--receipts", type=int, default=10_000_000)
+    parser.add_argument("--tail", type=int, default=100_000)
+    parser.add_argument("--full-log", action="store_true", help="also time replaying a log of every receipt")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    templates = [parse_receipt(make_receipt(rng.randint(1, 10), rng)) for _ in range(1000)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        wal_path = os.path.join(directory, "receipts.wal")
+        snapshot_path = os.path.join(directory, "receipts.snapshot")
+
+        start = time.perf_counter()
+        write_snapshot(snapshot_path, generate(args.receipts, templates))
+        written = time.perf_counter() - start
+        write_log(wal_path, generate(args.tail, templates))
+        print(f"snapshot of {args.receipts} receipts: {os.path.getsize(snapshot_path) / 1e6:.1f} MB, written in {written:.2f}s")
+
+        elapsed, count = boot(wal_path, snapshot_path)
+        print(f"startup from snapshot + {args.tail} log entries: {elapsed:.2f}s ({count} receipts, {count / elapsed:.0f}/s)")
+
+        if args.full_log:
+            os.remove(snapshot_path)
+            os.remove(wal_path)
+            write_log(wal_path, generate(args.receipts + args.tail, templates))
+            elapsed, count = boot(wal_path, None)
+            print(f"startup from full log: {elapsed:.2f}s ({count} receipts, {count / elapsed:.0f}/s)")
+
+if __name__ == '__main__':
+    main()
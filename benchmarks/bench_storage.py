@@ -0,0 +1,80 @@
+""" shared benchmark for the receipt storage engines: put, get, get_points, get_many, contains and iterate
+rates for every engine in STORES, on the same parsed receipts.
+
+usage: python benchmarks/bench_storage.py [--receipts 100000] [--engines memory,...] """
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from common import make_receipt
+from ids import new_key
+from scoring import parse_receipt
+from storage import InMemoryStore, ShardedStore
+from wal import DurableStore
+from shm_store import SharedMemoryStore
+from sqlite_store import SQLiteStore
+from points_index import IndexedLogStore
+
+STORES = {
+    "memory": lambda directory: InMemoryStore(),
+    "sharded": lambda directory: ShardedStore(),
+    "shm": lambda directory: SharedMemoryStore(os.path.join(directory, "receipts.shm"), capacity=1 << 18, data_bytes=64 << 20),
+    "sqlite": lambda directory: SQLiteStore(os.path.join(directory, "receipts.db")),
+    "indexed": lambda directory: IndexedLogStore(os.path.join(directory, "receipts.log"), capacity=1 << 18),
+    "memory+wal": lambda directory: DurableStore(InMemoryStore(), os.path.join(directory, "receipts.wal")),
+}
+
+def rate(n, fn):
+    start = time.perf_counter()
+    fn()
+    return n / (time.perf_counter() - start)
+
+def bench(name, store, ids, parsed):
+    n = len(ids)
+    def put_all():
+        for receipt_id, receipt in zip(ids, parsed):
+            store.put(receipt_id, receipt, 10)
+    def get_all():
+        for receipt_id in ids:
+            store.get(receipt_id)
+    def get_points_all():
+        for receipt_id in ids:
+            store.get_points(receipt_id)
+    def get_many_all():
+        for start in range(0, n, 1000):
+            store.get_many(ids[start:start + 1000])
+    def contains_all():
+        for receipt_id in ids:
+            store.contains(receipt_id)
+    def iterate_all():
+        for _ in store.iterate():
+            pass
+    rates = [rate(n, fn) for fn in (put_all, get_all, get_points_all, get_many_all, contains_all, iterate_all)]
+    assert store.count() == n
+    print(f"{name:<10}" + "".join(f"{value:>14.0f}" for value in rates))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--receipts", type=int, default=100000)
+    parser.add_argument("--engines", default=",".join(STORES))
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    templates = [parse_receipt(make_receipt(5, rng)) for _ in range(1000)]
+    parsed = [templates[i % len(templates)] for i in range(args.receipts)]
+    ids = [new_key() for _ in range(args.receipts)]
+
+    print(f"{args.receipts} receipts, operations/s")
+    print(f"{'engine':<10}{'put':>14}{'get':>14}{'get_points':>14}{'get_many':>14}{'contains':>14}{'iterate':>14}")
+    for name in args.engines.split(","):
+        with tempfile.TemporaryDirectory() as directory:
+            store = STORES[name](directory)
+            try:
+                bench(name, store, ids, parsed)
+            finally:
+                store.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+""" ingest of a large NDJSON file through POST /receipts/process:stream: receipts/s and the peak RSS
+of the process serving it, for a small file and the full size (flat memory means the two peaks match).
+
+the file is written to a temp directory first, then each run happens in a fresh process that
+streams the file into the Flask app and reads the result lines as they come. by default the
+receipts go to a store that only counts them, so the peak is the endpoint's own memory and not
+the stored receipts; --store memory (or any RECEIPT_STORE engine) stores them for real.
+
+usage: python benchmarks/bench_stream.py [--mb 1024] [--items 5] [--store count] """
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+from common import make_receipt
+
+#run in the child process: stream path into the app, print receipts, seconds and peak RSS
+CHILD = """
+import json, os, resource, sys, time
+sys.path.insert(0, {root!r})
+import core
+from storage import ReceiptStore, create_store
+
+class CountingStore(ReceiptStore):
+    def __init__(self):
+        self.puts = 0
+    def put(self, receipt_id, receipt, points):
+        self.puts += 1
+
+if {store!r} == "count":
+    core.receipts_details = CountingStore()
+import app
+client = app.app.test_client()
+size = os.path.getsize({path!r})
+start = time.perf_counter()
+with open({path!r}, "rb") as body:
+    response = client.post("/receipts/process:stream", input_stream=body, content_length=size,
+                           content_type="application/x-ndjson", buffered=False)
+    results = sum(chunk.count(b"\\n") for chunk in response.response)
+seconds = time.perf_counter() - start
+print(json.dumps({{"receipts": results, "seconds": seconds, "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+def write_file(path, megabytes, items):
+    rng = random.Random(1)
+    lines = [json.dumps(make_receipt(items, rng)).encode() + b"\n" for _ in range(1000)]
+    block = b"".join(lines)
+    with open(path, "wb") as file:
+        for _ in range(max(1, (megabytes << 20) // len(block))):
+            file.write(block)
+    return os.path.getsize(path)
+
+def ingest(path, store):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, RECEIPT_STORE="memory" if store == "count" else store)
+    output = subprocess.run([sys.executable, "-c", CHILD.format(root=root, store=store, path=path)],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=int, default=1024)
+    parser.add_argument("--items", type=int, default=5)
+    parser.add_argument("--store", default="count")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"store: {args.store}, {args.items} items per receipt")
+        print(f"{'file MB':>8} {'receipts':>10} {'receipts/s':>11} {'MB/s':>7} {'peak RSS MB':>12}")
+        for megabytes in sorted({max(1, args.mb // 16), args.mb}):
+            path = os.path.join(directory, f"receipts-{megabytes}.ndjson")
+            size = write_file(path, megabytes, args.items)
+            result = ingest(path, args.store)
+            os.remove(path)
+            print(f"{size / (1 << 20):8.0f} {result['receipts']:10d} {result['receipts'] / result['seconds']:11.0f} "
+                  f"{size / (1 << 20) / result['seconds']:7.1f} {result['peak_rss_kb'] / 1024:12.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+""" multi-threaded throughput of the in-memory engines at 1, 8 and 32 threads.
+every thread runs a mix of one put per --reads gets, the shape of a read-heavy api server.
+
+usage: python benchmarks/bench_threads.py [--operations 400000] [--threads 1,8,32] [--reads 4] """
+import argparse
+import random
+import threading
+import time
+
+from common import make_receipt
+from ids import new_key
+from scoring import parse_receipt
+from storage import InMemoryStore, ShardedStore
+
+STORES = {
+    "memory": InMemoryStore,
+    "sharded": ShardedStore,
+}
+
+def run(store, threads, operations, reads, record):
+    per_thread = operations // threads // (reads + 1)
+    ids = [[new_key() for _ in range(per_thread)] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+    def work(own):
+        barrier.wait()
+        put, get = store.put, store.get
+        for receipt_id in own:
+            put(receipt_id, record, 10)
+            for _ in range(reads):
+                get(receipt_id)
+    workers = [threading.Thread(target=work, args=(own,)) for own in ids]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads * (reads + 1) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--operations", type=int, default=400000)
+    parser.add_argument("--threads", default="1,8,32")
+    parser.add_argument("--reads", type=int, default=4)
+    args = parser.parse_args()
+
+    record = parse_receipt(make_receipt(5, random.Random(1)))
+    thread_counts = [int(value) for value in args.threads.split(",")]
+    print(f"{args.operations} operations (1 put : {args.reads} gets), operations/s")
+    print(f"{'engine':<10}" + "".join(f"{f'{threads} threads':>16}" for threads in thread_counts))
+    for name, factory in STORES.items():
+        rates = [run(factory(), threads, args.operations, args.reads, record) for threads in thread_counts]
+        print(f"{name:<10}" + "".join(f"{rate:16.0f}" for rate in rates))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+""" microbenchmark of validator.validate_receipt against the previous validation code
+(re.match per amount, datetime.strptime for date and time) on receipts with 1, 50 and 500 items.
+
+usage: python benchmarks/bench_validator.py [--rounds 2000] """
+import argparse
+import random
+import re
+import timeit
+from datetime import datetime
+
+from common import make_receipt
+from validator import validate_receipt
+
+#the checks receipt_processor ran before validator.py, kept here as the baseline
+def legacy_is_valid(receipt):
+    if not receipt or not isinstance(receipt, dict):
+        return False
+    required = ["retailer","purchaseDate","purchaseTime","items","total"]
+    if [item for item in required if item not in receipt]:
+        return False
+    try:
+        datetime.strptime(receipt["purchaseDate"], "%Y-%m-%d")
+        datetime.strptime(receipt["purchaseTime"], "%H:%M")
+    except (ValueError, TypeError):
+        return False
+    if not isinstance(receipt["total"], str) or not re.match(r"^\d+\.\d{2}$", receipt["total"]):
+        return False
+    if not isinstance(receipt["items"], list) or len(receipt["items"]) == 0:
+        return False
+    for item in receipt["items"]:
+        if not isinstance(item, dict) or "shortDescription" not in item or "price" not in item:
+            return False
+        if not isinstance(item["shortDescription"], str) or not item["shortDescription"].strip():
+            return False
+        if not isinstance(item["price"], str) or not re.match(r"^\d+\.\d{2}$", item["price"]):
+            return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    for n_items in (1, 50, 500):
+        receipt = make_receipt(n_items, rng)
+        assert legacy_is_valid(receipt) and validate_receipt(receipt) == []
+        rounds = max(10, args.rounds // n_items)
+        legacy = min(timeit.repeat(lambda: legacy_is_valid(receipt), number=rounds, repeat=5)) / rounds
+        new = min(timeit.repeat(lambda: validate_receipt(receipt), number=rounds, repeat=5)) / rounds
+        print(f"{n_items:>4} items   legacy {legacy * 1e6:9.2f}us   validator {new * 1e6:9.2f}us   speedup {legacy / new:5.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+""" ingest throughput of the write-ahead log store under each fsync policy,
+with one writer and with several concurrent writers (where group commit pays off).
+
+usage: python benchmarks/bench_wal.py [--receipts 20000] [--threads 1,8] [--interval-ms 10] """
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from common import make_receipt
+from ids import new_key
+from scoring import parse_receipt, score_cents
+from storage import InMemoryStore
+from wal import DurableStore, FSYNC_POLICIES
+
+def ingest(store, receipts, threads):
+    ids = [new_key() for _ in receipts]
+    def write(offset):
+        for index in range(offset, len(receipts), threads):
+            store.put(ids[index], receipts[index], score_cents(receipts[index]))
+    workers = [threading.Thread(target=write, args=(offset,)) for offset in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    store.log.sync() #count the final fsync for every policy but never
+    return len(receipts) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--receipts", type=int, default=20000)
+    parser.add_argument("--threads", default="1,8")
+    parser.add_argument("--interval-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    receipts = [parse_receipt(make_receipt(5, rng)) for _ in range(args.receipts)]
+
+    print(f"{args.receipts} receipts, receipts/s")
+    for threads in map(int, args.threads.split(",")):
+        for fsync in FSYNC_POLICIES:
+            with tempfile.TemporaryDirectory() as directory:
+                store = DurableStore(InMemoryStore(), os.path.join(directory, "receipts.wal"),
+                                     fsync=fsync, interval_ms=args.interval_ms)
+                rate = ingest(store, receipts, threads)
+                store.close()
+            print(f"threads {threads:>3}  fsync {fsync:<9} {rate:12.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#shared helpers for the benchmark scripts in this folder
+import os
+import random
+import sys
+import time
+
+#make the app modules in the repo root importable when a script is run directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RETAILERS = ["Target", "Walgreens", "M&M Corner Market", "Costco Wholesale", "7-Eleven"]
+DESCRIPTIONS = ["Mountain Dew 12PK", "Emils Cheese Pizza", "Knorr Creamy Chicken",
+                "Doritos Nacho Cheese", "   Klarbrunn 12-PK 12 FL OZ  ", "Gatorade", "Dasani"]
+
+def make_receipt(n_items, rng=random):
+    """ builds a valid receipt with n_items items,
+    random prices and a matching total """
+    items = []
+    total = 0
+    for _ in range(n_items):
+        cents = rng.randint(1, 5000)
+        total += cents
+        items.append({"shortDescription": rng.choice(DESCRIPTIONS),
+                      "price": f"{cents // 100}.{cents % 100:02d}"})
+    return {
+        "retailer": rng.choice(RETAILERS),
+        "purchaseDate": f"2022-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "purchaseTime": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+        "items": items,
+        "total": f"{total // 100}.{total % 100:02d}",
+    }
+
+def latencies(fn, n):
+    """ calls fn n times and returns the per-call latencies in microseconds """
+    out = []
+    clock = time.perf_counter_ns
+    for _ in range(n):
+        start = clock()
+        fn()
+        out.append((clock() - start) / 1000)
+    return out
+
+def summary(name, samples):
+    """ formats mean / p50 / p99 of a list of latencies in microseconds """
+    ordered = sorted(samples)
+    mean = sum(ordered) / len(ordered)
+    p50 = ordered[len(ordered) // 2]
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"{name:<28} mean {mean:9.1f}us  p50 {p50:9.1f}us  p99 {p99:9.1f}us"
@@ -0,0 +1,107 @@
+#vectorized bulk scoring with NumPy, for rescoring large numbers of stored receipts offline
+#receipts are laid out as columns (one array per feature, items flattened across receipts)
+#and all seven rules are evaluated with whole-array operations
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from scoring import NON_ALPHANUMERIC, to_cents
+
+#function to score receipts given as columns, returns an int64 array of points per receipt
+#  retailer_len     : alphanumeric characters in each retailer name
+#  total_cents      : total of each receipt in integer cents
+#  item_counts      : number of items on each receipt
+#  item_desc_len    : trimmed shortDescription length of every item, flattened in receipt order
+#  item_price_cents : price of every item in integer cents, flattened in receipt order
+#  purchase_day     : day of the month of each purchase date
+#  purchase_minute  : minute of the day of each purchase time (hour * 60 + minute)
+def score_columns(retailer_len, total_cents, item_counts, item_desc_len, item_price_cents,
+                  purchase_day, purchase_minute):
+    total_cents = np.asarray(total_cents, dtype=np.int64)
+    item_counts = np.asarray(item_counts, dtype=np.int64)
+    item_desc_len = np.asarray(item_desc_len, dtype=np.int64)
+    item_price_cents = np.asarray(item_price_cents, dtype=np.int64)
+    purchase_minute = np.asarray(purchase_minute, dtype=np.int64)
+
+    #Rule 1 : One point for every alphanumeric character in the retailer name.
+    points = np.array(retailer_len, dtype=np.int64)
+
+    #Rule 2 : 50 points if the total is a round dollar amount with no cents.
+    points += 50 * (total_cents % 100 == 0)
+
+    #Rule 3 : 25 points if the total is a multiple of 0.25.
+    points += 25 * (total_cents % 25 == 0)
+
+    #Rule 4 : 5 points for every two items on the receipt.
+    points += 5 * (item_counts // 2)
+
+    #Rule 5 : 20% of the price rounded up, for trimmed descriptions whose length is a multiple of 3.
+    #item points are summed per receipt as differences of a running total at the receipt boundaries
+    item_points = np.where(item_desc_len % 3 == 0, (item_price_cents + 499) // 500, 0)
+    running = np.zeros(len(item_points) + 1, dtype=np.int64)
+    np.cumsum(item_points, out=running[1:])
+    ends = np.cumsum(item_counts)
+    points += running[ends] - running[ends - item_counts]
+
+    #Rule 6 : 6 points if the day in the purchase date is odd.
+    points += 6 * (np.asarray(purchase_day, dtype=np.int64) % 2 == 1)
+
+    #Rule 7 : 10 points if the time of purchase is after 2:00pm and before 4:00pm (14:01 to 15:59).
+    points += 10 * ((purchase_minute > 840) & (purchase_minute < 960))
+
+    return points
+
+#function to lay out receipt dicts (or ReceiptRecords) as the columns score_columns takes
+def receipts_to_columns(receipts):
+    retailer_len, total_cents, item_counts = [], [], []
+    item_desc_len, item_price_cents = [], []
+    purchase_day, purchase_minute = [], []
+    for receipt in receipts:
+        if isinstance(receipt, dict):
+            retailer, date, time = receipt["retailer"], receipt["purchaseDate"], receipt["purchaseTime"]
+            total = to_cents(receipt["total"])
+            items = [(item["shortDescription"], to_cents(item["price"])) for item in receipt["items"]]
+        else:
+            retailer, date, time, total = receipt.retailer, receipt.purchaseDate, receipt.purchaseTime, receipt.total_cents
+            items = receipt.items
+        retailer_len.append(len(NON_ALPHANUMERIC.sub("", retailer)))
+        total_cents.append(total)
+        item_counts.append(len(items))
+        for description, cents in items:
+            item_desc_len.append(len(description.strip()))
+            item_price_cents.append(cents)
+        purchase_day.append(int(date[8:10]))
+        purchase_minute.append(int(time[0:2]) * 60 + int(time[3:5]))
+    return (retailer_len, total_cents, item_counts, item_desc_len, item_price_cents,
+            purchase_day, purchase_minute)
+
+#function to score a list of receipt dicts (or ReceiptRecords) in one vectorized pass
+def score_receipts(receipts):
+    return score_columns(*receipts_to_columns(receipts))
+
+#offline rescoring: reads NDJSON receipts and writes one {"points": n} line per receipt
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rescore an NDJSON file of receipts in bulk.")
+    parser.add_argument("path", help="NDJSON file with one receipt per line, - for stdin")
+    parser.add_argument("--chunk", type=int, default=100000, help="receipts scored per vectorized pass")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8")
+    with source:
+        chunk = []
+        for line in source:
+            if line.strip():
+                chunk.append(json.loads(line))
+            if len(chunk) >= args.chunk:
+                write_points(score_receipts(chunk))
+                chunk = []
+        if chunk:
+            write_points(score_receipts(chunk))
+
+def write_points(points):
+    sys.stdout.writelines(f'{{"points": {value}}}\n' for value in points.tolist())
+
+if __name__ == '__main__':
+    main()
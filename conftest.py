@@ -0,0 +1,34 @@
+import random
+import pytest
+
+#building blocks for generated receipts, picked to hit every branch of the scoring rules
+RETAILERS = ["Target", "Walgreens", "M&M Corner Market", "7-Eleven", "  Trader Joe's ", "A", "&-&"]
+WORDS = ["Pepsi", "12-oz", "Dasani", "Gatorade", "Emils", "Cheese", "Pizza", "Klarbrunn", "12-PK", "FL", "OZ"]
+TIMES = ["00:00", "13:59", "14:00", "14:01", "15:00", "15:59", "16:00", "23:59"]
+
+#function to format integer cents as an amount string like "12.25"
+def amount(cents):
+  return f"{cents // 100}.{cents % 100:02d}"
+
+#function to generate a random valid receipt
+def random_receipt(rng):
+  items = []
+  for _ in range(rng.randint(1, 12)):
+    description = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+    description = " " * rng.randint(0, 2) + description + " " * rng.randint(0, 2)
+    cents = rng.choice([rng.randint(0, 99999), rng.randint(0, 400) * 25, rng.randint(0, 999) * 100])
+    items.append({"shortDescription": description, "price": amount(cents)})
+  total = rng.choice([rng.randint(0, 999999), rng.randint(0, 4000) * 25, rng.randint(0, 9999) * 100])
+  return {
+    "retailer": rng.choice(RETAILERS),
+    "purchaseDate": f"{rng.randint(2000, 2030)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+    "purchaseTime": rng.choice([rng.choice(TIMES), f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"]),
+    "items": items,
+    "total": amount(total),
+  }
+
+#a large generated corpus of valid receipts, shared by the differential tests
+@pytest.fixture(scope="session")
+def corpus():
+  rng = random.Random(20220101)
+  return [random_receipt(rng) for _ in range(20000)]
@@ -0,0 +1,281 @@
+#core receipt processing logic, shared by the Flask app (app.py) and the ASGI app (asgi.py)
+#the request functions take already-decoded json values and return (response body, status code),
+#so both web frontends give the same answers with the same validation and scoring
+import re #for regex patterns
+import math #for rounding up
+from time import perf_counter_ns
+import fastjson #for parsing NDJSON batch bodies line by line, orjson when installed
+from ids import id_generator_from_environment, parse_id, format_id #receipt ids are 128-bit ints inside, uuid strings outside
+from decoder import parse_and_score
+from scoring import RULE_NAMES, score_cents, breakdown_cents
+from rules import score_receipt, breakdown_receipt #the scoring rules compiled into one function (see rules.py)
+from records import ReceiptRecord
+from storage import store_from_environment
+from metrics import Metrics, stage_timing_from_environment
+
+#Our storage for receipts, an in-memory python dictionary unless the environment configures
+#another engine or a write-ahead log (see storage.store_from_environment)
+#receipts are stored as compact records, with money as integer cents (see records.py), next to their points
+receipts_details = store_from_environment()
+
+#Generator of new receipt ids, random uuids from batched randomness unless RECEIPT_IDS picks another
+new_key = id_generator_from_environment()
+
+#Request counts, latency and scoring time histograms, served at /metrics (see metrics.py)
+#with RECEIPT_STAGE_TIMING=on (or header) the stages of receipt_processor and get_points are timed too
+request_metrics = Metrics(stage_timing_from_environment())
+
+#Per-id results of the batch points lookup for ids that have no points
+NOT_FOUND = {"error": "not-found"}
+INVALID_ID = {"error": "invalid-id"}
+
+#Content types treated as newline-delimited json by the batch endpoint
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+#function to validate our unique id
+def validate_id(token):
+    return parse_id(token) is not None
+
+#function to store a parsed receipt with its points and return its new unique id
+#timer is a StageTimer (metrics.py) when the stages are timed
+def store_record(record, points, timer=None):
+    key = new_key() #Generate a unique id
+    receipt_id = format_id(key)
+    if timer is not None:
+        timer.lap("id_generation")
+    receipts_details.put(key, record, points) #Store the receipt, scored once at submission
+    if timer is not None:
+        timer.lap("store_write")
+    return receipt_id
+
+#function to validate and store one receipt
+def process_receipt(receipt, timer=None):
+    #checked, converted to a compact record with integer cents and scored in one pass, here
+    start = perf_counter_ns()
+    record, points, errors = parse_and_score(receipt, timer)
+    request_metrics.scoring(perf_counter_ns() - start)
+    if errors:
+        return {"error":"The receipt is invalid.", "details": errors}, 400
+
+    receipt_id = store_record(record, points, timer)
+    return {"id": receipt_id}, 200
+
+#function to validate and store a list of receipts (None when the batch body was not usable)
+def process_batch(receipts):
+    if receipts is None:
+        return {"error": "The batch is invalid."}, 400
+
+    results = []
+    for receipt in receipts:
+        start = perf_counter_ns()
+        record, points, errors = parse_and_score(receipt)
+        request_metrics.scoring(perf_counter_ns() - start)
+        if errors:
+            results.append({"error": "The receipt is invalid.", "details": errors})
+        else:
+            results.append({"id": store_record(record, points)})
+    return {"results": results}, 200
+
+#function to render the metrics in the Prometheus text format, with the store size as of now
+def render_metrics():
+    return request_metrics.render(receipts_details.count())
+
+#Longest line the streaming endpoint reads as one receipt, longer lines are refused unread
+MAX_LINE = 1 << 20
+LINE_TOO_LONG = {"error": "The receipt is invalid.", "details": [{"field": "", "error": f"line is longer than {MAX_LINE} bytes"}]}
+
+#Bytes asked of the body stream per read by read_lines
+READ_CHUNK = 1 << 16
+
+#function to split a body stream into lines, read is the stream's read(size)
+#the body is read in READ_CHUNK blocks (readline on a WSGI input can go a byte at a time) and
+#memory stays at one line however large the body is; a line over MAX_LINE yields None and the
+#rest of it is skipped unread
+def read_lines(read):
+    buffer = b""
+    skipping = False
+    while True:
+        chunk = read(READ_CHUNK)
+        if not chunk:
+            if buffer and not skipping:
+                yield buffer
+            return
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            if skipping:
+                skipping = False
+            elif end + 1 - start > MAX_LINE:
+                yield None
+            else:
+                yield buffer[start:end + 1]
+            start = end + 1
+        buffer = buffer[start:]
+        if len(buffer) >= MAX_LINE:
+            if not skipping:
+                yield None
+            skipping = True
+            buffer = b""
+
+#function to validate and store the receipts of an NDJSON stream one line at a time
+#yields one NDJSON result line per receipt line, like /receipts/process would answer it
+def process_lines(lines):
+    for line in lines:
+        if line is None:
+            yield fastjson.encode_body(LINE_TOO_LONG) + b"\n"
+            continue
+        if not line.strip():
+            continue #blank lines between records are allowed
+        try:
+            receipt = fastjson.loads(line)
+        except ValueError:
+            receipt = None #reported as an invalid receipt at its position
+        body, _ = process_receipt(receipt)
+        yield fastjson.encode_body(body) + b"\n"
+
+#function to decode an NDJSON body into a list of receipts
+def parse_ndjson(data):
+    receipts = []
+    for line in data.splitlines():
+        if not line.strip():
+            continue #blank lines between records are allowed
+        try:
+            receipts.append(fastjson.loads(line))
+        except ValueError:
+            receipts.append(None) #reported as an invalid receipt at its position
+    return receipts
+
+#function to write the logic to follow rules for awarding points for a particular receipt
+def points_calculator(receipt):
+    points = 0
+
+    #Rule 1 : One point for every alphanumeric character in the retailer name.
+    retailerName = receipt.get("retailer","")
+    pattern = re.sub(r'[^a-zA-Z0-9]', '', retailerName)
+    points += len(pattern)
+
+    #Rule 2 : 50 points if the total is a round dollar amount with no cents.
+    amount = float(receipt.get("total","0"))
+    if amount.is_integer():
+        points += 50
+    
+    #Rule 3 : 25 points if the total is a multiple of 0.25.
+    if amount % 0.25 == 0:
+        points +=25
+    
+    #Rule 4 : 5 points for every two items on the receipt.
+    items = receipt.get("items", [])
+    two_item_count = (len(items) // 2)
+    points += (two_item_count * 5)
+
+    """Rule 5 : If the trimmed length of the item description is a multiple of 3, 
+    multiply the price by 0.2 and round up to the nearest integer. 
+    The result is the number of points earned."""
+    for item in items:
+        trimmed = item.get("shortDescription","").strip() #trimming the whitespaces
+        price = float(item.get("price","0"))
+        if len(trimmed) % 3 == 0:
+            points += math.ceil(price * 0.2) #used ceil since we are asked to round "up"
+    
+    #Rule 6 : 6 points if the day in the purchase date is odd.
+    date = receipt.get("purchaseDate","")
+    if date: 
+        day = int(date.split("-")[-1]) #extract the day from YYYY-MM-DD format 
+        if day % 2 == 1: #checking the odd day condition
+            points += 6 
+    
+    #Rule 7 : 10 points if the time of purchase is after 2:00pm and before 4:00pm.
+    time = receipt.get("purchaseTime", "")
+    if time:
+        hr, min = map(int, time.split(":")) #we extract the hour and minute
+        if 14 <= hr <=15:   #allows 2:00pm to 3:59pm
+            if not (hr==14 and min==0): #excluding 2:00pm and only consider if it is 2:01pm
+                points += 10
+    
+    return points
+
+#function to look up the points of one receipt
+#timer is a StageTimer (metrics.py) when the stages are timed
+def lookup_points(receipt_id, timer=None):
+    key = parse_id(receipt_id) #validates the UUID format and gives the store key in one step
+    if timer is not None:
+        timer.lap("id_parse")
+    if key is None:
+        return {"error": "The receipt is invalid."}, 400
+
+    points = receipts_details.get_points(key) #pure lookup on the hot path, points were computed at ingest
+    if timer is not None:
+        timer.lap("store_read")
+    if points is None:
+        #unknown id, or a receipt from an older store that was never scored
+        stored = receipts_details.get(key)
+        if stored is None:
+            return {"error":"No receipt found for that ID."}, 404
+        points = stored.points
+        if points is None:
+            points = score_unscored(key, stored.receipt)
+
+    return {"points": points}, 200
+
+#function to look up the points each rule awarded one receipt
+def lookup_breakdown(receipt_id):
+    key = parse_id(receipt_id)
+    if key is None:
+        return {"error": "The receipt is invalid."}, 400
+
+    stored = receipts_details.get(key) #the same single lookup as get_points on the in-memory stores
+    if stored is None:
+        return {"error":"No receipt found for that ID."}, 404
+    receipt = stored.receipt
+    breakdown = receipt.breakdown if isinstance(receipt, ReceiptRecord) else None
+    if breakdown is None:
+        #receipts stored before breakdowns were kept at ingest are explained on the fly
+        breakdown = breakdown_cents(receipt) if isinstance(receipt, ReceiptRecord) else breakdown_receipt(receipt)
+    points = stored.points
+    if points is None:
+        points = sum(breakdown)
+
+    return {"points": points, "breakdown": [{"rule": name, "points": rule_points}
+                                            for name, rule_points in zip(RULE_NAMES, breakdown)]}, 200
+
+#function to look up the points of many receipts, ids is the decoded request body
+def lookup_points_batch(ids):
+    if isinstance(ids, dict):
+        ids = ids.get("ids")
+    if not isinstance(ids, list):
+        return {"error": "The batch is invalid."}, 400
+
+    #parse every id once, then one store round trip for all of them
+    #non-string and malformed ids get key None, which never matches a stored receipt
+    parse = parse_id
+    keys = [parse(receipt_id) if isinstance(receipt_id, str) else None for receipt_id in ids]
+    found = receipts_details.get_many(keys)
+
+    #bind everything the loop touches to locals, this loop runs once per id
+    results = {}
+    for receipt_id, key, stored in zip(ids, keys, found):
+        if stored is None:
+            if key is None:
+                results[str(receipt_id)] = INVALID_ID
+            else:
+                results[receipt_id] = NOT_FOUND
+            continue
+        points = stored.points
+        if points is None:
+            points = score_unscored(key, stored.receipt)
+        results[receipt_id] = {"points": points}
+
+    return {"results": results}, 200
+
+#function to score a stored receipt that has no points yet and store them next to it
+def score_unscored(key, receipt):
+    #receipts loaded from older stores were never scored, so score them once here
+    if isinstance(receipt, ReceiptRecord):
+        points = score_cents(receipt)
+    else:
+        points = score_receipt(receipt) #raw json receipt dict, same points as points_calculator
+    receipts_details.put(key, receipt, points)
+    return points
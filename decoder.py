@@ -0,0 +1,112 @@
+#single-pass receipt decoder
+#a submitted receipt used to be walked three times: validate_receipt checked it, parse_receipt
+#built the ReceiptRecord from it and score_cents walked the record for the points. parse_and_score
+#does all three in one traversal of the decoded json: every field is checked, converted and scored
+#where it is read, the item loop checks, converts and scores each item once
+#
+#it gives exactly what the three steps give (the same error list, record and points, see
+#test_decoder.py); once an error is found it only keeps collecting errors, so an invalid receipt
+#builds nothing. the points of each rule are kept on the record as its breakdown
+#
+#given a StageTimer (metrics.py) it laps its stages: regex (the retailer and total checks),
+#datetime (date and time validation), items (the item loop: amount patterns, descriptions and
+#their points) and record (building the ReceiptRecord)
+from records import ReceiptRecord
+from scoring import NON_ALPHANUMERIC
+from validator import AMOUNT, REQUIRED, parse_date, parse_time
+
+NOT_AN_OBJECT = [{"field": "", "error": "receipt must be a non-empty json object"}]
+
+#function to validate, parse and score a decoded receipt in one pass
+#returns (ReceiptRecord, points, []) for a valid receipt and (None, None, errors) otherwise
+def parse_and_score(receipt, timer=None):
+    if not isinstance(receipt, dict) or not receipt:
+        return None, None, NOT_AN_OBJECT
+    try:
+        retailer = receipt["retailer"]
+        date = receipt["purchaseDate"]
+        time = receipt["purchaseTime"]
+        items = receipt["items"]
+        total = receipt["total"]
+    except KeyError:
+        return None, None, [{"field": field, "error": "required field is missing"} for field in REQUIRED if field not in receipt]
+
+    errors = []
+    retailer_points = round_dollar = quarter = odd_day = afternoon = 0
+
+    #Rule 1 : One point for every alphanumeric character in the retailer name.
+    if isinstance(retailer, str):
+        retailer_points = len(NON_ALPHANUMERIC.sub("", retailer))
+    else:
+        errors.append({"field": "retailer", "error": "must be a string"})
+    if timer is not None:
+        timer.lap("regex")
+
+    #Rule 6 : 6 points if the day in the purchase date is odd.
+    day = parse_date(date) if isinstance(date, str) else None
+    if day is None:
+        errors.append({"field": "purchaseDate", "error": "must be a date like 2022-01-31"})
+    elif day[2] % 2 == 1:
+        odd_day = 6
+
+    #Rule 7 : 10 points if the time of purchase is after 2:00pm and before 4:00pm (14:01 to 15:59).
+    clock = parse_time(time) if isinstance(time, str) else None
+    if clock is None:
+        errors.append({"field": "purchaseTime", "error": "must be a 24hr time like 13:01"})
+    elif 840 < clock[0] * 60 + clock[1] < 960:
+        afternoon = 10
+    if timer is not None:
+        timer.lap("datetime")
+
+    #Rules 2 and 3 : 50 points for a round dollar total, 25 for a multiple of 0.25.
+    #AMOUNT has checked the layout, so dropping the dot leaves the cents as a decimal integer
+    if isinstance(total, str) and AMOUNT(total):
+        total_cents = int(total.replace(".", ""))
+        if total_cents % 100 == 0:
+            round_dollar = 50
+        if total_cents % 25 == 0:
+            quarter = 25
+    else:
+        errors.append({"field": "total", "error": "must be an amount like 6.49"})
+    if timer is not None:
+        timer.lap("regex")
+
+    if not isinstance(items, list) or not items:
+        errors.append({"field": "items", "error": "must be a non-empty list"})
+        return None, None, errors
+
+    #Rule 4 : 5 points for every two items on the receipt.
+    pairs = (len(items) // 2) * 5
+
+    #Rule 5 : 20% of the price rounded up, for trimmed descriptions whose length is a multiple of 3.
+    descriptions = []
+    prices = []
+    item_points = 0
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"field": f"items[{index}]", "error": "must be a json object"})
+            continue
+        description = item.get("shortDescription")
+        trimmed = description.strip() if isinstance(description, str) else ""
+        if not trimmed:
+            errors.append({"field": f"items[{index}].shortDescription", "error": "must be a non-blank string"})
+        price = item.get("price")
+        if not isinstance(price, str) or not AMOUNT(price):
+            errors.append({"field": f"items[{index}].price", "error": "must be an amount like 6.49"})
+        if errors:
+            continue #invalid already, only the errors are still needed
+        cents = int(price.replace(".", ""))
+        descriptions.append(description)
+        prices.append(cents)
+        if len(trimmed) % 3 == 0:
+            item_points += (cents + 499) // 500
+
+    if timer is not None:
+        timer.lap("items")
+    if errors:
+        return None, None, errors
+    breakdown = (retailer_points, round_dollar, quarter, pairs, item_points, odd_day, afternoon) #scoring.RULE_NAMES order
+    record = ReceiptRecord(retailer, date, time, total_cents, descriptions, prices, breakdown)
+    if timer is not None:
+        timer.lap("record")
+    return record, sum(breakdown), []
@@ -0,0 +1,45 @@
+#fast json for request and response bodies, used by both web frontends (app.py and asgi.py)
+#orjson, when it is installed, decodes and encodes several times faster than the json module;
+#without it everything goes through the json module as before. bodies orjson refuses (NaN,
+#utf-16 text, lone surrogates) or cannot encode (ints over 64 bits, non-string keys) are handed
+#to the json module too, so the answers are the same with or without it (apart from integers over
+#64 bits in a body, which orjson reads as floats; no receipt field is a number)
+#
+#the two responses almost every request gets, {"id": ...} and {"points": ...}, are written from
+#byte templates without going through any encoder
+import json
+
+try:
+    import orjson
+except ImportError: #optional accelerator
+    orjson = None
+
+#function to decode a json body (bytes or str), raises ValueError if it is not json
+def loads(data):
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except ValueError:
+            pass #the json module reads a few bodies orjson refuses, it decides
+    return json.loads(data)
+
+#function to encode a value as compact json bytes, with sorted keys like Flask's jsonify
+def dumps(value, sort_keys=False):
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+        except TypeError:
+            pass
+    return json.dumps(value, separators=(",", ":"), sort_keys=sort_keys).encode()
+
+#function to encode a response body, from a template when it is a lone id or points value
+#(ids are always format_id output, hex digits and dashes, so they need no escaping)
+def encode_body(body, sort_keys=False):
+    if len(body) == 1:
+        points = body.get("points")
+        if type(points) is int:
+            return b'{"points":%d}' % points
+        receipt_id = body.get("id")
+        if type(receipt_id) is str:
+            return b'{"id":"%s"}' % receipt_id.encode()
+    return dumps(body, sort_keys)
@@ -0,0 +1,138 @@
+#receipt ids
+#outside the service a receipt id is the usual uuid string ("adb6b560-0eef-42bc-9d16-df48f30e89b2"),
+#inside it is the same 128 bits as a python int: stores are keyed by the int, which takes about
+#half the memory of the 36-character string and hashes and compares faster
+#ids are parsed from strings once, where a request comes in, and formatted once, where a
+#response (or a log line) goes out
+import os
+import re
+import threading
+import time
+
+#canonical form, checked with one precompiled pattern before the hex digits are parsed
+#(int() alone would also take "_", spaces, signs and a "0x" prefix)
+CANONICAL = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}").fullmatch
+
+#bits a version 4 uuid fixes: the version nibble is 4 and the variant bits are 10
+VERSION_4 = (4 << 76) | (2 << 62)
+VERSION_MASK = ~((0xF << 76) | (3 << 62)) & ((1 << 128) - 1)
+
+#bits a version 7 uuid fixes, and the parts of one: 48-bit unix milliseconds, 12 bits we use as
+#a counter within the millisecond, then the variant and 62 random bits
+VERSION_7 = (7 << 76) | (2 << 62)
+RANDOM_62 = (1 << 62) - 1
+
+#function to generate a new random (version 4) receipt id, one os.urandom call per id
+def new_key():
+    return int.from_bytes(os.urandom(16), "big") & VERSION_MASK | VERSION_4
+
+class BufferedIds:
+    """ random (version 4) receipt ids made from one os.urandom call per batch of ids
+    instead of one per id """
+
+    def __init__(self, batch=1024):
+        self.batch = batch
+        self.keys = iter(())
+        self.lock = threading.Lock() #one refill at a time
+        #a forked worker must not hand out the ids left in its parent's batch
+        os.register_at_fork(after_in_child=self.reset)
+
+    def reset(self):
+        self.keys = iter(())
+
+    #function to refill the batch, unless another thread already has
+    def refill(self, keys):
+        with self.lock:
+            if self.keys is keys:
+                data = os.urandom(16 * self.batch)
+                mask, version = VERSION_MASK, VERSION_4
+                self.keys = iter([int.from_bytes(data[start:start + 16], "big") & mask | version
+                                  for start in range(0, len(data), 16)])
+
+    #next() on a list iterator is a single step under the GIL, so threads never get the same id
+    def __call__(self):
+        keys = self.keys
+        try:
+            return next(keys)
+        except StopIteration:
+            self.refill(keys)
+            return self()
+
+class TimeOrderedIds:
+    """ time-ordered (version 7) receipt ids: ids made later sort higher, so they go in at the
+    end of a B-tree or a log-ordered index instead of at random places """
+
+    def __init__(self):
+        self.random = BufferedIds() #random bits come from the same batched source
+        self.lock = threading.Lock()
+        self.last = 0 #millisecond and counter of the last id, as one int
+
+    #the counter starts at a random value below 2048 each millisecond (so ids of a millisecond
+    #are not guessable from each other) and counts up; a full counter borrows the next
+    #millisecond, so ids of one process always increase
+    def __call__(self):
+        random = self.random()
+        now = time.time_ns() // 1_000_000 << 12 | random >> 116 & 0x7FF
+        lock = self.lock
+        lock.acquire()
+        if now <= self.last:
+            now = self.last + 1
+        self.last = now
+        lock.release()
+        return (now >> 12) << 80 | (now & 0xFFF) << 64 | VERSION_7 | random & RANDOM_62
+
+#function to create the receipt id generator with the given name
+def create_id_generator(name="buffered"):
+    if name == "uuid4":
+        return new_key
+    if name == "buffered":
+        return BufferedIds()
+    if name == "uuid7":
+        return TimeOrderedIds()
+    raise ValueError(f"unknown receipt id generator: {name}")
+
+#function to create the id generator the app uses, configured from the environment
+#  RECEIPT_IDS : uuid4 (os.urandom per id), buffered (default, batched randomness) or uuid7
+def id_generator_from_environment(environ=os.environ):
+    return create_id_generator(environ.get("RECEIPT_IDS", "buffered"))
+
+#the 32 hex digits left of the other spellings uuid.UUID takes (no dashes, braces, a urn:uuid: prefix)
+#uuid.UUID itself also lets through what int() takes ("0x", "_", spaces), which are not uuids
+HEX_DIGITS = re.compile(r"[0-9a-fA-F]{32}").fullmatch
+
+#function to parse a receipt id string into its 128-bit int, None if it is not a uuid
+#the canonical form takes the fast path, the other spellings are normalized like uuid.UUID does
+def parse_id(token):
+    if type(token) is not str:
+        return None
+    if CANONICAL(token):
+        return int(token.replace("-", ""), 16)
+    digits = token.replace("urn:", "").replace("uuid:", "").strip("{}").replace("-", "")
+    if HEX_DIGITS(digits):
+        return int(digits, 16)
+    return None
+
+#function to format a 128-bit receipt id as the canonical uuid string
+def format_id(key):
+    text = f"{key:032x}"
+    return f"{text[0:8]}-{text[8:12]}-{text[12:16]}-{text[16:20]}-{text[20:32]}"
+
+#function to turn a key from a store written before ids were ints (a string) into the int
+def as_key(value):
+    if isinstance(value, int):
+        return value
+    key = parse_id(value)
+    if key is None:
+        raise ValueError(f"not a receipt id: {value!r}")
+    return key
+
+#function to give the 16 big-endian bytes of a key, None if it is not a usable key
+#(the all-zero id is reserved, on-disk tables use it to mark free slots)
+def key_bytes(key):
+    if type(key) is not int or not 0 < key < 1 << 128:
+        return None
+    return key.to_bytes(16, "big")
+
+#function to turn 16 bytes from key_bytes back into the key
+def key_from_bytes(data):
+    return int.from_bytes(data, "big")
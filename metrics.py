@@ -0,0 +1,264 @@
+#request metrics in the Prometheus text format, served by both web frontends at /metrics
+#every thread counts into its own shard (plain dicts and lists only that thread writes), so
+#recording a request takes no lock and never waits for another thread; a scrape adds the shards
+#up. shards of threads that have ended are folded into one retired shard, so servers that start
+#a thread per connection do not pile them up
+#
+#with stage timing on (RECEIPT_STAGE_TIMING), receipt_processor and get_points also time their
+#stages (json decode, date/time validation, regex checks, id generation, store write, ...) with a
+#StageTimer, into one histogram per route and stage, optionally sent back in a Server-Timing header
+#
+#per route a thread keeps one list: a count per latency bucket (in integer nanoseconds, made
+#cumulative only when rendered), the sum of the latencies and a dict of counts by status; error
+#counts are added up from those when rendered, so recording a request is a few list and dict
+#updates
+import os
+import threading
+import weakref
+from bisect import bisect_left
+from time import perf_counter_ns
+
+#upper bounds of the request latency buckets, in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+#upper bounds of the scoring time buckets, in seconds (validating, parsing and scoring one receipt)
+SCORING_BUCKETS = (0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+
+#upper bounds of the stage time buckets, in seconds
+STAGE_BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.01)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+#stage timing settings: off, on (histograms) or header (histograms and a Server-Timing header)
+STAGE_TIMING = ("off", "on", "header")
+
+#function to convert bucket bounds in seconds to integer nanoseconds
+def nanoseconds(bounds):
+    return tuple(round(bound * 1e9) for bound in bounds)
+
+LATENCY_NS = nanoseconds(LATENCY_BUCKETS)
+SCORING_NS = nanoseconds(SCORING_BUCKETS)
+STAGE_NS = nanoseconds(STAGE_BUCKETS)
+
+#positions in a route's list: the sum after the buckets (the last one for +Inf), then the statuses
+LATENCY_SUM = len(LATENCY_BUCKETS) + 1
+STATUSES = LATENCY_SUM + 1
+
+#function to make the list of a route
+def new_route():
+    return [0] * STATUSES + [{}]
+
+#function to add a histogram's counts to another
+def add_histogram(target, source):
+    for index, value in enumerate(source):
+        target[index] += value
+
+class Shard:
+    """ the counters and histograms of one thread """
+
+    __slots__ = ("routes", "scoring", "stages")
+
+    def __init__(self):
+        self.routes = {} #route -> its list, see new_route
+        self.scoring = [0] * (len(SCORING_BUCKETS) + 2)
+        self.stages = {} #(route, stage) -> histogram
+
+    #function to add another shard's numbers to this one
+    def merge(self, other):
+        for route, entry in list(other.routes.items()):
+            entry = list(entry) #copied at once, its thread may be writing to it
+            target = self.routes.get(route)
+            if target is None:
+                target = self.routes[route] = new_route()
+            add_histogram(target, entry[:STATUSES])
+            statuses = target[STATUSES]
+            for status, count in list(entry[STATUSES].items()):
+                statuses[status] = statuses.get(status, 0) + count
+        add_histogram(self.scoring, list(other.scoring))
+        for key, histogram in list(other.stages.items()):
+            add_histogram(self.stages.setdefault(key, [0] * (len(STAGE_BUCKETS) + 2)), list(histogram))
+
+class StageTimer:
+    """ lap timer of one request: lap(stage) adds the time since the previous lap
+    (or since the timer was made) to that stage """
+
+    __slots__ = ("last", "stages")
+
+    def __init__(self):
+        self.stages = {} #stage -> nanoseconds, in the order the stages first ran
+        self.last = perf_counter_ns()
+
+    def lap(self, stage):
+        now = perf_counter_ns()
+        self.stages[stage] = self.stages.get(stage, 0) + now - self.last
+        self.last = now
+
+    #function to write the stages as a Server-Timing header value, durations in milliseconds
+    def header(self):
+        return ", ".join(f"{stage};dur={duration / 1e6:.3f}" for stage, duration in self.stages.items())
+
+class ThreadShard:
+    """ marker kept in a thread's local storage next to its shard,
+    it goes away with the thread and hands the shard to the retired one """
+
+class Metrics:
+    """ request counts, error counts by status, per-route latency and scoring time histograms """
+
+    def __init__(self, stage_timing="off"):
+        if stage_timing not in STAGE_TIMING:
+            raise ValueError(f"stage timing must be one of {', '.join(STAGE_TIMING)}, not {stage_timing!r}")
+        self.stage_timing = stage_timing
+        self.local = threading.local()
+        self.shards = [] #shards of live threads
+        self.retired = Shard() #numbers of threads that have ended
+        self.lock = threading.Lock() #taken when a thread starts or ends and by scrapes, never per request
+
+    #function to get the calling thread's shard, made on its first request
+    def shard(self):
+        try:
+            return self.local.shard
+        except AttributeError:
+            pass
+        shard = self.local.shard = Shard()
+        self.local.marker = ThreadShard()
+        weakref.finalize(self.local.marker, self.retire, shard)
+        with self.lock:
+            self.shards.append(shard)
+        return shard
+
+    #function to fold the shard of a thread that has ended into the retired shard
+    def retire(self, shard):
+        with self.lock:
+            if shard in self.shards:
+                self.shards.remove(shard)
+                self.retired.merge(shard)
+
+    #function to record one request: its route, response status and duration in nanoseconds
+    def request(self, route, status, duration):
+        try:
+            routes = self.local.shard.routes
+        except AttributeError:
+            routes = self.shard().routes
+        entry = routes.get(route)
+        if entry is None:
+            entry = routes[route] = new_route()
+        entry[bisect_left(LATENCY_NS, duration)] += 1
+        entry[LATENCY_SUM] += duration
+        statuses = entry[STATUSES]
+        statuses[status] = statuses.get(status, 0) + 1
+
+    #function to record how long validating, parsing and scoring one receipt took, in nanoseconds
+    def scoring(self, duration):
+        try:
+            shard = self.local.shard
+        except AttributeError:
+            shard = self.shard()
+        histogram = shard.scoring
+        histogram[bisect_left(SCORING_NS, duration)] += 1
+        histogram[-1] += duration
+
+    #function to give a StageTimer for a request when stage timing is on, None otherwise
+    def timer(self):
+        return None if self.stage_timing == "off" else StageTimer()
+
+    #function to record the stages a StageTimer timed for one request of a route
+    def stages(self, route, timer):
+        try:
+            stages = self.local.shard.stages
+        except AttributeError:
+            stages = self.shard().stages
+        for stage, duration in timer.stages.items():
+            histogram = stages.get((route, stage))
+            if histogram is None:
+                histogram = stages[(route, stage)] = [0] * (len(STAGE_NS) + 2)
+            histogram[bisect_left(STAGE_NS, duration)] += 1
+            histogram[-1] += duration
+
+    #function to summarize the stage histograms: route -> stage -> count, mean and estimated
+    #p50 and p99 (the upper bound of the bucket they fall in, None past the last bound)
+    def stage_summary(self):
+        summary = {}
+        for (route, stage), histogram in sorted(self.totals().stages.items()):
+            count = sum(histogram[:-1])
+            if not count:
+                continue
+            summary.setdefault(route, {})[stage] = {
+                "count": count,
+                "mean_us": round(histogram[-1] / count / 1000, 3),
+                "p50_us": bucket_quantile(histogram, count, 0.5),
+                "p99_us": bucket_quantile(histogram, count, 0.99),
+            }
+        return summary
+
+    #function to add up every shard, the numbers as of now
+    def totals(self):
+        total = Shard()
+        with self.lock:
+            total.merge(self.retired)
+            for shard in self.shards:
+                total.merge(shard)
+        return total
+
+    #function to render every metric in the Prometheus text format, store_size is the number
+    #of stored receipts
+    def render(self, store_size):
+        total = self.totals()
+        routes = sorted(total.routes.items())
+        lines = ["# HELP receipt_http_requests_total Requests handled, by route and response status.",
+                 "# TYPE receipt_http_requests_total counter"]
+        errors = {}
+        for route, entry in routes:
+            for status, count in sorted(entry[STATUSES].items()):
+                lines.append(f'receipt_http_requests_total{{route="{route}",status="{status}"}} {count}')
+                if status >= 400:
+                    errors[status] = errors.get(status, 0) + count
+        lines += ["# HELP receipt_http_errors_total Requests answered with an error status (4xx and 5xx).",
+                  "# TYPE receipt_http_errors_total counter"]
+        for status, count in sorted(errors.items()):
+            lines.append(f'receipt_http_errors_total{{status="{status}"}} {count}')
+        lines += ["# HELP receipt_http_request_duration_seconds Time to handle a request, by route.",
+                  "# TYPE receipt_http_request_duration_seconds histogram"]
+        for route, entry in routes:
+            lines += render_histogram("receipt_http_request_duration_seconds", f'route="{route}",', LATENCY_BUCKETS, entry[:STATUSES])
+        lines += ["# HELP receipt_scoring_duration_seconds Time to validate, parse and score one submitted receipt.",
+                  "# TYPE receipt_scoring_duration_seconds histogram"]
+        lines += render_histogram("receipt_scoring_duration_seconds", "", SCORING_BUCKETS, total.scoring)
+        lines += ["# HELP receipt_stage_duration_seconds Time spent in each stage of a request, by route (with stage timing on).",
+                  "# TYPE receipt_stage_duration_seconds histogram"]
+        for (route, stage), histogram in sorted(total.stages.items()):
+            lines += render_histogram("receipt_stage_duration_seconds", f'route="{route}",stage="{stage}",', STAGE_BUCKETS, histogram)
+        lines += ["# HELP receipt_store_receipts Receipts in the store.",
+                  "# TYPE receipt_store_receipts gauge",
+                  f"receipt_store_receipts {store_size}"]
+        return "\n".join(lines) + "\n"
+
+#function to render the lines of one histogram (bucket counts, the +Inf count, then the sum in
+#nanoseconds), labels is "" or label pairs ending in a comma
+def render_histogram(name, labels, bounds, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(bounds, histogram):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+    cumulative += histogram[len(bounds)]
+    lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {cumulative}')
+    labels = labels.rstrip(",")
+    labels = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{labels} {histogram[-1] / 1e9}")
+    lines.append(f"{name}_count{labels} {cumulative}")
+    return lines
+
+#function to estimate a quantile of a stage histogram, in microseconds
+def bucket_quantile(histogram, count, quantile):
+    rank = quantile * count
+    seen = 0
+    for bound, bucket in zip(STAGE_BUCKETS, histogram):
+        seen += bucket
+        if seen >= rank:
+            return round(bound * 1e6, 3)
+    return None
+
+#function to read the stage timing setting from the environment
+#  RECEIPT_STAGE_TIMING : off (default), on, or header to also send a Server-Timing header
+def stage_timing_from_environment(environ=os.environ):
+    return environ.get("RECEIPT_STAGE_TIMING", "off")
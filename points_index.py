@@ -0,0 +1,225 @@
+#on-disk points index over an append-only receipt log
+#read-heavy traffic mostly asks for points, not receipts: the index maps the 16 id bytes to the
+#points and to the offset and length of the receipt's line in the log, in an open-addressing hash
+#table in a memory-mapped file, so a points lookup is a few reads from the page cache with no
+#json decoding; the full receipt is read from the log only when it is asked for
+#
+#index file layout:
+#  header : magic, slot capacity, receipt count, log bytes covered, clean flag
+#  slots  : capacity fixed-size slots (16-byte receipt id, log offset, line length, points)
+#
+#the log is the source of truth: the index is marked dirty while open and clean on close, and a
+#dirty index (a crash) or one that does not match the log is rebuilt from the log on open
+#one process writes a log and its index; usage: python points_index.py receipts.log [receipts.log.index]
+import atexit
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from functools import lru_cache
+
+from storage import ReceiptStore, StoredReceipt
+from ids import key_bytes, key_from_bytes
+from shm_store import EMPTY, StoreFullError
+from wal import WriteAheadLog, decode_entry
+
+MAGIC = b"RCPTIDX1"
+HEADER = struct.Struct("<8sQQQQ")
+HEADER_SIZE = 64
+SLOT = struct.Struct("<16sQIq")
+NO_POINTS = -(1 << 63) #points None, or too large for the slot: read them from the log
+MAX_LOAD = 0.75 #share of slots that may be used before the index counts as full
+
+class PointsIndex:
+    """ hash table from receipt id bytes to (log offset, line length, points),
+    in a memory-mapped file """
+
+    def __init__(self, path, capacity=1 << 22):
+        if capacity < 2 or capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size == 0:
+            os.ftruncate(self.fd, HEADER_SIZE + capacity * SLOT.size)
+            os.pwrite(self.fd, HEADER.pack(MAGIC, capacity, 0, 0, 1), 0)
+        magic, capacity, _, _, _ = HEADER.unpack(os.pread(self.fd, HEADER.size, 0))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a receipt points index")
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.map = mmap.mmap(self.fd, HEADER_SIZE + capacity * SLOT.size)
+        _, _, self.count, self.log_bytes, self.clean = HEADER.unpack_from(self.map, 0)
+
+    #function to write the in-memory header fields to the file
+    def write_header(self):
+        HEADER.pack_into(self.map, 0, MAGIC, self.capacity, self.count, self.log_bytes, self.clean)
+
+    #function to find the slot of key, or the empty slot where it would go (linear probing)
+    #the last 8 id bytes are random for every uuid version, so they spread ids evenly
+    def find(self, key):
+        index = int.from_bytes(key[8:], "little") & self.mask
+        while True:
+            position = HEADER_SIZE + index * SLOT.size
+            slot_key = self.map[position:position + 16]
+            if slot_key == key or slot_key == EMPTY:
+                return position, slot_key == key
+            index = (index + 1) & self.mask
+
+    #function to point key at a log line; callers serialize writers
+    #the whole slot is written with one slice assignment, so readers in other threads (which
+    #take no lock) see the old slot or the new one, never a mix
+    def put(self, key, offset, length, points):
+        position, exists = self.find(key)
+        if not exists:
+            if self.count + 1 > self.capacity * MAX_LOAD:
+                raise StoreFullError("no free slots left in the points index")
+            self.count += 1
+        if points is None or not NO_POINTS < points < 1 << 63:
+            points = NO_POINTS
+        self.map[position:position + SLOT.size] = SLOT.pack(key, offset, length, points)
+
+    #function to look key up, returns (offset, length, points) or None
+    def lookup(self, key):
+        position, exists = self.find(key)
+        if not exists:
+            return None
+        _, offset, length, points = SLOT.unpack_from(self.map, position)
+        return offset, length, points
+
+    #function to yield (key, offset, length, points) for every used slot, skipping blocks of
+    #slots that are still all zero bytes
+    def slots(self):
+        block = 1024
+        unused = bytes(block * SLOT.size)
+        for first in range(0, self.capacity, block):
+            start = HEADER_SIZE + first * SLOT.size
+            slots = self.map[start:start + min(block, self.capacity - first) * SLOT.size]
+            if slots == unused[:len(slots)]:
+                continue
+            for slot in SLOT.iter_unpack(slots):
+                if slot[0] != EMPTY:
+                    yield slot
+
+    #function to empty the index; truncating and regrowing the file zeroes it without writing
+    #every slot (and leaves it sparse)
+    def clear(self):
+        size = HEADER_SIZE + self.capacity * SLOT.size
+        self.map.close()
+        os.ftruncate(self.fd, 0)
+        os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, size)
+        self.count = self.log_bytes = 0
+        self.write_header()
+
+    #function to record whether the index matches log_bytes of the log, and write it out
+    def mark(self, clean):
+        self.clean = int(clean)
+        self.write_header()
+        self.map.flush()
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            os.close(self.fd)
+            self.map = None
+
+#function to (re)build an index from every entry of a receipt log
+def rebuild_index(index, log_path):
+    index.clear()
+    for offset, length, (receipt_id, _, points) in WriteAheadLog.scan(log_path):
+        key = key_bytes(receipt_id)
+        if key is not None:
+            index.put(key, offset, length, points)
+    #scan has cut off a torn last line, what is left (skipped damaged lines included) is covered
+    index.log_bytes = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+    return index
+
+class IndexedLogStore(ReceiptStore):
+    """ receipt store on disk: receipts are appended to a log,
+    the points index finds them (and answers points lookups on its own) """
+
+    blocking_reads = blocking_writes = True #receipts are read from and appended to the log file
+
+    def __init__(self, path, index_path=None, capacity=1 << 22, fsync="interval", interval_ms=10):
+        self.index = PointsIndex(index_path or path + ".index", capacity)
+        log_bytes = os.path.getsize(path) if os.path.exists(path) else 0
+        if not self.index.clean or self.index.log_bytes != log_bytes:
+            rebuild_index(self.index, path) #crashed while open, or the log changed behind the index
+        self.index.mark(clean=False)
+        self.log = WriteAheadLog(path, fsync, interval_ms)
+        self.reader = os.open(path, os.O_RDONLY)
+        self.write_lock = threading.Lock() #one log append and index update at a time
+        #log lines never change, so a decoded line at a given offset stays valid
+        self.decode = lru_cache(maxsize=65536)(self.decode_at)
+        self.closed = False
+        atexit.register(self.close) #a clean close spares the next start a rebuild
+
+    def put(self, receipt_id, receipt, points):
+        key = key_bytes(receipt_id)
+        if key is None:
+            raise ValueError(f"not a receipt id: {receipt_id!r}")
+        with self.write_lock:
+            offset = self.log.size
+            sequence = self.log.write(receipt_id, receipt, points)
+            self.log.flush() #readable through self.reader from here on
+            self.index.put(key, offset, self.log.size - offset, points)
+        self.log.commit(sequence)
+
+    def decode_at(self, offset, length):
+        _, receipt, points = decode_entry(os.pread(self.reader, length, offset))
+        return StoredReceipt(receipt, points)
+
+    def get(self, receipt_id):
+        key = key_bytes(receipt_id)
+        found = key and self.index.lookup(key)
+        if not found:
+            return None
+        return self.decode(found[0], found[1])
+
+    #answered from the index alone, the log is read only for points the slot cannot hold
+    def get_points(self, receipt_id):
+        key = key_bytes(receipt_id)
+        found = key and self.index.lookup(key)
+        if not found:
+            return None
+        if found[2] == NO_POINTS:
+            return self.decode(found[0], found[1]).points
+        return found[2]
+
+    def contains(self, receipt_id):
+        key = key_bytes(receipt_id)
+        return key is not None and self.index.lookup(key) is not None
+
+    def count(self):
+        return self.index.count
+
+    def iterate(self):
+        for key, offset, length, _ in self.index.slots():
+            yield key_from_bytes(key), self.decode(offset, length)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        with self.write_lock:
+            self.log.close()
+            os.close(self.reader)
+            self.decode.cache_clear()
+            self.index.log_bytes = self.log.size
+            self.index.mark(clean=True)
+            self.index.close()
+        atexit.unregister(self.close)
+
+#function to rebuild the index of a receipt log from the command line
+def main(argv=sys.argv[1:]):
+    log_path = argv[0]
+    index_path = argv[1] if len(argv) > 1 else log_path + ".index"
+    index = rebuild_index(PointsIndex(index_path), log_path)
+    index.mark(clean=True)
+    print(json.dumps({"receipts": index.count, "log_bytes": index.log_bytes}))
+    index.close()
+
+if __name__ == "__main__":
+    main()
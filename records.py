@@ -0,0 +1,93 @@
+#compact in-memory representation of a stored receipt
+#a raw json receipt is a dict of strings plus a list of item dicts, several hundred bytes before
+#counting the strings; a ReceiptRecord is one slotted object with interned strings, money as
+#integer cents and item prices packed into a single array of 64-bit ints, plus the points each
+#scoring rule awarded it (scoring.RULE_NAMES order) packed into a small array of 32-bit ints
+from array import array
+from sys import intern
+
+#function to format integer cents as an amount string like "12.25"
+def format_cents(cents):
+    return f"{cents // 100}.{cents % 100:02d}"
+
+#function to rebuild a record from its state() fields, as logs and snapshots store them
+#stores written before records.py hold 5 fields, with items as (description, cents) pairs, and
+#stores written before breakdowns hold 6
+def record_from_state(state):
+    if len(state) == 5:
+        retailer, date, time, total_cents, items = state
+        state = (retailer, date, time, total_cents, [item[0] for item in items], [item[1] for item in items])
+    return ReceiptRecord(*state)
+
+class ReceiptRecord:
+    """ compact stored form of a validated receipt,
+    readable like the json receipt dict through get() and [] """
+
+    __slots__ = ("retailer", "purchaseDate", "purchaseTime", "total_cents", "descriptions", "prices", "breakdown")
+
+    def __init__(self, retailer, purchaseDate, purchaseTime, total_cents, descriptions, prices, breakdown=None):
+        #retailers, dates, times and item names repeat across receipts, interning stores each once
+        self.retailer = intern(retailer)
+        self.purchaseDate = intern(purchaseDate)
+        self.purchaseTime = intern(purchaseTime)
+        self.total_cents = total_cents
+        self.descriptions = tuple(map(intern, descriptions))
+        if isinstance(prices, array):
+            self.prices = prices
+        else:
+            try:
+                self.prices = array("q", prices)
+            except OverflowError:
+                self.prices = tuple(prices) #prices beyond 64 bits stay python ints
+        #points per rule computed at ingest, None for records scored before breakdowns were kept
+        if breakdown is None or isinstance(breakdown, array):
+            self.breakdown = breakdown
+        else:
+            try:
+                self.breakdown = array("i", breakdown)
+            except OverflowError:
+                self.breakdown = tuple(breakdown)
+
+    #(description, price_cents) pairs of the items
+    @property
+    def items(self):
+        return tuple(zip(self.descriptions, self.prices))
+
+    #function to give the fields as a plain tuple, the form snapshots and logs store
+    def state(self):
+        return (self.retailer, self.purchaseDate, self.purchaseTime, self.total_cents, self.descriptions, self.prices, self.breakdown)
+
+    #function to rebuild the json receipt dict
+    def to_dict(self):
+        return {
+            "retailer": self.retailer,
+            "purchaseDate": self.purchaseDate,
+            "purchaseTime": self.purchaseTime,
+            "items": [{"shortDescription": description, "price": format_cents(cents)}
+                      for description, cents in zip(self.descriptions, self.prices)],
+            "total": format_cents(self.total_cents),
+        }
+
+    #read access by json field name, so code written for receipt dicts (like points_calculator) works
+    def __getitem__(self, key):
+        if key == "total":
+            return format_cents(self.total_cents)
+        if key == "items":
+            return self.to_dict()["items"]
+        if key in ("retailer", "purchaseDate", "purchaseTime"):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other):
+        if not isinstance(other, ReceiptRecord):
+            return NotImplemented
+        return self.state()[:4] == other.state()[:4] and self.items == other.items
+
+    def __repr__(self):
+        return f"ReceiptRecord({self.retailer!r}, {self.purchaseDate!r}, {self.purchaseTime!r}, {self.total_cents}, {len(self.descriptions)} items)"
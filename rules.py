@@ -0,0 +1,198 @@
+#declarative scoring rules and the compiler that turns a rule set into one python function
+#each rule is a small object saying what it awards (which field, what condition, how many points)
+#and how to write itself as python source; compile_rules generates a single function for a whole
+#rule set, reading and converting every field once, running the receipt rules straight through and
+#the item rules in one shared loop over the items, and compiles it once
+#
+#RULES is the rule set of the service, written to give exactly what points_calculator gives
+#(float total and prices included, see test_rules.py), and score_receipt is RULES compiled. an item
+#price is only read when its description scores, so unlike points_calculator a bad price on an
+#item that scores nothing raises no ValueError (validated receipts never have one)
+import math
+import re
+
+#function to parse an "HH:MM" time into an (hour, minute) tuple
+def clock(text):
+    hour, minute = text.split(":")
+    return int(hour), int(minute)
+
+#points for every character of a string field that is in a character class, like [a-zA-Z0-9]
+class CharacterCount:
+    collection = None
+
+    def __init__(self, field, characters, points=1):
+        self.field = field
+        self.characters = characters
+        self.points = points
+
+    def source(self, function):
+        value = function.field(self.field, "")
+        others = function.constant(re.compile(f"[^{self.characters}]"))
+        return [f"{function.target} += len({others}.sub('', {value})){function.times(self.points)}"]
+
+#points when an amount field (read as a float) is a multiple of some amount, like 0.25
+class AmountMultiple:
+    collection = None
+
+    def __init__(self, field, multiple, points):
+        self.field = field
+        self.multiple = multiple
+        self.points = points
+
+    def source(self, function):
+        value = function.field(self.field, "0", float)
+        return [f"if {value} % {self.multiple!r} == 0:",
+                f"    {function.target} += {self.points}"]
+
+#points for every full group of entries in a list field, like 5 for every two items
+class PerGroup:
+    collection = None
+
+    def __init__(self, field, size, points):
+        self.field = field
+        self.size = size
+        self.points = points
+
+    def source(self, function):
+        entries = function.field(self.field, [])
+        return [f"{function.target} += len({entries}) // {self.size} * {self.points}"]
+
+#points when the day of a YYYY-MM-DD date field is odd
+class OddDay:
+    collection = None
+
+    def __init__(self, field, points):
+        self.field = field
+        self.points = points
+
+    def source(self, function):
+        date = function.field(self.field, "")
+        return [f"if {date} and int({date}[{date}.rfind('-') + 1:]) % 2 == 1:",
+                f"    {function.target} += {self.points}"]
+
+#points when an HH:MM time field is strictly between two times
+class TimeBetween:
+    collection = None
+
+    def __init__(self, field, after, before, points):
+        self.field = field
+        self.after = clock(after)
+        self.before = clock(before)
+        self.points = points
+
+    def source(self, function):
+        time = function.field(self.field, "")
+        hour, minute = function.local(), function.local()
+        return [f"if {time}:",
+                f"    {hour}, {minute} = {time}.split(':')",
+                f"    if {self.after!r} < (int({hour}), int({minute})) < {self.before!r}:",
+                f"        {function.target} += {self.points}"]
+
+#points for each entry of a list field whose trimmed description length is a multiple of some
+#number: the entry's amount (read as a float) times a rate, rounded up
+class DescriptionLength:
+    def __init__(self, collection, description, multiple, amount, rate):
+        self.collection = collection
+        self.description = description
+        self.multiple = multiple
+        self.amount = amount
+        self.rate = rate
+
+    def source(self, function):
+        description = function.field(self.description, "", collection=self.collection)
+        amount = function.value(self.amount, "0", float, collection=self.collection) #read only when it scores
+        return [f"if len({description}.strip()) % {self.multiple} == 0:",
+                f"    {function.target} += ceil({amount} * {self.rate!r})"]
+
+#The rules for awarding points, in the order of points_calculator
+RULES = (
+    #Rule 1 : One point for every alphanumeric character in the retailer name.
+    CharacterCount("retailer", "a-zA-Z0-9"),
+    #Rule 2 : 50 points if the total is a round dollar amount with no cents.
+    AmountMultiple("total", 1.0, 50),
+    #Rule 3 : 25 points if the total is a multiple of 0.25.
+    AmountMultiple("total", 0.25, 25),
+    #Rule 4 : 5 points for every two items on the receipt.
+    PerGroup("items", 2, 5),
+    #Rule 5 : 20% of the price rounded up, for trimmed descriptions whose length is a multiple of 3.
+    DescriptionLength("items", "shortDescription", 3, "price", 0.2),
+    #Rule 6 : 6 points if the day in the purchase date is odd.
+    OddDay("purchaseDate", 6),
+    #Rule 7 : 10 points if the time of purchase is after 2:00pm and before 4:00pm.
+    TimeBetween("purchaseTime", "14:00", "16:00", 10),
+)
+
+#the function being generated: the fields it reads, the constants it uses and its local names
+class Function:
+    def __init__(self):
+        self.namespace = {"ceil": math.ceil}
+        self.fields = {} #(collection, field, convert) -> local name
+        self.reads = {None: []} #collection -> lines reading its fields, None is the receipt
+        self.count = 0
+        self.target = "points" #the local the rule being compiled adds its points to
+
+    #function to get a new local variable name
+    def local(self):
+        self.count += 1
+        return f"v{self.count}"
+
+    #function to add a constant (a compiled pattern, a converter) to the namespace, returns its name
+    def constant(self, value):
+        name = self.local()
+        self.namespace[name] = value
+        return name
+
+    #function to write the expression reading a field of the receipt (or of an entry of a
+    #collection); missing fields read as default, like points_calculator's .get calls
+    def value(self, name, default, convert=None, collection=None):
+        value = f"{'receipt' if collection is None else 'item'}.get({name!r}, {default!r})"
+        if convert is not None:
+            value = f"{self.constant(convert)}({value})"
+        return value
+
+    #function to read a field once at the top of the function (or of the loop over its
+    #collection), returns the local name holding it
+    def field(self, name, default, convert=None, collection=None):
+        key = (collection, name, convert)
+        if key not in self.fields:
+            self.fields[key] = self.local()
+            self.reads.setdefault(collection, []).append(f"{self.fields[key]} = {self.value(name, default, convert, collection)}")
+        return self.fields[key]
+
+    #function to write a multiplication by points, nothing for 1
+    def times(self, points):
+        return "" if points == 1 else f" * {points}"
+
+#function to compile a rule set into one function of a receipt dict that returns its points, or
+#with breakdown the list of the points each rule awards (in rule order)
+#the generated source is kept on the function as .source
+def compile_rules(rules, name="score_receipt", breakdown=False):
+    function = Function()
+    bodies = {None: []}
+    targets = []
+    for rule in rules:
+        if breakdown:
+            function.target = function.local()
+            targets.append(function.target)
+        bodies.setdefault(rule.collection, []).extend(rule.source(function))
+    loops = {collection: function.field(collection, []) for collection in bodies if collection is not None}
+
+    lines = [f"def {name}(receipt):"]
+    lines += [f"    {target} = 0" for target in targets or ["points"]]
+    lines += ["    " + line for line in function.reads[None] + bodies[None]]
+    for collection, entries in loops.items():
+        lines.append(f"    for item in {entries}:")
+        lines += ["        " + line for line in function.reads.get(collection, []) + bodies[collection]]
+    lines.append(f"    return [{', '.join(targets)}]" if breakdown else "    return points")
+
+    source = "\n".join(lines) + "\n"
+    exec(compile(source, f"<rules {name}>", "exec"), function.namespace)
+    scorer = function.namespace[name]
+    scorer.source = source
+    return scorer
+
+#The service's rules compiled, gives what points_calculator gives for a receipt dict
+score_receipt = compile_rules(RULES)
+
+#The points of each rule for a receipt dict, in scoring.RULE_NAMES order
+breakdown_receipt = compile_rules(RULES, name="breakdown_receipt", breakdown=True)
@@ -0,0 +1,66 @@
+#exact integer scoring path
+#money is parsed once into integer cents when a receipt is submitted, and the rules are
+#evaluated on that parsed form with integer arithmetic only (no float, no modulo on 0.25)
+import re
+
+from records import ReceiptRecord
+
+NON_ALPHANUMERIC = re.compile(r"[^a-zA-Z0-9]")
+
+#function to convert an amount like "12.25" into integer cents (1225)
+def to_cents(amount):
+    whole, _, cents = amount.partition(".")
+    return int(whole or "0") * 100 + int((cents + "00")[:2])
+
+#function to parse a validated receipt dict into its compact ReceiptRecord (see records.py)
+def parse_receipt(receipt):
+    items = receipt["items"]
+    return ReceiptRecord(
+        receipt["retailer"],
+        receipt["purchaseDate"],
+        receipt["purchaseTime"],
+        to_cents(receipt["total"]),
+        [item["shortDescription"] for item in items],
+        [to_cents(item["price"]) for item in items],
+    )
+
+#Names of the scoring rules, in the order of every per-rule breakdown (see breakdown_cents)
+RULE_NAMES = ("retailer_name", "round_dollar_total", "quarter_multiple_total", "item_pairs",
+              "item_descriptions", "odd_day", "afternoon_time")
+
+#function to award points for a ReceiptRecord using integer arithmetic only
+def score_cents(parsed):
+    return sum(breakdown_cents(parsed))
+
+#function to give the points each rule awards a ReceiptRecord, in RULE_NAMES order
+def breakdown_cents(parsed):
+    #Rule 1 : One point for every alphanumeric character in the retailer name.
+    retailer = len(NON_ALPHANUMERIC.sub("", parsed.retailer))
+
+    #Rule 2 : 50 points if the total is a round dollar amount with no cents.
+    total = parsed.total_cents
+    round_dollar = 50 if total % 100 == 0 else 0
+
+    #Rule 3 : 25 points if the total is a multiple of 0.25.
+    quarter = 25 if total % 25 == 0 else 0
+
+    #Rule 4 : 5 points for every two items on the receipt.
+    descriptions = parsed.descriptions
+    pairs = (len(descriptions) // 2) * 5
+
+    #Rule 5 : 20% of the price rounded up, for trimmed descriptions whose length is a multiple of 3.
+    #ceil(cents / 100 * 0.2) == ceil(cents / 500) == (cents + 499) // 500
+    items = 0
+    for description, cents in zip(descriptions, parsed.prices):
+        if len(description.strip()) % 3 == 0:
+            items += (cents + 499) // 500
+
+    #Rule 6 : 6 points if the day in the purchase date is odd.
+    odd_day = 6 if int(parsed.purchaseDate[8:10]) % 2 == 1 else 0
+
+    #Rule 7 : 10 points if the time of purchase is after 2:00pm and before 4:00pm (14:01 to 15:59).
+    time = parsed.purchaseTime
+    minute_of_day = int(time[0:2]) * 60 + int(time[3:5])
+    afternoon = 10 if 840 < minute_of_day < 960 else 0
+
+    return [retailer, round_dollar, quarter, pairs, items, odd_day, afternoon]
@@ -0,0 +1,50 @@
+#production serving entry point
+#runs the Flask app under gunicorn (multiple worker processes, each with a pool of threads)
+#instead of the single-process Werkzeug development server that `python app.py` starts
+#
+#configuration from environment variables:
+#  HOST, PORT         : address to listen on (default 0.0.0.0:5000)
+#  WEB_WORKERS        : worker processes (default 1, see below)
+#  WEB_THREADS        : threads per worker (default 8)
+#  WEB_KEEPALIVE      : seconds to hold idle keep-alive connections open (default 5)
+#  WEB_BACKLOG        : pending connections the listen socket queues (default 2048)
+#  WEB_TIMEOUT        : seconds before a stuck worker is restarted (default 30)
+#
+#receipts live in the memory of the worker that accepted them, so more than one worker only
+#makes sense with a storage engine the workers share (RECEIPT_STORE=shm); that is why WEB_WORKERS
+#defaults to 1
+import os
+
+#function to build the gunicorn settings from the environment
+def server_config(environ=os.environ):
+    return {
+        "bind": f'{environ.get("HOST", "0.0.0.0")}:{environ.get("PORT", "5000")}',
+        "workers": int(environ.get("WEB_WORKERS", "1")),
+        "worker_class": "gthread",
+        "threads": int(environ.get("WEB_THREADS", "8")),
+        "keepalive": int(environ.get("WEB_KEEPALIVE", "5")),
+        "backlog": int(environ.get("WEB_BACKLOG", "2048")),
+        "timeout": int(environ.get("WEB_TIMEOUT", "30")),
+        "accesslog": environ.get("WEB_ACCESS_LOG"), #off unless a path (or - for stdout) is given
+        #the app is imported in each worker, not preloaded in the master, so every worker opens
+        #its own store and starts its own background threads after the fork
+        "preload_app": False,
+    }
+
+def main():
+    from gunicorn.app.base import BaseApplication #gunicorn only runs on unix
+
+    class ReceiptServer(BaseApplication):
+        def load_config(self):
+            for key, value in server_config().items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            from app import app
+            return app
+
+    ReceiptServer().run()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+#receipt store shared by every worker process on a node
+#a fixed-layout open-addressing hash table in a memory-mapped file: put the file on a tmpfs
+#like /dev/shm and it is plain shared memory, so a receipt posted to one worker is readable
+#from every other worker without a network hop
+#
+#file layout:
+#  header : magic, slot capacity, data region size, data bytes used, receipt count
+#  slots  : capacity fixed-size slots (16-byte receipt id, data offset, length, version, points)
+#  data   : receipts as compact json, appended and never moved
+#
+#writers are serialized with an flock on the file (plus a thread lock inside each process);
+#readers take no lock and use the per-slot version as a seqlock, retrying if a writer was
+#in the middle of updating the slot (unix only, like the gunicorn server that runs the workers)
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+from ids import key_bytes, key_from_bytes
+from storage import ReceiptStore, StoredReceipt
+from wal import encode_receipt, decode_receipt
+
+MAGIC = b"RCPTSHM1"
+HEADER = struct.Struct("<8sQQQQ")
+HEADER_SIZE = 64
+SLOT = struct.Struct("<16sQIIq")
+VERSION = struct.Struct("<I")
+VERSION_OFFSET = 28 #position of the version inside a slot
+EMPTY = bytes(16)
+NO_POINTS = -(1 << 63) #stands for points None
+MAX_LOAD = 0.75 #share of slots that may be used before the table counts as full
+SPINS = 1000 #lock-free read attempts before a reader waits for the writers' lock instead
+VERSION_MASK = 0xFFFFFFFF
+
+class StoreFullError(Exception):
+    pass
+
+class SharedMemoryStore(ReceiptStore):
+    """ receipt store in a memory-mapped file,
+    shared by every process that opens the same path """
+
+    blocking_writes = True #writers wait for the flock held by other processes
+
+    #the defaults (about 57 MB) fit the 64 MB /dev/shm docker gives a container; raise them
+    #together with the container's --shm-size
+    def __init__(self, path, capacity=1 << 18, data_bytes=48 << 20):
+        if capacity < 2 or capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.lock = threading.Lock()
+        with self.writing():
+            if os.fstat(self.fd).st_size == 0:
+                #first process to open the file lays it out, later ones use its layout
+                size = HEADER_SIZE + capacity * SLOT.size + data_bytes
+                os.ftruncate(self.fd, size)
+                if hasattr(os, "posix_fallocate"):
+                    #reserve every page now: a tmpfs that is too small fails here with ENOSPC
+                    #instead of killing a worker with SIGBUS on some later write
+                    try:
+                        os.posix_fallocate(self.fd, 0, size)
+                    except OSError:
+                        os.ftruncate(self.fd, 0) #leave no half-made store behind for the next process
+                        raise
+                os.pwrite(self.fd, HEADER.pack(MAGIC, capacity, data_bytes, 0, 0), 0)
+            magic, capacity, data_bytes, _, _ = HEADER.unpack(os.pread(self.fd, HEADER.size, 0))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a shared receipt store")
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.data_bytes = data_bytes
+        self.data_start = HEADER_SIZE + capacity * SLOT.size
+        self.map = mmap.mmap(self.fd, self.data_start + data_bytes)
+        #data is append-only, so a decoded receipt at a given offset never changes
+        self.decode = lru_cache(maxsize=65536)(self.decode_at)
+
+    #writers hold the thread lock of their process, then the flock shared by all processes
+    #(an flock alone would not stop two threads using the same file descriptor)
+    @contextmanager
+    def writing(self):
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    #function to find the slot of key, or the empty slot where it would go (linear probing)
+    #the last 8 id bytes are random for every uuid version, so they spread ids evenly
+    def find(self, key):
+        index = int.from_bytes(key[8:], "little") & self.mask
+        while True:
+            position = HEADER_SIZE + index * SLOT.size
+            slot_key = self.map[position:position + 16]
+            if slot_key == key or slot_key == EMPTY:
+                return position, slot_key == key
+            index = (index + 1) & self.mask
+
+    def put(self, receipt_id, receipt, points):
+        key = key_bytes(receipt_id)
+        if key is None:
+            raise ValueError(f"not a receipt id: {receipt_id!r}")
+        payload = json.dumps(encode_receipt(receipt), separators=(",", ":")).encode()
+        points = NO_POINTS if points is None else points
+        with self.writing():
+            _, _, _, used, count = HEADER.unpack_from(self.map, 0)
+            position, exists = self.find(key)
+            if exists:
+                _, offset, length, version, _ = SLOT.unpack_from(self.map, position)
+                start = self.data_start + offset
+                if self.map[start:start + length] != payload:
+                    offset = None #changed receipt, append the new version (the old bytes stay unused)
+            else:
+                if count + 1 > self.capacity * MAX_LOAD:
+                    raise StoreFullError("no free slots left in the shared receipt store")
+                offset, version = None, 0
+                count += 1
+            if offset is None:
+                if used + len(payload) > self.data_bytes:
+                    raise StoreFullError("no data space left in the shared receipt store")
+                offset = used
+                start = self.data_start + offset
+                self.map[start:start + len(payload)] = payload
+                used += len(payload)
+            #odd version while the slot changes, readers that see it (or a changed version) retry
+            #starting from version | 1 keeps the parity right even if a writer died mid-update
+            #and left the version odd
+            changing = (version | 1) & VERSION_MASK
+            VERSION.pack_into(self.map, position + VERSION_OFFSET, changing)
+            SLOT.pack_into(self.map, position, key, offset, len(payload), changing, points)
+            VERSION.pack_into(self.map, position + VERSION_OFFSET, (changing + 1) & VERSION_MASK)
+            HEADER.pack_into(self.map, 0, MAGIC, self.capacity, self.data_bytes, used, count)
+
+    def get(self, receipt_id):
+        key = key_bytes(receipt_id)
+        if key is None:
+            return None
+        position, exists = self.find(key)
+        if not exists:
+            return None
+        return self.read_slot(position)
+
+    def read_slot(self, position):
+        for _ in range(SPINS):
+            key, offset, length, version, points = SLOT.unpack_from(self.map, position)
+            if version & 1:
+                continue #a writer is updating this slot right now
+            try:
+                receipt = self.decode(offset, length)
+            except (ValueError, TypeError, KeyError, IndexError):
+                continue #offset and length of two different writes, the version has moved on too
+            if VERSION.unpack_from(self.map, position + VERSION_OFFSET)[0] == version:
+                return StoredReceipt(receipt, None if points == NO_POINTS else points)
+        #still changing after every attempt: a writer died halfway through its update (its flock
+        #is gone with it), so read under the writers' lock and repair the version it left odd
+        with self.writing():
+            key, offset, length, version, points = SLOT.unpack_from(self.map, position)
+            if version & 1:
+                VERSION.pack_into(self.map, position + VERSION_OFFSET, (version + 1) & VERSION_MASK)
+            return StoredReceipt(self.decode(offset, length), None if points == NO_POINTS else points)
+
+    def decode_at(self, offset, length):
+        start = self.data_start + offset
+        return decode_receipt(json.loads(self.map[start:start + length]))
+
+    def contains(self, receipt_id):
+        key = key_bytes(receipt_id)
+        return key is not None and self.find(key)[1]
+
+    def count(self):
+        return HEADER.unpack_from(self.map, 0)[4]
+
+    #scans the slot table a block at a time, skipping blocks that are still all zero bytes,
+    #and re-reads the used slots through the seqlock
+    def iterate(self):
+        block = 1024
+        unused = bytes(block * SLOT.size)
+        for first in range(0, self.capacity, block):
+            start = HEADER_SIZE + first * SLOT.size
+            slots = self.map[start:start + min(block, self.capacity - first) * SLOT.size]
+            if slots == unused[:len(slots)]:
+                continue
+            for index, (key, *_) in enumerate(SLOT.iter_unpack(slots)):
+                if key != EMPTY:
+                    yield key_from_bytes(key), self.read_slot(start + index * SLOT.size)
+
+    def close(self):
+        if self.map is not None:
+            self.decode.cache_clear()
+            self.map.close()
+            os.close(self.fd)
+            self.map = None
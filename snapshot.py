@@ -0,0 +1,66 @@
+#snapshots of the receipt store
+#a snapshot is one compact binary file holding every stored receipt with its precomputed points,
+#written to a temporary file and atomically renamed so a crash never leaves a partial snapshot
+import os
+import pickle
+
+from records import ReceiptRecord, record_from_state
+
+MAGIC = b"RCPTSNP1"
+
+#entries are pickled in chunks so neither writing nor loading needs one huge pickle in memory
+CHUNK = 65536
+
+#function to write (receipt_id, StoredReceipt) pairs to a snapshot file, returns the number written
+def write_snapshot(path, entries):
+    temporary = path + ".tmp"
+    count = 0
+    with open(temporary, "wb") as file:
+        file.write(MAGIC)
+        chunk = []
+        for receipt_id, (receipt, points) in entries:
+            if isinstance(receipt, ReceiptRecord):
+                receipt = receipt.state() #plain tuples load much faster than pickled objects
+            chunk.append((receipt_id, receipt, points))
+            if len(chunk) == CHUNK:
+                pickle.dump(chunk, file, protocol=pickle.HIGHEST_PROTOCOL)
+                count += len(chunk)
+                chunk = []
+        pickle.dump(chunk, file, protocol=pickle.HIGHEST_PROTOCOL)
+        count += len(chunk)
+        pickle.dump(None, file) #end marker
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    sync_directory(path)
+    return count
+
+#function to read every (receipt_id, receipt, points) entry of a snapshot file
+def read_snapshot(path):
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a receipt snapshot")
+        load = pickle.load
+        while True:
+            chunk = load(file)
+            if chunk is None:
+                return
+            for receipt_id, receipt, points in chunk:
+                if isinstance(receipt, tuple):
+                    receipt = record_from_state(receipt) #also takes the 5-field layout of older snapshots
+                yield receipt_id, receipt, points
+
+#function to make a rename in the directory of path durable (a no-op where directories cannot be opened)
+def sync_directory(path):
+    try:
+        descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
@@ -0,0 +1,288 @@
+#receipt store in an SQLite database
+#a local durable store that can also be queried with plain SQL (receipts by points, by retailer,
+#by date) without building our own engine
+#
+#schema (normalized, one row per receipt and one row per item):
+#  receipts : number, id (unique, the 16 id bytes), retailer, purchase_date, purchase_time, total_cents, points (indexed),
+#             breakdown (the points per rule as packed 32-bit ints, NULL when not known)
+#  items    : receipt (the receipt number), position, short_description, price_cents
+#
+#the database runs in WAL journal mode so readers never block the writer: every thread reads
+#through its own connection, while writes go through one writer connection and are committed
+#in batches (every batch_size receipts or every commit_ms milliseconds, whichever comes first)
+#receipts written but not committed yet are kept in a small pending dict so they are readable
+#right away; a crash loses at most the last commit_ms of receipts, like the interval fsync
+#policy of the write-ahead log
+import atexit
+import sqlite3
+from array import array
+import threading
+import weakref
+
+from ids import key_bytes, key_from_bytes, parse_id
+from records import ReceiptRecord
+from scoring import parse_receipt
+from storage import ReceiptStore, StoredReceipt
+
+RECEIPTS_TABLE = """
+CREATE TABLE IF NOT EXISTS {} (
+    number INTEGER PRIMARY KEY,
+    id BLOB NOT NULL UNIQUE,
+    retailer TEXT NOT NULL,
+    purchase_date TEXT NOT NULL,
+    purchase_time TEXT NOT NULL,
+    total_cents INTEGER NOT NULL,
+    points INTEGER,
+    breakdown BLOB
+);
+"""
+SCHEMA = RECEIPTS_TABLE.format("receipts") + """
+CREATE TABLE IF NOT EXISTS items (
+    receipt INTEGER NOT NULL REFERENCES receipts (number),
+    position INTEGER NOT NULL,
+    short_description TEXT NOT NULL,
+    price_cents INTEGER NOT NULL,
+    PRIMARY KEY (receipt, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS receipts_by_points ON receipts (points);
+"""
+
+#databases written before ids were ints hold the uuid strings in a TEXT id column: the table is
+#copied into one with the 16 id bytes, in one transaction, the first time such a database is opened
+#(receipt numbers stay the same, so the items table is untouched)
+MIGRATE_TEXT_IDS = "BEGIN;" + RECEIPTS_TABLE.format("receipts_blob") + """
+INSERT INTO receipts_blob (number, id, retailer, purchase_date, purchase_time, total_cents, points)
+SELECT number, receipt_key(id), retailer, purchase_date, purchase_time, total_cents, points FROM receipts;
+DROP TABLE receipts;
+ALTER TABLE receipts_blob RENAME TO receipts;
+COMMIT;
+"""
+
+#databases written before breakdowns were kept get the column, NULL for the receipts already there
+ADD_BREAKDOWN = "ALTER TABLE receipts ADD COLUMN breakdown BLOB"
+
+#receipts and their items are keyed by an increasing receipt number rather than by the random
+#receipt id, so ingest appends to the end of both tables and only the id index takes random writes
+#statements are constant strings, so sqlite3 prepares each once per connection and reuses it
+SELECT_NUMBER = "SELECT number FROM receipts WHERE id = ?"
+INSERT_RECEIPT = "INSERT INTO receipts (id, retailer, purchase_date, purchase_time, total_cents, points, breakdown) VALUES (?, ?, ?, ?, ?, ?, ?)"
+UPDATE_RECEIPT = "UPDATE receipts SET retailer = ?, purchase_date = ?, purchase_time = ?, total_cents = ?, points = ?, breakdown = ? WHERE number = ?"
+DELETE_ITEMS = "DELETE FROM items WHERE receipt = ?"
+INSERT_ITEM = "INSERT INTO items VALUES (?, ?, ?, ?)"
+SELECT_RECEIPT = """
+SELECT r.retailer, r.purchase_date, r.purchase_time, r.total_cents, r.points, r.breakdown, i.short_description, i.price_cents
+FROM receipts r LEFT JOIN items i ON i.receipt = r.number
+WHERE r.id = ? ORDER BY i.position
+"""
+SELECT_ALL = """
+SELECT r.id, r.retailer, r.purchase_date, r.purchase_time, r.total_cents, r.points, r.breakdown, i.short_description, i.price_cents
+FROM receipts r LEFT JOIN items i ON i.receipt = r.number
+ORDER BY r.number, i.position
+"""
+SELECT_MANY = """
+SELECT r.id, r.retailer, r.purchase_date, r.purchase_time, r.total_cents, r.points, r.breakdown, i.short_description, i.price_cents
+FROM receipts r LEFT JOIN items i ON i.receipt = r.number
+WHERE r.id IN ({}) ORDER BY r.number, i.position
+"""
+MANY_CHUNK = 500 #ids per IN (...) query, under sqlite's limit on bound parameters
+SELECT_CONTAINS = "SELECT 1 FROM receipts WHERE id = ?"
+SELECT_COUNT = "SELECT COUNT(*) FROM receipts"
+SELECT_BY_POINTS = "SELECT id FROM receipts WHERE points BETWEEN ? AND ? ORDER BY points, number"
+
+#function to build a StoredReceipt from the rows of one receipt
+def stored_from_rows(rows):
+    retailer, date, time, total_cents, points, packed = rows[0][:6]
+    descriptions = [row[6] for row in rows if row[6] is not None]
+    prices = [row[7] for row in rows if row[6] is not None]
+    breakdown = None if packed is None else array("i", packed)
+    return StoredReceipt(ReceiptRecord(retailer, date, time, total_cents, descriptions, prices, breakdown), points)
+
+#function to group rows that start with the id bytes into (receipt id, StoredReceipt) pairs,
+#the rows of one receipt come one after the other
+def group_rows(rows):
+    key, grouped = None, []
+    for row in rows:
+        if row[0] != key:
+            if grouped:
+                yield key_from_bytes(key), stored_from_rows(grouped)
+            key, grouped = row[0], []
+        grouped.append(row[1:])
+    if grouped:
+        yield key_from_bytes(key), stored_from_rows(grouped)
+
+#function to turn a uuid string from an old TEXT id column into the 16 id bytes
+def text_id_bytes(text):
+    return key_bytes(parse_id(text))
+
+class ThreadReader:
+    """ marker kept in a thread's local storage next to its reader connection,
+    it goes away with the thread and takes the connection with it """
+
+class SQLiteStore(ReceiptStore):
+    """ receipt store in an SQLite database file,
+    readable by many threads at once with batched commits for ingest """
+
+    blocking_reads = blocking_writes = True #queries read the database file, commits write it
+
+    def __init__(self, path, batch_size=256, commit_ms=50):
+        self.path = path
+        self.batch_size = batch_size
+        self.local = threading.local() #per-thread reader connection
+        self.connections = [] #every connection opened, closed together
+        self.connections_lock = threading.Lock()
+        self.write_lock = threading.Lock() #one writer at a time, like sqlite itself
+        self.writer = self.connect()
+        columns = {row[1]: row[2] for row in self.writer.execute("PRAGMA table_info(receipts)")}
+        if columns.get("id") == "TEXT":
+            self.writer.create_function("receipt_key", 1, text_id_bytes, deterministic=True)
+            self.writer.executescript(MIGRATE_TEXT_IDS) #the new table has the breakdown column
+        elif columns and "breakdown" not in columns:
+            self.writer.execute(ADD_BREAKDOWN)
+        self.writer.executescript(SCHEMA)
+        self.pending = {} #receipt id -> StoredReceipt written since the last commit
+        self.closed = False
+        self.stopped = threading.Event()
+        self.committer = threading.Thread(target=self.commit_periodically, args=(commit_ms / 1000,),
+                                          name="sqlite-commit", daemon=True)
+        self.committer.start()
+        atexit.register(self.close)
+
+    #function to open a connection to the database in WAL mode
+    def connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False, cached_statements=64)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL") #WAL mode stays consistent after a crash with NORMAL
+        with self.connections_lock:
+            self.connections.append(connection)
+        return connection
+
+    #function to get the reader connection of the calling thread, opened on first use
+    #servers start and stop threads all the time, so the connection is closed when its thread ends
+    def reader(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.local.connection = self.connect()
+            self.local.marker = ThreadReader()
+            weakref.finalize(self.local.marker, self.release, connection)
+        return connection
+
+    def put(self, receipt_id, receipt, points):
+        if not isinstance(receipt, ReceiptRecord):
+            receipt = parse_receipt(receipt) #raw receipts from older stores are normalized on the way in
+        key = key_bytes(receipt_id)
+        if key is None:
+            raise ValueError(f"not a receipt id: {receipt_id!r}")
+        retailer, date, time, total_cents, descriptions, prices, breakdown = receipt.state()
+        #breakdowns past 32 bits stay python ints on the record and are not kept in the database
+        packed = breakdown.tobytes() if isinstance(breakdown, array) else None
+        with self.write_lock:
+            #the transaction stays open until the batch is committed, each receipt gets a savepoint
+            #inside it so a failed statement undoes that receipt alone and not the whole batch
+            writer = self.writer
+            if not writer.in_transaction:
+                writer.execute("BEGIN")
+            writer.execute("SAVEPOINT put")
+            try:
+                row = writer.execute(SELECT_NUMBER, (key,)).fetchone()
+                if row is None:
+                    number = writer.execute(INSERT_RECEIPT, (key, retailer, date, time, total_cents, points, packed)).lastrowid
+                else:
+                    number = row[0]
+                    writer.execute(UPDATE_RECEIPT, (retailer, date, time, total_cents, points, packed, number))
+                    writer.execute(DELETE_ITEMS, (number,))
+                writer.executemany(INSERT_ITEM, [(number, position, description, price)
+                                                 for position, (description, price) in enumerate(zip(descriptions, prices))])
+            except Exception:
+                writer.execute("ROLLBACK TO put")
+                writer.execute("RELEASE put")
+                raise
+            writer.execute("RELEASE put")
+            self.pending[receipt_id] = StoredReceipt(receipt, points)
+            if len(self.pending) >= self.batch_size:
+                self.commit_pending()
+
+    #function to commit the open batch, the caller holds write_lock
+    def commit_pending(self):
+        self.writer.commit()
+        #cleared only after the commit, so a reader always finds a receipt in one place or the other
+        self.pending = {}
+
+    #function to commit whatever is pending now
+    def flush(self):
+        with self.write_lock:
+            if self.pending:
+                self.commit_pending()
+
+    #function run by the committer thread
+    def commit_periodically(self, interval):
+        while not self.stopped.wait(interval):
+            self.flush()
+
+    def get(self, receipt_id):
+        stored = self.pending.get(receipt_id)
+        if stored is not None:
+            return stored
+        key = key_bytes(receipt_id)
+        if key is None:
+            return None
+        rows = self.reader().execute(SELECT_RECEIPT, (key,)).fetchall()
+        if not rows:
+            return None
+        return stored_from_rows(rows)
+
+    #one query per chunk of ids instead of one per id
+    def get_many(self, receipt_ids):
+        pending = self.pending
+        found = {receipt_id: pending[receipt_id] for receipt_id in receipt_ids if receipt_id in pending}
+        missing = list({key_bytes(receipt_id): None for receipt_id in receipt_ids if receipt_id not in found})
+        reader = self.reader()
+        for start in range(0, len(missing), MANY_CHUNK):
+            chunk = [key for key in missing[start:start + MANY_CHUNK] if key is not None]
+            rows = reader.execute(SELECT_MANY.format(", ".join("?" * len(chunk))), chunk)
+            found.update(group_rows(rows))
+        return [found.get(receipt_id) for receipt_id in receipt_ids]
+
+    def contains(self, receipt_id):
+        if receipt_id in self.pending:
+            return True
+        key = key_bytes(receipt_id)
+        return key is not None and self.reader().execute(SELECT_CONTAINS, (key,)).fetchone() is not None
+
+    def count(self):
+        self.flush()
+        return self.reader().execute(SELECT_COUNT).fetchone()[0]
+
+    #reads one consistent snapshot of the database, writers keep going meanwhile
+    def iterate(self):
+        self.flush()
+        connection = self.connect() #own connection, the iteration may outlive the calling thread's reads
+        try:
+            yield from group_rows(connection.execute(SELECT_ALL))
+        finally:
+            self.release(connection)
+
+    #function to find the ids of receipts with points between low and high, through the points index
+    def ids_with_points(self, low, high):
+        self.flush()
+        return [key_from_bytes(row[0]) for row in self.reader().execute(SELECT_BY_POINTS, (low, high))]
+
+    #function to close a connection that is no longer needed
+    def release(self, connection):
+        with self.connections_lock:
+            if connection not in self.connections:
+                return #already closed along with the store
+            self.connections.remove(connection)
+        connection.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.stopped.set()
+        self.committer.join()
+        self.flush()
+        with self.connections_lock:
+            connections, self.connections = self.connections, []
+        for connection in connections:
+            connection.close()
+        atexit.unregister(self.close)
@@ -0,0 +1,186 @@
+#storage engines for receipts
+#every engine implements the ReceiptStore operations so the app (and the shared tests and
+#benchmarks) can swap one for another; the plain in-memory dict is the default
+import os
+import threading
+from collections import namedtuple
+
+#what a store keeps per receipt id: the receipt and its precomputed points
+#points is None for receipts loaded from older stores that were never scored
+StoredReceipt = namedtuple("StoredReceipt", ["receipt", "points"])
+
+class ReceiptStore:
+    """ interface of a receipt storage engine,
+    keyed by receipt id as a 128-bit int (see ids.py), holding StoredReceipt values """
+
+    #whether reads or writes can wait on disk or on other processes, in which case an asyncio
+    #server calls them from a worker thread instead of the event loop
+    blocking_reads = False
+    blocking_writes = False
+
+    #stores (or replaces) the receipt and its points under receipt_id
+    def put(self, receipt_id, receipt, points):
+        raise NotImplementedError
+
+    #returns the StoredReceipt for receipt_id, None if there is none
+    def get(self, receipt_id):
+        raise NotImplementedError
+
+    #returns a list with the StoredReceipt (or None) of every id, in order
+    def get_many(self, receipt_ids):
+        return [self.get(receipt_id) for receipt_id in receipt_ids]
+
+    #returns the points of receipt_id, None if there is no such receipt or it was never scored
+    def get_points(self, receipt_id):
+        stored = self.get(receipt_id)
+        return None if stored is None else stored.points
+
+    def contains(self, receipt_id):
+        return self.get(receipt_id) is not None
+
+    #returns the number of stored receipts
+    def count(self):
+        raise NotImplementedError
+
+    #yields (receipt_id, StoredReceipt) for every stored receipt
+    def iterate(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class InMemoryStore(ReceiptStore):
+    """ the default engine: a python dictionary,
+    nothing survives a restart """
+
+    def __init__(self):
+        self.receipts = dict()
+
+    def put(self, receipt_id, receipt, points):
+        self.receipts[receipt_id] = StoredReceipt(receipt, points)
+
+    def get(self, receipt_id):
+        return self.receipts.get(receipt_id)
+
+    def get_many(self, receipt_ids):
+        get = self.receipts.get
+        return [get(receipt_id) for receipt_id in receipt_ids]
+
+    def get_points(self, receipt_id):
+        stored = self.receipts.get(receipt_id)
+        return None if stored is None else stored.points
+
+    def contains(self, receipt_id):
+        return receipt_id in self.receipts
+
+    def count(self):
+        return len(self.receipts)
+
+    def iterate(self):
+        return iter(list(self.receipts.items()))
+
+class ShardedStore(ReceiptStore):
+    """ in-memory engine for multi-threaded servers:
+    receipts are spread over dicts by receipt id hash, each with its own lock """
+
+    def __init__(self, shards=64):
+        if shards < 1 or shards & (shards - 1):
+            raise ValueError("shards must be a power of two")
+        self.mask = shards - 1
+        self.shards = [dict() for _ in range(shards)]
+        self.locks = [threading.Lock() for _ in range(shards)]
+
+    #writers take only the lock of their shard, so writers on different shards never wait
+    #for each other (and stay correct on interpreters without a GIL)
+    def put(self, receipt_id, receipt, points):
+        index = hash(receipt_id) & self.mask
+        with self.locks[index]:
+            self.shards[index][receipt_id] = StoredReceipt(receipt, points)
+
+    #reads take no lock: a single dict lookup never sees a half-written entry, and values
+    #are immutable StoredReceipt tuples that are replaced, never changed in place
+    def get(self, receipt_id):
+        return self.shards[hash(receipt_id) & self.mask].get(receipt_id)
+
+    def get_many(self, receipt_ids):
+        shards, mask = self.shards, self.mask
+        return [shards[hash(receipt_id) & mask].get(receipt_id) for receipt_id in receipt_ids]
+
+    def contains(self, receipt_id):
+        return receipt_id in self.shards[hash(receipt_id) & self.mask]
+
+    def count(self):
+        return sum(len(shard) for shard in self.shards)
+
+    #copies one shard at a time under its lock, so iterating never races a writer
+    def iterate(self):
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                entries = list(shard.items())
+            yield from entries
+
+#function to create the storage engine with the given name
+def create_store(name="memory", **options):
+    if name == "memory":
+        return InMemoryStore()
+    if name == "sharded":
+        return ShardedStore(**options)
+    if name == "shm":
+        from shm_store import SharedMemoryStore #unix only
+        return SharedMemoryStore(**options)
+    if name == "sqlite":
+        from sqlite_store import SQLiteStore #sqlite_store builds on this module
+        return SQLiteStore(**options)
+    if name == "indexed":
+        from points_index import IndexedLogStore #points_index builds on this module
+        return IndexedLogStore(**options)
+    raise ValueError(f"unknown receipt store: {name}")
+
+#function to create the store the app uses, configured from environment variables
+#  RECEIPT_STORE        : engine name (default memory)
+#  RECEIPT_SHARDS       : number of shards of the sharded engine, a power of two (default 64)
+#  RECEIPT_SHM_PATH     : file of the shm engine, shared by every process that opens it (default /dev/shm/receipts)
+#  RECEIPT_SHM_CAPACITY : receipt slots of the shm engine, a power of two (default 262144)
+#  RECEIPT_SHM_DATA_MB  : megabytes the shm engine reserves for receipt data (default 48)
+#  RECEIPT_SQLITE_PATH  : database file of the sqlite engine (default receipts.db)
+#  RECEIPT_SQLITE_BATCH : receipts per commit of the sqlite engine (default 256)
+#  RECEIPT_SQLITE_COMMIT_MS : longest a written receipt waits for its commit, in milliseconds (default 50)
+#  RECEIPT_LOG_PATH     : receipt log of the indexed engine (default receipts.log, index next to it)
+#  RECEIPT_INDEX_CAPACITY : slots of the indexed engine's points index, a power of two (default 4194304)
+#  RECEIPT_WAL          : path of a write-ahead log, turns on durable mode when set
+#  RECEIPT_WAL_FSYNC    : always, interval (default) or never
+#  RECEIPT_WAL_FSYNC_MS : milliseconds between fsyncs with the interval policy (default 10)
+#  RECEIPT_SNAPSHOT     : path of a snapshot file, the log is compacted into it periodically
+#  RECEIPT_SNAPSHOT_SECONDS : seconds between snapshots (default 300)
+def store_from_environment(environ=os.environ):
+    name = environ.get("RECEIPT_STORE", "memory")
+    options = {}
+    if name == "sharded":
+        options["shards"] = int(environ.get("RECEIPT_SHARDS", "64"))
+    elif name == "shm":
+        options["path"] = environ.get("RECEIPT_SHM_PATH", "/dev/shm/receipts")
+        options["capacity"] = int(environ.get("RECEIPT_SHM_CAPACITY", str(1 << 18)))
+        options["data_bytes"] = int(environ.get("RECEIPT_SHM_DATA_MB", "48")) << 20
+    elif name == "sqlite":
+        options["path"] = environ.get("RECEIPT_SQLITE_PATH", "receipts.db")
+        options["batch_size"] = int(environ.get("RECEIPT_SQLITE_BATCH", "256"))
+        options["commit_ms"] = float(environ.get("RECEIPT_SQLITE_COMMIT_MS", "50"))
+    elif name == "indexed":
+        options["path"] = environ.get("RECEIPT_LOG_PATH", "receipts.log")
+        options["capacity"] = int(environ.get("RECEIPT_INDEX_CAPACITY", str(1 << 22)))
+        options["fsync"] = environ.get("RECEIPT_WAL_FSYNC", "interval")
+        options["interval_ms"] = float(environ.get("RECEIPT_WAL_FSYNC_MS", "10"))
+    wal_path = environ.get("RECEIPT_WAL")
+    if name == "shm" and (wal_path or environ.get("RECEIPT_SNAPSHOT")):
+        #every worker would wrap the shared store in its own log on the same file, and one
+        #worker's snapshot would rotate and delete the log under the others
+        raise ValueError("RECEIPT_WAL and RECEIPT_SNAPSHOT cannot be used with the shm engine, which is shared by every worker process")
+    store = create_store(name, **options)
+    if wal_path:
+        from wal import DurableStore #wal builds on this module
+        store = DurableStore(store, wal_path,
+                             fsync=environ.get("RECEIPT_WAL_FSYNC", "interval"),
+                             interval_ms=float(environ.get("RECEIPT_WAL_FSYNC_MS", "10")),
+                             snapshot_path=environ.get("RECEIPT_SNAPSHOT"),
+                             snapshot_seconds=float(environ.get("RECEIPT_SNAPSHOT_SECONDS", "300")))
+    return store
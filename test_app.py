@@ -1,7 +1,10 @@
+import io
 import pytest
 import json
 from app import app 
-import uuid
+import app as receipt_app
+from ids import new_key, parse_id, format_id
+from scoring import RULE_NAMES, parse_receipt
 
 @pytest.fixture
 def client():
@@ -310,33 +313,299 @@ def test_15(client):
   points = points_response.get_json()
   assert "points" in points #verify points are returned
 
+#test case for points being scored once at submission
+def test_16(client):
+  receipt = {
+    "retailer": "Target",
+    "purchaseDate": "2022-01-02",
+    "purchaseTime": "13:13",
+    "total": "1.25",
+    "items": [
+        {"shortDescription": "Pepsi - 12-oz", "price": "1.25"}
+    ]
+  }
 
+  #submit receipt
+  process_response = client.post("/receipts/process", json=receipt)
+  receipt_id = process_response.get_json()["id"]
+  assert receipt_app.receipts_details.get(parse_id(receipt_id)).points == 31 #verify points stored at ingest
 
+  #get points for receipt
+  points_response = client.get(f"/receipts/{receipt_id}/points")
+  assert points_response.get_json()["points"] == 31 #verify cached points are returned
 
-    
-
-
-
-
-    
-    
-
-
+#test case for receipts loaded from an older store without cached points
+def test_17(client):
+  key = new_key()
+  receipt_id = format_id(key)
+  receipt_app.receipts_details.put(key, {
+    "retailer": "Walgreens",
+    "purchaseDate": "2022-01-02",
+    "purchaseTime": "08:13",
+    "total": "2.65",
+    "items": [
+        {"shortDescription": "Pepsi - 12-oz", "price": "1.25"},
+        {"shortDescription": "Dasani", "price": "1.40"}
+    ]
+  }, None) #no points, like receipts from older stores
 
-  
+  #get points for receipt
+  points_response = client.get(f"/receipts/{receipt_id}/points")
+  assert points_response.status_code == 200 #verify retrieval of receipt
+  assert points_response.get_json()["points"] == 15 #verify lazily computed points
+  assert receipt_app.receipts_details.get(key).points == 15 #verify points are now stored
 
-  
-  
-  
-  
-  
-  
-  
-  
-  
-  
-  
+#test case for batch submission with a json array
+def test_18(client):
+  receipts = [
+    {
+      "retailer": "Target",
+      "purchaseDate": "2022-01-02",
+      "purchaseTime": "13:13",
+      "total": "1.25",
+      "items": [{"shortDescription": "Pepsi - 12-oz", "price": "1.25"}]
+    },
+    {
+      "retailer": "Target",
+      "purchaseDate": "01-02-2022", #invalid date format
+      "purchaseTime": "13:13",
+      "total": "1.25",
+      "items": [{"shortDescription": "Pepsi - 12-oz", "price": "1.25"}]
+    },
+    "not a receipt"
+  ]
+
+  #submit batch
+  batch_response = client.post("/receipts/process:batch", json=receipts)
+  assert batch_response.status_code == 200 #verify batch is processed
+  results = batch_response.get_json()["results"]
+  assert len(results) == 3 #verify one result per receipt, in order
+  assert "id" in results[0]
+  assert "error" in results[1]
+  assert "error" in results[2]
+
+  #get points for the stored receipt
+  points_response = client.get(f"/receipts/{results[0]['id']}/points")
+  assert points_response.get_json()["points"] == 31 #verify expected output points
+
+#test case for batch submission with an NDJSON body
+def test_19(client):
+  receipt = {
+    "retailer": "Walgreens",
+    "purchaseDate": "2022-01-02",
+    "purchaseTime": "08:13",
+    "total": "2.65",
+    "items": [
+        {"shortDescription": "Pepsi - 12-oz", "price": "1.25"},
+        {"shortDescription": "Dasani", "price": "1.40"}
+    ]
+  }
+  body = json.dumps(receipt) + "\n{not json\n\n" + json.dumps(receipt) + "\n"
+
+  #submit batch
+  batch_response = client.post("/receipts/process:batch", data=body, content_type="application/x-ndjson")
+  assert batch_response.status_code == 200 #verify batch is processed
+  results = batch_response.get_json()["results"]
+  assert len(results) == 3 #verify blank lines are skipped
+  assert "error" in results[1] #verify unparseable line is reported in place
+  for result in (results[0], results[2]):
+    points_response = client.get(f"/receipts/{result['id']}/points")
+    assert points_response.get_json()["points"] == 15 #verify expected output points
+
+#test case for a batch body that is not a list
+def test_20(client):
+  batch_response = client.post("/receipts/process:batch", json={"retailer": "Target"})
+  assert batch_response.status_code == 400 #verify 400 Bad Request
+  assert "error" in batch_response.get_json() #verify error is generated
+
+#test case for batch points lookup
+def test_21(client):
+  receipt = {
+    "retailer": "Target",
+    "purchaseDate": "2022-01-02",
+    "purchaseTime": "13:13",
+    "total": "1.25",
+    "items": [{"shortDescription": "Pepsi - 12-oz", "price": "1.25"}]
+  }
+  receipt_id = client.post("/receipts/process", json=receipt).get_json()["id"]
+  unknown_id = "adb6b560-0eef-42bc-9d16-df48f30e89b2" #random valid UUID
+
+  #get points for many receipts
+  batch_response = client.post("/receipts/points:batch", json=[receipt_id, unknown_id, "63452", 7])
+  assert batch_response.status_code == 200 #verify batch is processed
+  results = batch_response.get_json()["results"]
+  assert results[receipt_id] == {"points": 31} #verify expected output points
+  assert results[unknown_id] == {"error": "not-found"} #verify unknown id is reported
+  assert results["63452"] == {"error": "invalid-id"} #verify invalid id is reported
+  assert results["7"] == {"error": "invalid-id"} #verify non-string id is reported
+
+  #ids can also be wrapped in an object
+  batch_response = client.post("/receipts/points:batch", json={"ids": [receipt_id]})
+  assert batch_response.get_json()["results"] == {receipt_id: {"points": 31}}
+
+#test case for a batch points body that is not a list of ids
+def test_22(client):
+  batch_response = client.post("/receipts/points:batch", json="63452")
+  assert batch_response.status_code == 400 #verify 400 Bad Request
+  assert "error" in batch_response.get_json() #verify error is generated
+
+#test case for receipt ids in upper case or without dashes, they name the same receipt
+def test_23(client):
+  receipt = {
+    "retailer": "Target",
+    "purchaseDate": "2022-01-02",
+    "purchaseTime": "13:13",
+    "total": "1.25",
+    "items": [
+        {"shortDescription": "Pepsi - 12-oz", "price": "1.25"}
+    ]
+  }
 
-  
+  #submit receipt
+  receipt_id = client.post("/receipts/process", json=receipt).get_json()["id"]
+  assert parse_id(receipt_id) is not None #verify ids are canonical uuid strings
 
+  #get points with other spellings of the id
+  for spelling in (receipt_id.upper(), receipt_id.replace("-", "")):
+    points_response = client.get(f"/receipts/{spelling}/points")
+    assert points_response.status_code == 200 #verify retrieval of receipt
+    assert points_response.get_json()["points"] == 31 #verify expected output points
 
+#test case for the streaming NDJSON endpoint: one result line per receipt line, in order
+def test_24(client):
+  receipt = {
+    "retailer": "Target",
+    "purchaseDate": "2022-01-02",
+    "purchaseTime": "13:13",
+    "total": "1.25",
+    "items": [
+        {"shortDescription": "Pepsi - 12-oz", "price": "1.25"}
+    ]
+  }
+  too_long = b'{"retailer": "' + b"x" * receipt_app.MAX_LINE + b'"}'
+  body = b"\n".join([json.dumps(receipt).encode(), b"", b"{not json", too_long,
+                     json.dumps(dict(receipt, total="1.2")).encode(), json.dumps(receipt).encode()]) #no newline at the end
+
+  #submit the stream
+  stream_response = client.post("/receipts/process:stream", data=body, content_type="application/x-ndjson")
+  assert stream_response.status_code == 200 #verify stream is processed
+  assert stream_response.mimetype == "application/x-ndjson"
+  results = [json.loads(line) for line in stream_response.get_data().splitlines()]
+  assert len(results) == 5 #verify the blank line is skipped
+  assert "id" in results[0] and "id" in results[4] #verify valid receipts are stored
+  assert results[1]["error"] == "The receipt is invalid." #verify malformed json is reported
+  assert "longer than" in results[2]["details"][0]["error"] #verify an overlong line is refused
+  assert results[3]["details"] == [{"field": "total", "error": "must be an amount like 6.49"}] #verify validation details
+
+  #get points for receipts from the stream
+  points_response = client.get(f"/receipts/{results[4]['id']}/points")
+  assert points_response.get_json()["points"] == 31 #verify expected output points
+
+#test case for the stream being read as results are written, not all at once
+def test_25():
+  line = json.dumps({"retailer": "Target", "purchaseDate": "2022-01-02", "purchaseTime": "13:13", "total": "1.25",
+                     "items": [{"shortDescription": "Pepsi - 12-oz", "price": "1.25"}]}).encode() + b"\n"
+  stream = io.BytesIO(line * 3000)
+  results = receipt_app.process_lines(receipt_app.read_lines(stream.read))
+  assert b'"id"' in next(results)
+  assert stream.tell() == receipt_app.READ_CHUNK #verify only the first block has been read
+  assert sum(1 for _ in results) == 2999
+
+#test case for read_lines with lines split across the blocks it reads
+def test_26():
+  body = b'{"a": 1}\n\n' + b"x" * (receipt_app.MAX_LINE + 5) + b'\n{"b": 2}\n' + b"y" * receipt_app.MAX_LINE + b'\n{"c": 3}'
+  stream = io.BytesIO(body)
+  lines = list(receipt_app.read_lines(lambda size: stream.read(7919)))
+  assert lines == [b'{"a": 1}\n', b"\n", None, b'{"b": 2}\n', None, b'{"c": 3}']
+
+#test case for the per-rule points breakdown of the two sample receipts
+def test_27(client):
+  target = {
+    "retailer": "Target",
+    "purchaseDate": "2022-01-01",
+    "purchaseTime": "13:01",
+    "items": [
+      {"shortDescription": "Mountain Dew 12PK", "price": "6.49"},
+      {"shortDescription": "Emils Cheese Pizza", "price": "12.25"},
+      {"shortDescription": "Knorr Creamy Chicken", "price": "1.26"},
+      {"shortDescription": "Doritos Nacho Cheese", "price": "3.35"},
+      {"shortDescription": "   Klarbrunn 12-PK 12 FL OZ  ", "price": "12.00"}
+    ],
+    "total": "35.35"
+  }
+  market = {
+    "retailer": "M&M Corner Market",
+    "purchaseDate": "2022-03-20",
+    "purchaseTime": "14:33",
+    "items": [{"shortDescription": "Gatorade", "price": "2.25"}] * 4,
+    "total": "9.00"
+  }
+  expected = [(target, 28, [6, 0, 0, 10, 6, 6, 0]), (market, 109, [14, 50, 25, 10, 0, 0, 10])]
+  for receipt, points, rules in expected:
+    receipt_id = client.post("/receipts/process", json=receipt).get_json()["id"]
+    response = client.get(f"/receipts/{receipt_id}/points/breakdown")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["points"] == points == sum(rule["points"] for rule in body["breakdown"])
+    assert [rule["points"] for rule in body["breakdown"]] == rules
+    assert [rule["rule"] for rule in body["breakdown"]] == list(RULE_NAMES)
+
+#test case for breakdowns of unknown and invalid ids, and of receipts stored without one
+def test_28(client):
+  assert client.get("/receipts/63452/points/breakdown").status_code == 400
+  assert client.get(f"/receipts/{format_id(new_key())}/points/breakdown").status_code == 404
+
+  receipt = {"retailer": "Walgreens", "purchaseDate": "2022-01-02", "purchaseTime": "08:13", "total": "2.65",
+             "items": [{"shortDescription": "Pepsi - 12-oz", "price": "1.25"}, {"shortDescription": "Dasani", "price": "1.40"}]}
+  for stored in (receipt, parse_receipt(receipt)): #a raw dict and a record without a breakdown
+    key = new_key()
+    receipt_app.receipts_details.put(key, stored, None)
+    body = client.get(f"/receipts/{format_id(key)}/points/breakdown").get_json()
+    assert body["points"] == 15
+    assert [rule["points"] for rule in body["breakdown"]] == [9, 0, 0, 5, 1, 0, 0]
+
+#test case for the metrics endpoint: requests by route and status, scoring times and store size
+def test_29(client):
+  receipt = {"retailer": "Target", "purchaseDate": "2022-01-02", "purchaseTime": "13:13", "total": "1.25",
+             "items": [{"shortDescription": "Pepsi - 12-oz", "price": "1.25"}]}
+  before = client.get("/metrics").get_data(as_text=True)
+  receipt_id = client.post("/receipts/process", json=receipt).get_json()["id"]
+  client.get(f"/receipts/{receipt_id}/points")
+  client.get("/receipts/63452/points")
+  client.get("/")
+  response = client.get("/metrics")
+  assert response.status_code == 200
+  assert response.content_type.startswith("text/plain; version=0.0.4")
+  text = response.get_data(as_text=True)
+  for route in ("receipt_processor", "get_points", "home"):
+    assert f'receipt_http_request_duration_seconds_count{{route="{route}"}}' in text
+  assert 'receipt_http_requests_total{route="get_points",status="400"}' in text
+  assert 'receipt_http_errors_total{status="400"}' in text
+  assert f"receipt_store_receipts {receipt_app.receipts_details.count()}\n" in text
+  count = lambda page: int(float(page.split("receipt_scoring_duration_seconds_count ")[1].split()[0]))
+  assert count(text) == count(before) + 1
+
+#test case for stage timing: the Server-Timing header and the /metrics/stages summary
+def test_30(client):
+  receipt = {"retailer": "Target", "purchaseDate": "2022-01-02", "purchaseTime": "13:13", "total": "1.25",
+             "items": [{"shortDescription": "Pepsi - 12-oz", "price": "1.25"}]}
+  metrics = receipt_app.request_metrics
+  setting = metrics.stage_timing
+  try:
+    metrics.stage_timing = "off"
+    assert "Server-Timing" not in client.post("/receipts/process", json=receipt).headers
+    metrics.stage_timing = "header"
+    response = client.post("/receipts/process", json=receipt)
+    stages = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert stages == ["json_decode", "regex", "datetime", "items", "record", "id_generation", "store_write", "json_encode"]
+    response = client.get(f"/receipts/{response.get_json()['id']}/points")
+    assert response.get_json() == {"points": 31}
+    assert [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")] == ["id_parse", "store_read", "json_encode"]
+    metrics.stage_timing = "on"
+    assert "Server-Timing" not in client.get("/receipts/63452/points").headers
+    summary = client.get("/metrics/stages").get_json()
+    assert summary["get_points"]["id_parse"]["count"] >= 2
+    assert summary["receipt_processor"]["store_write"]["count"] >= 1
+    assert set(summary["receipt_processor"]["regex"]) == {"count", "mean_us", "p50_us", "p99_us"}
+  finally:
+    metrics.stage_timing = setting
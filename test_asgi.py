@@ -0,0 +1,145 @@
+import asyncio
+import json
+from asgi import app
+from core import MAX_LINE, request_metrics
+from app import app as flask_app
+
+#function to send one request through the ASGI app, returns (status, decoded body)
+def call(method, path, body=None, content_type="application/json"):
+  if body is None:
+    data = b""
+  elif isinstance(body, bytes):
+    data = body
+  elif isinstance(body, str):
+    data = body.encode()
+  else:
+    data = json.dumps(body).encode()
+  scope = {"type": "http", "method": method, "path": path, "headers": [(b"content-type", content_type.encode())]}
+  messages = [{"type": "http.request", "body": data, "more_body": False}]
+  sent = []
+  async def receive():
+    return messages.pop(0) if messages else {"type": "http.disconnect"}
+  async def send(message):
+    sent.append(message)
+  asyncio.run(app(scope, receive, send))
+  call.headers = dict(sent[0]["headers"]) #of the last call
+  payload = b"".join(message.get("body", b"") for message in sent[1:])
+  if dict(sent[0]["headers"])[b"content-type"] == b"application/json":
+    return sent[0]["status"], json.loads(payload)
+  return sent[0]["status"], payload.decode()
+
+RECEIPT = {
+  "retailer": "Target",
+  "purchaseDate": "2022-01-01",
+  "purchaseTime": "13:01",
+  "items": [
+    {"shortDescription": "Mountain Dew 12PK", "price": "6.49"},
+    {"shortDescription": "Emils Cheese Pizza", "price": "12.25"},
+    {"shortDescription": "Knorr Creamy Chicken", "price": "1.26"},
+    {"shortDescription": "Doritos Nacho Cheese", "price": "3.35"},
+    {"shortDescription": "   Klarbrunn 12-PK 12 FL OZ  ", "price": "12.00"}
+  ],
+  "total": "35.35"
+}
+
+#test case for home page
+def test_home_page():
+  assert call("GET", "/") == (200, "Receipt Processor Application")
+
+#test case for submitting a receipt and reading its points
+def test_process_and_points():
+  status, body = call("POST", "/receipts/process", RECEIPT)
+  assert status == 200
+  assert call("GET", f"/receipts/{body['id']}/points") == (200, {"points": 28})
+
+#test case for the same errors as the Flask app
+def test_errors():
+  assert call("POST", "/receipts/process", dict(RECEIPT, total="10"))[0] == 400
+  assert call("POST", "/receipts/process", b"{not json")[0] == 400
+  assert call("GET", "/receipts/63452/points")[0] == 400
+  assert call("GET", "/receipts/adb6b560-0eef-42bc-9d16-df48f30e89b2/points")[0] == 404
+  assert call("GET", "/receipts/process")[0] == 405
+  assert call("GET", "/no/such/route")[0] == 404
+
+#test case for bodies the Flask app refuses before validation, with the same status and page
+def test_refused_bodies():
+  client = flask_app.test_client()
+  for body, content_type in ((json.dumps(RECEIPT), "text/plain"), ("{not json", "application/json")):
+    flask_response = client.post("/receipts/process", data=body, content_type=content_type)
+    assert call("POST", "/receipts/process", body, content_type) == (flask_response.status_code, flask_response.get_data(as_text=True))
+  assert call("POST", "/receipts/process", RECEIPT, "application/merge-patch+json")[0] == 200
+
+#test case for both batch endpoints
+def test_batches():
+  body = json.dumps(RECEIPT) + "\n" + json.dumps(dict(RECEIPT, purchaseDate="01-02-2022")) + "\n"
+  status, results = call("POST", "/receipts/process:batch", body, "application/x-ndjson")
+  assert status == 200
+  first, second = results["results"]
+  assert "id" in first and "error" in second
+  status, results = call("POST", "/receipts/points:batch", [first["id"], "63452"])
+  assert results["results"] == {first["id"]: {"points": 28}, "63452": {"error": "invalid-id"}}
+
+#test case for the streaming endpoint with the body split into small chunks at arbitrary points
+def test_stream():
+  line = json.dumps(RECEIPT).encode()
+  too_long = b"x" * (MAX_LINE + 5)
+  body = b"\n".join([line, b"", b"{not json", too_long, line]) #no newline at the end
+  messages = [{"type": "http.request", "body": body[start:start + 4099], "more_body": start + 4099 < len(body)}
+              for start in range(0, len(body), 4099)]
+  sent = []
+  async def receive():
+    return messages.pop(0)
+  async def send(message):
+    sent.append(message)
+  scope = {"type": "http", "method": "POST", "path": "/receipts/process:stream",
+           "headers": [(b"content-type", b"application/x-ndjson")]}
+  asyncio.run(app(scope, receive, send))
+  call.headers = dict(sent[0]["headers"]) #of the last call
+  assert sent[0]["status"] == 200 and dict(sent[0]["headers"])[b"content-type"] == b"application/x-ndjson"
+  assert all(message.get("more_body") for message in sent[1:-1]) and not sent[-1].get("more_body")
+  results = [json.loads(text) for text in b"".join(message.get("body", b"") for message in sent[1:]).splitlines()]
+  assert len(results) == 4
+  assert "id" in results[0] and "id" in results[3]
+  assert results[1]["error"] == "The receipt is invalid." and "longer than" in results[2]["details"][0]["error"]
+  assert call("GET", f"/receipts/{results[3]['id']}/points") == (200, {"points": 28})
+  assert call("GET", "/receipts/process:stream")[0] == 405
+
+#test case for the per-rule points breakdown
+def test_breakdown():
+  status, body = call("POST", "/receipts/process", RECEIPT)
+  status, breakdown = call("GET", f"/receipts/{body['id']}/points/breakdown")
+  assert status == 200 and breakdown["points"] == 28
+  assert [rule["points"] for rule in breakdown["breakdown"]] == [6, 0, 0, 10, 6, 6, 0]
+  assert call("GET", "/receipts/63452/points/breakdown")[0] == 400
+  assert call("POST", f"/receipts/{body['id']}/points/breakdown")[0] == 405
+
+#test case for the metrics endpoint
+def test_metrics():
+  call("GET", "/")
+  call("GET", "/receipts/63452/points")
+  status, text = call("GET", "/metrics")
+  assert status == 200
+  assert 'receipt_http_requests_total{route="home",status="200"}' in text
+  assert 'receipt_http_requests_total{route="get_points",status="400"}' in text
+  assert "receipt_store_receipts " in text
+
+#test case for stage timing: the Server-Timing header and the /metrics/stages summary
+def test_stages():
+  setting = request_metrics.stage_timing
+  try:
+    request_metrics.stage_timing = "header"
+    status, body = call("POST", "/receipts/process", RECEIPT)
+    assert status == 200
+    stages = [entry.split(";")[0] for entry in call.headers[b"server-timing"].decode().split(", ")]
+    assert stages == ["json_decode", "regex", "datetime", "items", "record", "id_generation", "store_write", "json_encode"]
+    assert call("GET", f"/receipts/{body['id']}/points") == (200, {"points": 28})
+    assert b"id_parse;dur=" in call.headers[b"server-timing"]
+    request_metrics.stage_timing = "off"
+    call("GET", f"/receipts/{body['id']}/points")
+    assert b"server-timing" not in call.headers
+    status, summary = call("GET", "/metrics/stages")
+    assert status == 200
+    assert summary["receipt_processor"]["json_decode"]["count"] >= 1
+    assert summary["get_points"]["store_read"]["count"] >= 1
+  finally:
+    request_metrics.stage_timing = setting
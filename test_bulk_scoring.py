@@ -0,0 +1,22 @@
+import json
+from core import points_calculator
+from scoring import parse_receipt
+from bulk_scoring import score_receipts, main
+
+#differential test: the vectorized scorer must match points_calculator on every generated receipt
+def test_matches_points_calculator(corpus):
+  points = score_receipts(corpus).tolist()
+  assert points == [points_calculator(receipt) for receipt in corpus]
+
+#test case for scoring receipts that were already parsed at ingest
+def test_parsed_receipts(corpus):
+  sample = corpus[:500]
+  assert score_receipts([parse_receipt(receipt) for receipt in sample]).tolist() == score_receipts(sample).tolist()
+
+#test case for the offline rescoring command line
+def test_cli(corpus, tmp_path, capsys):
+  path = tmp_path / "receipts.ndjson"
+  path.write_text("\n".join(json.dumps(receipt) for receipt in corpus[:250]) + "\n")
+  main([str(path), "--chunk", "100"])
+  lines = capsys.readouterr().out.splitlines()
+  assert [json.loads(line)["points"] for line in lines] == [points_calculator(receipt) for receipt in corpus[:250]]
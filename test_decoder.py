@@ -0,0 +1,53 @@
+import copy
+import random
+import pytest
+from decoder import parse_and_score
+from scoring import parse_receipt, score_cents, breakdown_cents
+from validator import validate_receipt
+
+#function to run the three separate steps parse_and_score replaces
+def three_steps(receipt):
+  errors = validate_receipt(receipt)
+  if errors:
+    return None, None, errors
+  record = parse_receipt(receipt)
+  return record, score_cents(record), []
+
+#function to break a valid receipt in one random way
+def mutate(receipt, rng):
+  receipt = copy.deepcopy(receipt)
+  field = rng.choice(["retailer", "purchaseDate", "purchaseTime", "items", "total", "item", "price", "description", "drop"])
+  bad = rng.choice([None, 7, 1.5, "", " ", "12.5", "2022-02-30", "24:00", [], {}, ["x"]])
+  if field == "drop":
+    del receipt[rng.choice(list(receipt))]
+  elif field in ("item", "price", "description"):
+    items = receipt.get("items")
+    if not isinstance(items, list) or not items or not isinstance(items[0], dict):
+      return receipt #broken already
+    index = rng.randrange(len(receipt["items"]))
+    if field == "item" or not isinstance(receipt["items"][index], dict):
+      receipt["items"][index] = bad
+    else:
+      receipt["items"][index]["price" if field == "price" else "shortDescription"] = bad
+  else:
+    receipt[field] = bad
+  return receipt
+
+#differential test: the one pass gives the same record, points and errors as the three steps
+def test_matches_three_steps(corpus):
+  rng = random.Random(7)
+  for receipt in corpus[:5000]:
+    for candidate in (receipt, mutate(receipt, rng), mutate(mutate(receipt, rng), rng)):
+      assert parse_and_score(candidate) == three_steps(candidate), candidate
+
+#test cases for bodies that are not receipts at all
+@pytest.mark.parametrize("body", [None, [], {}, "receipt", 7, ["not", "a", "receipt"]])
+def test_not_a_receipt(body):
+  assert parse_and_score(body) == three_steps(body)
+
+#test case for the per-rule breakdown kept on the record, the same as breakdown_cents gives
+def test_breakdown(corpus):
+  for receipt in corpus[:5000]:
+    record, points, _ = parse_and_score(receipt)
+    assert list(record.breakdown) == breakdown_cents(record)
+    assert sum(record.breakdown) == points
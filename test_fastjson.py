@@ -0,0 +1,60 @@
+import json
+import pytest
+from flask.json.provider import DefaultJSONProvider
+import fastjson
+from app import app
+
+RECEIPT = {
+  "retailer": "Target",
+  "purchaseDate": "2022-01-02",
+  "purchaseTime": "13:13",
+  "total": "1.25",
+  "items": [{"shortDescription": "Pepsi - 12-oz", "price": "1.25"}]
+}
+
+#runs every test with orjson and with the json module alone
+@pytest.fixture(params=["orjson", "json"])
+def accelerator(request, monkeypatch):
+  if request.param == "json":
+    monkeypatch.setattr(fastjson, "orjson", None)
+  elif fastjson.orjson is None:
+    pytest.skip("orjson is not installed")
+  return request.param
+
+#test case for decoding, with the json module deciding whatever orjson refuses
+def test_loads(accelerator):
+  assert fastjson.loads(json.dumps(RECEIPT).encode()) == RECEIPT
+  assert fastjson.loads(json.dumps(RECEIPT)) == RECEIPT
+  assert fastjson.loads(b'{"total": NaN}')["total"] != 0 #NaN, like the json module
+  assert fastjson.loads(json.dumps(RECEIPT).encode("utf-16")) == RECEIPT
+  for body in (b"", b"{", b"[1,]", b"\xff"):
+    with pytest.raises(ValueError):
+      fastjson.loads(body)
+
+#test case for encoding and the response templates
+def test_encode(accelerator):
+  assert fastjson.encode_body({"points": 31}) == b'{"points":31}'
+  assert fastjson.encode_body({"id": "adb6b560-0eef-42bc-9d16-df48f30e89b2"}) == b'{"id":"adb6b560-0eef-42bc-9d16-df48f30e89b2"}'
+  huge = {"points": 10 ** 30, "x": 1} #past orjson's 64-bit ints
+  assert json.loads(fastjson.encode_body(huge)) == huge
+  assert fastjson.encode_body({"points": 10 ** 30}) == b'{"points":%d}' % 10 ** 30
+  body = {"results": {"b": {"points": 1}, "a": {"error": "not-found"}}, "error": "x"}
+  assert fastjson.dumps(body, sort_keys=True) == json.dumps(body, separators=(",", ":"), sort_keys=True).encode()
+  assert json.loads(fastjson.dumps({1: "non-string key"})) == {"1": "non-string key"}
+
+#test case for the Flask app answering byte for byte like jsonify with the json module did
+def test_flask_responses(accelerator):
+  client = app.test_client()
+  plain = DefaultJSONProvider(app)
+  response = client.post("/receipts/process", json=RECEIPT)
+  body = response.get_json()
+  assert response.data == plain.response(body).data
+  response = client.get(f"/receipts/{body['id']}/points")
+  assert response.data == plain.response({"points": 31}).data
+  response = client.post("/receipts/process", json={"retailer": "Target"})
+  assert response.status_code == 400 and response.data == plain.response(response.get_json()).data
+  response = client.post("/receipts/points:batch", json=[body["id"], "63452", 7])
+  assert response.data == plain.response(response.get_json()).data
+  #Flask's own errors for bodies that are not json
+  assert client.post("/receipts/process", data="{", content_type="application/json").status_code == 400
+  assert client.post("/receipts/process", data="{}", content_type="text/plain").status_code == 415
@@ -0,0 +1,121 @@
+import multiprocessing
+import threading
+import time
+from uuid import UUID
+import pytest
+from core import validate_id
+from ids import (new_key, parse_id, format_id, as_key, key_bytes, key_from_bytes,
+                 BufferedIds, TimeOrderedIds, create_id_generator, id_generator_from_environment)
+
+TEXT = "adb6b560-0eef-42bc-9d16-df48f30e89b2"
+KEY = 0xadb6b5600eef42bc9d16df48f30e89b2
+
+#test case for the canonical form round trip
+def test_round_trip():
+  assert parse_id(TEXT) == KEY
+  assert format_id(KEY) == TEXT
+  key = new_key()
+  assert parse_id(format_id(key)) == key
+
+#test case for the other spellings of the same id, they all give the same key
+@pytest.mark.parametrize("text", [TEXT.upper(), "ADB6b560-0EEF-42bc-9d16-df48f30e89b2", TEXT.replace("-", ""),
+                                  "{" + TEXT + "}", "urn:uuid:" + TEXT])
+def test_other_spellings(text):
+  assert parse_id(text) == KEY
+  assert format_id(parse_id(text)) == TEXT #formatted back in the canonical form
+
+#test case for things that are not receipt ids
+@pytest.mark.parametrize("value", ["", "63452", TEXT[:-1], TEXT + "0", TEXT.replace("a", "g"), "0x" + TEXT[2:],
+                                   TEXT.replace("-", "_"), " " + TEXT[1:], None, 7, KEY, b"x" * 16])
+def test_invalid(value):
+  assert parse_id(value) is None
+
+#test case for new keys being random version 4 uuids
+def test_new_key():
+  keys = {new_key() for _ in range(1000)}
+  assert len(keys) == 1000
+  for key in keys:
+    assert UUID(int=key).version == 4
+    assert UUID(int=key).variant == "specified in RFC 4122"
+
+#test case for the zero id: a valid uuid, but reserved as the free slot marker on disk
+def test_zero_id():
+  zero = "00000000-0000-0000-0000-000000000000"
+  assert parse_id(zero) == 0
+  assert format_id(0) == zero
+  assert key_bytes(0) is None
+
+#test case for the 16 byte form used by the on-disk stores
+def test_key_bytes():
+  assert key_bytes(KEY) == bytes.fromhex(TEXT.replace("-", ""))
+  assert key_from_bytes(key_bytes(KEY)) == KEY
+  assert key_bytes((1 << 128) - 1) == b"\xff" * 16
+  for value in (1 << 128, -1, True, TEXT, None, 1.5):
+    assert key_bytes(value) is None
+
+#test case for keys from stores written before ids were ints
+def test_as_key():
+  assert as_key(KEY) == KEY
+  assert as_key(TEXT) == KEY
+  with pytest.raises(ValueError):
+    as_key("not-a-uuid")
+
+#function to make count ids with generator in each of threads threads
+def make_in_threads(generator, threads, count):
+  made = [None] * threads
+  def work(index):
+    made[index] = [generator() for _ in range(count)]
+  workers = [threading.Thread(target=work, args=(index,)) for index in range(threads)]
+  for worker in workers:
+    worker.start()
+  for worker in workers:
+    worker.join()
+  return made
+
+def make_in_process(generator, count, queue):
+  queue.put([generator() for _ in range(count)])
+
+#test case for every generator giving unique, valid ids across threads and forked processes
+@pytest.mark.parametrize("name", ["uuid4", "buffered", "uuid7"])
+def test_unique_ids(name):
+  generator = create_id_generator(name)
+  parent = [generator() for _ in range(100)] #a forked child must not reuse what is left of this batch
+  made = make_in_threads(generator, 8, 5000)
+  context = multiprocessing.get_context("fork")
+  queue = context.Queue()
+  workers = [context.Process(target=make_in_process, args=(generator, 5000, queue)) for _ in range(4)]
+  for worker in workers:
+    worker.start()
+  made += [queue.get() for _ in workers]
+  for worker in workers:
+    worker.join()
+  keys = parent + [key for keys in made for key in keys]
+  assert len(set(keys)) == len(keys) == 100 + 12 * 5000
+  version = 7 if name == "uuid7" else 4
+  for key in keys[::97]:
+    assert UUID(int=key).version == version and UUID(int=key).variant == "specified in RFC 4122"
+    assert validate_id(format_id(key)) and key_bytes(key) is not None
+
+#test case for time-ordered ids: increasing within a process, with the time in the top 48 bits
+def test_time_ordered():
+  generator = TimeOrderedIds()
+  before = time.time_ns() // 1_000_000
+  keys = [generator() for _ in range(20000)] #more than the 4096 a millisecond counter holds, at times
+  assert keys == sorted(keys) and len(set(keys)) == len(keys)
+  assert before <= keys[0] >> 80 <= time.time_ns() // 1_000_000
+  for thread_keys in make_in_threads(generator, 4, 2000):
+    assert thread_keys == sorted(thread_keys)
+
+#test case for the batched generator refilling as it goes
+def test_buffered_refill():
+  generator = BufferedIds(batch=4)
+  keys = [generator() for _ in range(10)]
+  assert len(set(keys)) == 10
+
+#test case for choosing the generator from the environment
+def test_generator_from_environment():
+  assert isinstance(id_generator_from_environment({}), BufferedIds)
+  assert isinstance(id_generator_from_environment({"RECEIPT_IDS": "uuid7"}), TimeOrderedIds)
+  assert id_generator_from_environment({"RECEIPT_IDS": "uuid4"}) is new_key
+  with pytest.raises(ValueError):
+    id_generator_from_environment({"RECEIPT_IDS": "sequential"})
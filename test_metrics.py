@@ -0,0 +1,112 @@
+import gc
+import threading
+import pytest
+from metrics import LATENCY_BUCKETS, SCORING_BUCKETS, STAGE_BUCKETS, Metrics, StageTimer, stage_timing_from_environment
+
+#function to read the samples of a rendered page into a dict of "name{labels}" -> value
+def samples(text):
+  found = {}
+  for line in text.splitlines():
+    if line and not line.startswith("#"):
+      name, value = line.rsplit(" ", 1)
+      found[name] = float(value)
+  return found
+
+#test case for request and error counts and the latency histogram of one route
+def test_requests():
+  metrics = Metrics()
+  metrics.request("get_points", 200, 50_000) #50us
+  metrics.request("get_points", 200, 2_000_000) #2ms
+  metrics.request("get_points", 404, 100_000) #exactly on a bucket bound
+  metrics.request("home", 200, 10 ** 10) #10s, past the last bound
+  found = samples(metrics.render(7))
+  assert found['receipt_http_requests_total{route="get_points",status="200"}'] == 2
+  assert found['receipt_http_requests_total{route="get_points",status="404"}'] == 1
+  assert found['receipt_http_errors_total{status="404"}'] == 1
+  assert 'receipt_http_errors_total{status="200"}' not in found
+  assert found['receipt_http_request_duration_seconds_bucket{route="get_points",le="0.0001"}'] == 2
+  assert found['receipt_http_request_duration_seconds_bucket{route="get_points",le="0.001"}'] == 2
+  assert found['receipt_http_request_duration_seconds_bucket{route="get_points",le="0.0025"}'] == 3
+  assert found['receipt_http_request_duration_seconds_bucket{route="get_points",le="+Inf"}'] == 3
+  assert found['receipt_http_request_duration_seconds_count{route="get_points"}'] == 3
+  assert abs(found['receipt_http_request_duration_seconds_sum{route="get_points"}'] - 0.00215) < 1e-12
+  assert found[f'receipt_http_request_duration_seconds_bucket{{route="home",le="{LATENCY_BUCKETS[-1]}"}}'] == 0
+  assert found['receipt_http_request_duration_seconds_bucket{route="home",le="+Inf"}'] == 1
+  assert found["receipt_store_receipts"] == 7
+
+#test case for the scoring time histogram
+def test_scoring():
+  metrics = Metrics()
+  for duration in (3_000, 7_000, 7_000, 50_000_000):
+    metrics.scoring(duration)
+  found = samples(metrics.render(0))
+  assert found[f'receipt_scoring_duration_seconds_bucket{{le="{SCORING_BUCKETS[0]}"}}'] == 1
+  assert found[f'receipt_scoring_duration_seconds_bucket{{le="{SCORING_BUCKETS[1]}"}}'] == 3
+  assert found['receipt_scoring_duration_seconds_bucket{le="+Inf"}'] == 4
+  assert found["receipt_scoring_duration_seconds_count"] == 4
+
+#test case for many threads counting at once, and the shards of ended threads being folded
+def test_threads():
+  metrics = Metrics()
+  def work():
+    for _ in range(5000):
+      metrics.request("get_points", 200, 1000)
+  threads = [threading.Thread(target=work) for _ in range(8)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  gc.collect()
+  assert metrics.shards == [] #every thread has ended
+  found = samples(metrics.render(0))
+  assert found['receipt_http_requests_total{route="get_points",status="200"}'] == 40000
+  assert found['receipt_http_request_duration_seconds_count{route="get_points"}'] == 40000
+
+#test case for the page layout: every metric has its HELP and TYPE lines
+def test_layout():
+  text = Metrics().render(0)
+  for name, kind in (("receipt_http_requests_total", "counter"), ("receipt_http_errors_total", "counter"),
+                     ("receipt_http_request_duration_seconds", "histogram"),
+                     ("receipt_scoring_duration_seconds", "histogram"), ("receipt_stage_duration_seconds", "histogram"),
+                     ("receipt_store_receipts", "gauge")):
+    assert f"# TYPE {name} {kind}\n" in text
+    assert f"# HELP {name} " in text
+  assert text.endswith("\n")
+
+#test case for the lap timer: repeated stages add up, the header lists stages in first-run order
+def test_stage_timer():
+  timer = StageTimer()
+  timer.lap("json_decode")
+  timer.lap("regex")
+  timer.lap("datetime")
+  timer.lap("regex")
+  assert list(timer.stages) == ["json_decode", "regex", "datetime"]
+  assert all(duration >= 0 for duration in timer.stages.values())
+  timer.stages = {"json_decode": 1_500, "store_write": 2_000_000}
+  assert timer.header() == "json_decode;dur=0.002, store_write;dur=2.000"
+
+#test case for the stage histograms and their summary
+def test_stages():
+  metrics = Metrics("on")
+  timer = metrics.timer()
+  timer.stages = {"json_decode": 800, "store_write": 40_000}
+  metrics.stages("receipt_processor", timer)
+  timer.stages = {"json_decode": 3_000, "store_write": 40_000}
+  metrics.stages("receipt_processor", timer)
+  found = samples(metrics.render(0))
+  assert found[f'receipt_stage_duration_seconds_bucket{{route="receipt_processor",stage="json_decode",le="{STAGE_BUCKETS[0]}"}}'] == 1
+  assert found['receipt_stage_duration_seconds_bucket{route="receipt_processor",stage="json_decode",le="+Inf"}'] == 2
+  assert found['receipt_stage_duration_seconds_count{route="receipt_processor",stage="store_write"}'] == 2
+  summary = metrics.stage_summary()
+  assert summary["receipt_processor"]["json_decode"] == {"count": 2, "mean_us": 1.9, "p50_us": 1.0, "p99_us": 5.0}
+  assert summary["receipt_processor"]["store_write"]["p99_us"] == 50.0
+
+#test case for the stage timing settings
+def test_stage_timing():
+  assert Metrics().timer() is None #off by default, no timer and no cost
+  assert isinstance(Metrics("header").timer(), StageTimer)
+  assert Metrics().stage_summary() == {}
+  with pytest.raises(ValueError):
+    Metrics("sometimes")
+  assert stage_timing_from_environment({}) == "off"
+  assert stage_timing_from_environment({"RECEIPT_STAGE_TIMING": "header"}) == "header"
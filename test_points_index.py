@@ -0,0 +1,74 @@
+import json
+from ids import new_key
+from scoring import parse_receipt
+from storage import StoredReceipt, store_from_environment
+from points_index import IndexedLogStore, PointsIndex, main
+
+RECEIPT = parse_receipt({
+  "retailer": "Target",
+  "purchaseDate": "2022-01-02",
+  "purchaseTime": "13:13",
+  "total": "1.25",
+  "items": [{"shortDescription": "Pepsi - 12-oz", "price": "1.25"}]
+})
+
+#function to fill a store with receipts, returns {id: points}
+def fill(store, count):
+  ids = {new_key(): points for points in range(count)}
+  for receipt_id, points in ids.items():
+    store.put(receipt_id, RECEIPT, points)
+  return ids
+
+#test case for points lookups answered without reading the log
+def test_points_from_index(tmp_path):
+  store = IndexedLogStore(str(tmp_path / "receipts.log"), capacity=1 << 10)
+  ids = fill(store, 100)
+  assert [store.get_points(receipt_id) for receipt_id in ids] == list(ids.values())
+  assert store.decode.cache_info().misses == 0 #no log line was decoded
+  huge = new_key()
+  store.put(huge, RECEIPT, 1 << 70) #too large for a slot, read back from the log
+  assert store.get_points(huge) == 1 << 70
+  store.close()
+
+#test case for reopening after a clean close and after a crash
+def test_reopen_and_rebuild(tmp_path):
+  path = str(tmp_path / "receipts.log")
+  store = IndexedLogStore(path, capacity=1 << 10)
+  ids = fill(store, 50)
+  store.close()
+  store = IndexedLogStore(path)
+  assert store.index.capacity == 1 << 10 #the layout comes from the file
+  assert {receipt_id: store.get_points(receipt_id) for receipt_id in ids} == ids
+  more = fill(store, 10)
+  #a crash leaves the index marked dirty, the next open rebuilds it from the log
+  store.log.close()
+  store.index.close()
+  store.closed = True
+  with open(path, "a") as log:
+    log.write('["torn')
+  store = IndexedLogStore(path)
+  assert store.count() == 60
+  assert store.get(next(iter(more))) == StoredReceipt(RECEIPT, 0)
+  store.close()
+
+#test case for rebuilding the index from the command line
+def test_rebuild_cli(tmp_path, capsys):
+  path = str(tmp_path / "receipts.log")
+  store = IndexedLogStore(path, capacity=1 << 10)
+  ids = fill(store, 20)
+  store.close()
+  main([path, str(tmp_path / "fresh.index")])
+  assert json.loads(capsys.readouterr().out)["receipts"] == 20
+  index = PointsIndex(str(tmp_path / "fresh.index"))
+  assert index.count == 20 and index.clean
+  index.close()
+  store = IndexedLogStore(path, index_path=str(tmp_path / "fresh.index"))
+  assert {receipt_id: store.get_points(receipt_id) for receipt_id in ids} == ids
+  store.close()
+
+#test case for configuring the indexed engine from the environment
+def test_environment(tmp_path):
+  store = store_from_environment({"RECEIPT_STORE": "indexed", "RECEIPT_LOG_PATH": str(tmp_path / "receipts.log"),
+                                  "RECEIPT_INDEX_CAPACITY": "1024"})
+  assert isinstance(store, IndexedLogStore) and store.index.capacity == 1024
+  store.close()
@@ -0,0 +1,54 @@
+from array import array
+from core import points_calculator
+from records import ReceiptRecord, format_cents, record_from_state
+from scoring import parse_receipt, score_cents
+
+RECEIPT = {
+  "retailer": "M&M Corner Market",
+  "purchaseDate": "2022-03-20",
+  "purchaseTime": "14:33",
+  "items": [
+    {"shortDescription": "Gatorade", "price": "2.25"},
+    {"shortDescription": "Gatorade", "price": "2.25"},
+    {"shortDescription": "Gatorade", "price": "2.25"},
+    {"shortDescription": "Gatorade", "price": "2.25"}
+  ],
+  "total": "9.00"
+}
+
+#test case for rebuilding the json receipt from a record
+def test_to_dict():
+  assert parse_receipt(RECEIPT).to_dict() == RECEIPT
+  assert format_cents(5) == "0.05"
+
+#test case for reading a record like a receipt dict
+def test_dict_access():
+  record = parse_receipt(RECEIPT)
+  assert record["total"] == "9.00"
+  assert record.get("items") == RECEIPT["items"]
+  assert record.get("missing", "x") == "x"
+  assert points_calculator(record) == score_cents(record) == 109
+
+#test case for the compact layout
+def test_compact_layout():
+  record = parse_receipt(RECEIPT)
+  other = parse_receipt(dict(RECEIPT, retailer="".join(["M&M Corner ", "Market"])))
+  assert other.retailer is record.retailer #interned
+  assert record.descriptions[0] is record.descriptions[3]
+  assert isinstance(record.prices, array)
+  assert not hasattr(record, "__dict__")
+  assert record == other and record != parse_receipt(dict(RECEIPT, total="9.25"))
+
+#test case for prices too large for 64 bits
+def test_huge_prices():
+  record = ReceiptRecord("Target", "2022-01-02", "13:13", 1, ["ab"], [10 ** 30])
+  assert record.prices == (10 ** 30,)
+  assert record.items == (("ab", 10 ** 30),)
+
+#test case for the per-rule breakdown in the state, and states from before breakdowns
+def test_breakdown_state():
+  record = ReceiptRecord(*parse_receipt(RECEIPT).state()[:6], breakdown=[14, 50, 25, 10, 0, 0, 10])
+  assert isinstance(record.breakdown, array)
+  assert list(record_from_state(record.state()).breakdown) == [14, 50, 25, 10, 0, 0, 10]
+  assert record_from_state(record.state()[:6]).breakdown is None
+  assert ReceiptRecord(*record.state()[:6], breakdown=[1 << 40]).breakdown == (1 << 40,)
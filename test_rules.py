@@ -0,0 +1,54 @@
+from core import points_calculator
+from rules import RULES, AmountMultiple, CharacterCount, DescriptionLength, PerGroup, compile_rules, score_receipt, breakdown_receipt
+from scoring import breakdown_cents, parse_receipt
+
+#differential test: the compiled rules must match points_calculator on every generated receipt
+def test_matches_points_calculator(corpus):
+  for receipt in corpus:
+    assert score_receipt(receipt) == points_calculator(receipt), receipt
+
+#test case for the float semantics points_calculator has on totals too large for their cents
+def test_large_amounts_like_points_calculator():
+  receipt = {
+    "retailer": "",
+    "purchaseDate": "2022-01-02",
+    "purchaseTime": "13:13",
+    "total": "90071992547409931.01",
+    "items": [{"shortDescription": "abc", "price": "15.00"}]
+  }
+  assert score_receipt(receipt) == points_calculator(receipt) == 78
+
+#test case for missing fields, read with the same defaults as points_calculator
+def test_missing_fields():
+  for receipt in ({}, {"retailer": "Target"}, {"items": [{}, {"price": "1.00"}]}):
+    assert score_receipt(receipt) == points_calculator(receipt)
+
+#test case for compiling another rule set
+def test_custom_rules():
+  score = compile_rules((
+    CharacterCount("retailer", "0-9", points=3),
+    AmountMultiple("total", 10.0, 7),
+    PerGroup("items", 3, 1),
+    DescriptionLength("items", "shortDescription", 2, "price", 1.0),
+  ), name="custom")
+  receipt = {"retailer": "7-11", "total": "20.00",
+             "items": [{"shortDescription": " ab ", "price": "1.50"}, {"shortDescription": "abc", "price": "x"},
+                       {"shortDescription": "", "price": "0.10"}]}
+  assert score(receipt) == 9 + 7 + 1 + 2 + 1
+  assert score.__name__ == "custom"
+  assert "def custom(receipt):" in score.source
+
+#test case for the generated source: every field read once, one loop over the items
+def test_single_pass():
+  source = score_receipt.source
+  assert source.count("for ") == 1
+  assert source.count("receipt.get('total'") == 1
+  assert source.count("receipt.get('items'") == 1
+  assert len(RULES) == 7
+
+#test case for the compiled breakdown: the points of each rule, adding up to score_receipt
+def test_breakdown(corpus):
+  for receipt in corpus[:5000]:
+    breakdown = breakdown_receipt(receipt)
+    assert breakdown == breakdown_cents(parse_receipt(receipt))
+    assert sum(breakdown) == score_receipt(receipt)
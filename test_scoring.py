@@ -0,0 +1,26 @@
+from core import points_calculator
+from scoring import to_cents, parse_receipt, score_cents
+
+#test case for converting amounts to integer cents
+def test_to_cents():
+  assert to_cents("35.35") == 3535
+  assert to_cents("0.05") == 5
+  assert to_cents("12.00") == 1200
+  assert to_cents("7") == 700
+
+#differential test: the integer path must match points_calculator on every generated receipt
+def test_matches_points_calculator(corpus):
+  for receipt in corpus:
+    assert score_cents(parse_receipt(receipt)) == points_calculator(receipt), receipt
+
+#test case for totals too large for a float to hold their cents exactly
+def test_large_amounts_are_exact():
+  receipt = {
+    "retailer": "",
+    "purchaseDate": "2022-01-02",
+    "purchaseTime": "13:13",
+    "total": "90071992547409931.01", #float() rounds this to a round dollar amount
+    "items": [{"shortDescription": "ab", "price": "1.00"}]
+  }
+  assert score_cents(parse_receipt(receipt)) == 0 #no round dollar or quarter points
+  assert points_calculator(receipt) == 75 #the float path awards both
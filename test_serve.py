@@ -0,0 +1,15 @@
+from serve import server_config
+
+#test case for the default serving configuration
+def test_defaults():
+  config = server_config({})
+  assert config["bind"] == "0.0.0.0:5000"
+  assert config["workers"] == 1 and config["threads"] == 8
+  assert config["worker_class"] == "gthread"
+  assert config["accesslog"] is None
+
+#test case for configuring the server from the environment
+def test_environment():
+  config = server_config({"PORT": "8080", "WEB_WORKERS": "4", "WEB_THREADS": "16", "WEB_KEEPALIVE": "30", "WEB_BACKLOG": "4096"})
+  assert config["bind"] == "0.0.0.0:8080"
+  assert (config["workers"], config["threads"], config["keepalive"], config["backlog"]) == (4, 16, 30, 4096)
@@ -0,0 +1,122 @@
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+from ids import key_bytes, new_key
+import pytest
+from scoring import parse_receipt
+from shm_store import SharedMemoryStore, StoreFullError, VERSION, VERSION_OFFSET
+from storage import store_from_environment
+
+RECEIPT = {
+  "retailer": "Target",
+  "purchaseDate": "2022-01-02",
+  "purchaseTime": "13:13",
+  "total": "1.25",
+  "items": [{"shortDescription": "Pepsi - 12-oz", "price": "1.25"}]
+}
+
+#function to run a python snippet in a fresh process using the shared store at path
+def run_worker(path, code):
+  env = dict(os.environ, RECEIPT_STORE="shm", RECEIPT_SHM_PATH=path, RECEIPT_SHM_CAPACITY="4096", RECEIPT_SHM_DATA_MB="4")
+  result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+  return json.loads(result.stdout)
+
+#test case for a receipt posted to one worker process and read from another
+def test_post_and_read_across_processes(tmp_path):
+  path = str(tmp_path / "receipts.shm")
+  ids = run_worker(path, f"""
+import json
+from app import app
+client = app.test_client()
+print(json.dumps([client.post("/receipts/process", json={RECEIPT!r}).get_json()["id"] for _ in range(3)]))
+""")
+  points = run_worker(path, f"""
+import json
+from app import app
+client = app.test_client()
+print(json.dumps([client.get(f"/receipts/{{receipt_id}}/points").get_json()["points"] for receipt_id in {ids!r}]))
+""")
+  assert points == [31, 31, 31]
+
+def write_many(path, count, queue):
+  store = SharedMemoryStore(path)
+  record = parse_receipt(RECEIPT)
+  ids = [new_key() for _ in range(count)]
+  for points, receipt_id in enumerate(ids):
+    store.put(receipt_id, record, points)
+  store.close()
+  queue.put(ids)
+
+#test case for several processes writing at the same time
+def test_concurrent_processes(tmp_path):
+  path = str(tmp_path / "receipts.shm")
+  SharedMemoryStore(path, capacity=1 << 13, data_bytes=4 << 20).close()
+  queue = multiprocessing.Queue()
+  workers = [multiprocessing.Process(target=write_many, args=(path, 500, queue)) for _ in range(4)]
+  for worker in workers:
+    worker.start()
+  written = [queue.get() for _ in workers]
+  for worker in workers:
+    worker.join()
+  store = SharedMemoryStore(path)
+  assert store.capacity == 1 << 13 #the layout comes from the file
+  assert store.count() == 2000
+  for ids in written:
+    assert [entry.points for entry in store.get_many(ids)] == list(range(500))
+  store.close()
+
+#test case for a full table
+def test_store_full(tmp_path):
+  store = SharedMemoryStore(str(tmp_path / "receipts.shm"), capacity=4, data_bytes=1 << 16)
+  record = parse_receipt(RECEIPT)
+  for _ in range(3):
+    store.put(new_key(), record, 31)
+  with pytest.raises(StoreFullError):
+    store.put(new_key(), record, 31)
+  with pytest.raises(ValueError):
+    store.put("not-a-uuid", record, 31)
+  store.close()
+
+#test case for a slot left mid-update by a writer that died: reads fall back to the lock and
+#repair it, and the next write keeps the version parity right
+def test_dead_writer(tmp_path):
+  store = SharedMemoryStore(str(tmp_path / "receipts.shm"), capacity=16, data_bytes=1 << 16)
+  record = parse_receipt(RECEIPT)
+  receipt_id = new_key()
+  store.put(receipt_id, record, 31)
+  position, _ = store.find(key_bytes(receipt_id))
+  version = VERSION.unpack_from(store.map, position + VERSION_OFFSET)[0]
+  VERSION.pack_into(store.map, position + VERSION_OFFSET, version + 1) #odd, never finished
+  assert store.get(receipt_id).points == 31
+  assert VERSION.unpack_from(store.map, position + VERSION_OFFSET)[0] % 2 == 0
+  VERSION.pack_into(store.map, position + VERSION_OFFSET, version + 1)
+  store.put(receipt_id, record, 40)
+  assert VERSION.unpack_from(store.map, position + VERSION_OFFSET)[0] % 2 == 0
+  assert store.get(receipt_id).points == 40
+  store.close()
+
+#test case for a torn read that fails to decode, the reader retries instead of raising
+def test_torn_read_retries(tmp_path):
+  store = SharedMemoryStore(str(tmp_path / "receipts.shm"), capacity=16, data_bytes=1 << 16)
+  receipt_id = new_key()
+  store.put(receipt_id, parse_receipt(RECEIPT), 31)
+  decode, failures = store.decode, []
+  def torn(offset, length):
+    if not failures:
+      failures.append(offset)
+      raise ValueError("torn")
+    return decode(offset, length)
+  store.decode = torn
+  assert store.get(receipt_id).points == 31
+  assert failures
+  store.decode = decode
+  store.close()
+
+#test case for the shm engine refusing a per-worker write-ahead log
+def test_no_wal(tmp_path):
+  for name in ("RECEIPT_WAL", "RECEIPT_SNAPSHOT"):
+    with pytest.raises(ValueError):
+      store_from_environment({"RECEIPT_STORE": "shm", "RECEIPT_SHM_PATH": str(tmp_path / "receipts.shm"), name: str(tmp_path / "log")})
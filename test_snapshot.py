@@ -0,0 +1,124 @@
+import os
+import pickle
+import time
+from ids import new_key
+import pytest
+import wal
+from records import ReceiptRecord
+from scoring import parse_receipt
+from snapshot import read_snapshot, write_snapshot
+from storage import InMemoryStore, StoredReceipt
+from wal import DurableStore, WriteAheadLog
+
+RECEIPT = parse_receipt({
+  "retailer": "Target",
+  "purchaseDate": "2022-01-02",
+  "purchaseTime": "13:13",
+  "total": "1.25",
+  "items": [{"shortDescription": "Pepsi - 12-oz", "price": "1.25"}]
+})
+
+#test case for writing and reading a snapshot file
+def test_round_trip(tmp_path):
+  path = str(tmp_path / "receipts.snapshot")
+  entries = [(new_key(), StoredReceipt(RECEIPT, points)) for points in range(70000)] #more than one chunk
+  entries.append(("raw", StoredReceipt({"retailer": "Target"}, None)))
+  entries.append((new_key(), StoredReceipt(ReceiptRecord(*RECEIPT.state()[:6], breakdown=[6, 0, 25, 0, 0, 0, 0]), 31)))
+  assert write_snapshot(path, entries) == 70002
+  assert list(read_snapshot(path)) == [(receipt_id, receipt, points) for receipt_id, (receipt, points) in entries]
+  assert list(list(read_snapshot(path))[-1][1].breakdown) == [6, 0, 25, 0, 0, 0, 0]
+  assert not os.path.exists(path + ".tmp")
+
+#test case for a file that is not a snapshot
+def test_bad_magic(tmp_path):
+  path = tmp_path / "receipts.snapshot"
+  path.write_bytes(b"not a snapshot")
+  with pytest.raises(ValueError):
+    list(read_snapshot(str(path)))
+
+#test case for restarting from snapshot plus the log tail written after it
+def test_snapshot_and_tail(tmp_path):
+  wal_path, snapshot_path = str(tmp_path / "receipts.wal"), str(tmp_path / "receipts.snapshot")
+  store = DurableStore(InMemoryStore(), wal_path, snapshot_path=snapshot_path)
+  before = [new_key() for _ in range(30)]
+  for receipt_id in before:
+    store.put(receipt_id, RECEIPT, 1)
+  assert store.snapshot() == 30
+  assert os.path.getsize(wal_path) == 0 #the log behind the snapshot is gone
+  after = [new_key() for _ in range(5)]
+  for receipt_id in after:
+    store.put(receipt_id, RECEIPT, 2)
+  store.close()
+
+  assert len(list(WriteAheadLog.replay(wal_path))) == 5 #only the tail is replayed
+  restarted = DurableStore(InMemoryStore(), wal_path, snapshot_path=snapshot_path)
+  assert restarted.count() == 35
+  assert {restarted.get(receipt_id).points for receipt_id in before} == {1}
+  assert {restarted.get(receipt_id).points for receipt_id in after} == {2}
+  restarted.close()
+
+#test case for a crash after the log was rotated but before the snapshot was written
+def test_interrupted_snapshot(tmp_path):
+  wal_path, snapshot_path = str(tmp_path / "receipts.wal"), str(tmp_path / "receipts.snapshot")
+  store = DurableStore(InMemoryStore(), wal_path, snapshot_path=snapshot_path)
+  receipt_id = new_key()
+  store.put(receipt_id, RECEIPT, 31)
+  store.log.rotate(wal_path + ".compacting") #the snapshot never gets written
+  store.close()
+
+  restarted = DurableStore(InMemoryStore(), wal_path, snapshot_path=snapshot_path)
+  assert restarted.get(receipt_id).points == 31 #recovered from the rotated segment
+  assert not os.path.exists(wal_path + ".compacting") #folded back into the log
+  restarted.put(new_key(), RECEIPT, 31)
+  restarted.close()
+  assert len(list(WriteAheadLog.replay(wal_path))) == 2
+
+#test case for snapshots that fail, e.g. on a full disk, one after another
+def test_failed_snapshots(tmp_path, monkeypatch):
+  wal_path, snapshot_path = str(tmp_path / "receipts.wal"), str(tmp_path / "receipts.snapshot")
+  store = DurableStore(InMemoryStore(), wal_path, snapshot_path=snapshot_path)
+  def disk_full(path, entries):
+    raise OSError("No space left on device")
+  monkeypatch.setattr(wal, "write_snapshot", disk_full)
+  ids = []
+  for _ in range(2):
+    ids.append(new_key())
+    store.put(ids[-1], RECEIPT, 31)
+    with pytest.raises(OSError):
+      store.snapshot()
+  store.close()
+  #the second rotation kept the first failed snapshot's segment instead of replacing it
+  assert [entry[0] for entry in WriteAheadLog.replay(wal_path + ".compacting")] == ids
+  monkeypatch.undo()
+  restarted = DurableStore(InMemoryStore(), wal_path, snapshot_path=snapshot_path)
+  assert [restarted.get(receipt_id).points for receipt_id in ids] == [31, 31]
+  restarted.close()
+
+#test case for the periodic snapshot thread surviving a failed snapshot
+def test_periodic_snapshot_failure(tmp_path, monkeypatch):
+  wal_path, snapshot_path = str(tmp_path / "receipts.wal"), str(tmp_path / "receipts.snapshot")
+  calls = []
+  real_write = wal.write_snapshot
+  def flaky(path, entries):
+    calls.append(path)
+    if len(calls) == 1:
+      raise OSError("No space left on device")
+    return real_write(path, entries)
+  monkeypatch.setattr(wal, "write_snapshot", flaky)
+  store = DurableStore(InMemoryStore(), wal_path, snapshot_path=snapshot_path, snapshot_seconds=0.02)
+  store.put(new_key(), RECEIPT, 31)
+  for _ in range(200):
+    if os.path.exists(snapshot_path):
+      break
+    time.sleep(0.01)
+  store.close()
+  assert len(calls) >= 2 and len(list(read_snapshot(snapshot_path))) == 1
+
+#test case for snapshots written before records.py, with items as (description, cents) pairs
+def test_legacy_snapshot(tmp_path):
+  path = str(tmp_path / "receipts.snapshot")
+  with open(path, "wb") as file:
+    file.write(b"RCPTSNP1")
+    pickle.dump([("old", ("Target", "2022-01-02", "13:13", 125, (("Pepsi - 12-oz", 125),)), 31)], file)
+    pickle.dump(None, file)
+  assert list(read_snapshot(path)) == [("old", RECEIPT, 31)]
@@ -0,0 +1,150 @@
+import gc
+import sqlite3
+import threading
+from ids import new_key, format_id, key_bytes
+import pytest
+from records import ReceiptRecord
+from scoring import parse_receipt
+from storage import StoredReceipt, store_from_environment
+from sqlite_store import SCHEMA, SQLiteStore
+
+RECEIPT = {
+  "retailer": "Target",
+  "purchaseDate": "2022-01-02",
+  "purchaseTime": "13:13",
+  "total": "6.49",
+  "items": [
+    {"shortDescription": "Mountain Dew 12PK", "price": "6.49"},
+    {"shortDescription": "Emils Cheese Pizza", "price": "0.00"}
+  ]
+}
+
+#test case for receipts surviving a reopen
+def test_reopen(tmp_path):
+  path = str(tmp_path / "receipts.db")
+  store = SQLiteStore(path)
+  ids = [new_key() for _ in range(600)] #more than one batch
+  for points, receipt_id in enumerate(ids):
+    store.put(receipt_id, parse_receipt(RECEIPT), points)
+  store.put(ids[0], parse_receipt(RECEIPT), None)
+  store.close()
+  store = SQLiteStore(path)
+  assert store.count() == 600
+  assert store.get(ids[0]) == StoredReceipt(parse_receipt(RECEIPT), None)
+  assert store.get(ids[599]).receipt.items == (("Mountain Dew 12PK", 649), ("Emils Cheese Pizza", 0))
+  store.close()
+
+#test case for the normalized schema and the points index
+def test_queryable(tmp_path):
+  path = str(tmp_path / "receipts.db")
+  store = SQLiteStore(path, commit_ms=60000)
+  ids = [new_key() for _ in range(10)]
+  for points, receipt_id in enumerate(ids):
+    store.put(receipt_id, parse_receipt(RECEIPT), points * 10)
+  assert store.ids_with_points(30, 50) == ids[3:6]
+  #committed rows are visible to any other connection
+  connection = sqlite3.connect(path)
+  assert connection.execute("SELECT COUNT(*) FROM items WHERE price_cents = 0").fetchone()[0] == 10
+  plan = " ".join(row[3] for row in connection.execute("EXPLAIN QUERY PLAN SELECT id FROM receipts WHERE points > 30"))
+  assert "receipts_by_points" in plan
+  connection.close()
+  store.close()
+
+#test case for raw receipts from older stores
+def test_raw_receipt(tmp_path):
+  store = SQLiteStore(str(tmp_path / "receipts.db"))
+  receipt_id = new_key()
+  store.put(receipt_id, RECEIPT, None)
+  store.flush()
+  assert store.get(receipt_id).receipt.to_dict() == RECEIPT
+  store.close()
+
+#test case for configuring the sqlite engine from the environment
+def test_environment(tmp_path):
+  store = store_from_environment({"RECEIPT_STORE": "sqlite", "RECEIPT_SQLITE_PATH": str(tmp_path / "receipts.db"),
+                                  "RECEIPT_SQLITE_BATCH": "16"})
+  assert isinstance(store, SQLiteStore) and store.batch_size == 16
+  store.close()
+
+#test case for reading many receipts at once, across chunks and from the pending batch
+def test_get_many(tmp_path):
+  store = SQLiteStore(str(tmp_path / "receipts.db"), batch_size=1000, commit_ms=60000)
+  ids = [new_key() for _ in range(1200)]
+  for points, receipt_id in enumerate(ids):
+    store.put(receipt_id, parse_receipt(RECEIPT), points) #the last 200 are still pending
+  asked = ids[::-1] + ["missing", ids[0]]
+  found = store.get_many(asked)
+  assert [entry.points for entry in found[:1200]] == list(range(1199, -1, -1))
+  assert found[1200] is None and found[1201].points == 0
+  assert found[1201].receipt.items == (("Mountain Dew 12PK", 649), ("Emils Cheese Pizza", 0))
+  store.close()
+
+#test case for a failed write undoing that receipt alone, the rest of the batch still commits
+def test_failed_put(tmp_path):
+  path = str(tmp_path / "receipts.db")
+  store = SQLiteStore(path, commit_ms=60000)
+  kept = new_key()
+  store.put(kept, parse_receipt(RECEIPT), 10)
+  store.writer.execute("CREATE TRIGGER no_pizza BEFORE INSERT ON items WHEN NEW.short_description = 'Emils Cheese Pizza' BEGIN SELECT RAISE(ABORT, 'no pizza'); END")
+  failed = new_key()
+  with pytest.raises(sqlite3.DatabaseError):
+    store.put(failed, parse_receipt(RECEIPT), 20)
+  assert not store.contains(failed)
+  store.writer.execute("DROP TRIGGER no_pizza")
+  store.close()
+  store = SQLiteStore(path)
+  assert store.count() == 1 and store.get(kept).points == 10
+  assert store.get(failed) is None
+  store.close()
+
+#test case for the reader connection of a finished thread getting closed
+def test_thread_readers_released(tmp_path):
+  store = SQLiteStore(str(tmp_path / "receipts.db"))
+  receipt_id = new_key()
+  store.put(receipt_id, parse_receipt(RECEIPT), 31)
+  opened = len(store.connections)
+  for _ in range(20):
+    thread = threading.Thread(target=store.get, args=(receipt_id,))
+    thread.start()
+    thread.join()
+  gc.collect()
+  assert len(store.connections) == opened
+  store.close()
+
+#test case for a database written when ids were stored as uuid text
+def test_text_ids_migrated(tmp_path):
+  path = str(tmp_path / "receipts.db")
+  old = sqlite3.connect(path)
+  old.executescript(SCHEMA.replace("id BLOB", "id TEXT"))
+  key = new_key()
+  number = old.execute("INSERT INTO receipts (id, retailer, purchase_date, purchase_time, total_cents, points) VALUES (?, 'Target', '2022-01-02', '13:13', 649, 6)",
+                       (format_id(key),)).lastrowid
+  old.execute("INSERT INTO items VALUES (?, 0, 'Mountain Dew 12PK', 649)", (number,))
+  old.commit()
+  old.close()
+  store = SQLiteStore(path)
+  assert store.get(key).points == 6
+  assert store.get(key).receipt.items == (("Mountain Dew 12PK", 649),)
+  assert store.ids_with_points(0, 10) == [key]
+  store.close()
+  columns = {row[1]: row[2] for row in sqlite3.connect(path).execute("PRAGMA table_info(receipts)")}
+  assert columns["id"] == "BLOB"
+
+#test case for a database written before breakdowns were kept
+def test_breakdown_column_added(tmp_path):
+  path = str(tmp_path / "receipts.db")
+  old = sqlite3.connect(path)
+  old.executescript(SCHEMA.replace(",\n    breakdown BLOB", ""))
+  key = new_key()
+  old.execute("INSERT INTO receipts (id, retailer, purchase_date, purchase_time, total_cents, points) VALUES (?, 'Target', '2022-01-02', '13:13', 649, 6)",
+              (key_bytes(key),))
+  old.commit()
+  old.close()
+  store = SQLiteStore(path)
+  assert store.get(key).receipt.breakdown is None
+  other = new_key()
+  store.put(other, ReceiptRecord(*parse_receipt(RECEIPT).state()[:6], breakdown=[6, 0, 0, 5, 0, 0, 0]), 11)
+  store.close()
+  store = SQLiteStore(path)
+  assert list(store.get(other).receipt.breakdown) == [6, 0, 0, 5, 0, 0, 0]
+  store.close()
@@ -0,0 +1,145 @@
+#shared test suite for the receipt storage engines, every engine in STORES must pass all of it
+import threading
+from ids import new_key
+import pytest
+from decoder import parse_and_score
+from scoring import parse_receipt
+from storage import InMemoryStore, ShardedStore, StoredReceipt, create_store, store_from_environment
+from wal import DurableStore
+from shm_store import SharedMemoryStore
+from sqlite_store import SQLiteStore
+from points_index import IndexedLogStore
+
+STORES = {
+  "memory": lambda tmp_path: InMemoryStore(),
+  "sharded": lambda tmp_path: ShardedStore(),
+  "shm": lambda tmp_path: SharedMemoryStore(str(tmp_path / "receipts.shm"), capacity=1 << 13, data_bytes=16 << 20),
+  "sqlite": lambda tmp_path: SQLiteStore(str(tmp_path / "receipts.db")),
+  "indexed": lambda tmp_path: IndexedLogStore(str(tmp_path / "receipts.log"), capacity=1 << 13),
+  "memory+wal": lambda tmp_path: DurableStore(InMemoryStore(), str(tmp_path / "receipts.wal")),
+}
+
+@pytest.fixture(params=sorted(STORES))
+def store(request, tmp_path):
+  store = STORES[request.param](tmp_path)
+  yield store
+  store.close()
+
+#function to build a parsed receipt with the given total
+def make_parsed(total="1.25"):
+  return parse_receipt({
+    "retailer": "Target",
+    "purchaseDate": "2022-01-02",
+    "purchaseTime": "13:13",
+    "total": total,
+    "items": [{"shortDescription": "Pepsi - 12-oz", "price": "1.25"}]
+  })
+
+#test case for put and get
+def test_put_get(store):
+  receipt_id = new_key()
+  store.put(receipt_id, make_parsed(), 31)
+  assert store.get(receipt_id) == StoredReceipt(make_parsed(), 31)
+  assert store.get(new_key()) is None
+
+#test case for replacing a receipt, e.g. when lazily scored points are stored
+def test_replace(store):
+  receipt_id = new_key()
+  store.put(receipt_id, make_parsed(), None)
+  store.put(receipt_id, make_parsed(), 31)
+  assert store.get(receipt_id).points == 31
+  assert store.count() == 1
+
+#test case for points lookups, None for unknown ids and unscored receipts
+def test_get_points(store):
+  scored, unscored = new_key(), new_key()
+  store.put(scored, make_parsed(), 31)
+  store.put(unscored, make_parsed(), None)
+  assert store.get_points(scored) == 31
+  assert store.get_points(unscored) is None
+  assert store.get_points(new_key()) is None
+
+#test case for looking up many ids at once
+def test_get_many(store):
+  ids = [new_key() for _ in range(5)]
+  for index, receipt_id in enumerate(ids):
+    store.put(receipt_id, make_parsed(f"{index}.00"), index)
+  missing = new_key()
+  found = store.get_many([ids[3], missing, ids[0], ""])
+  assert [entry.points if entry else None for entry in found] == [3, None, 0, None]
+
+#test case for contains, count and iterate
+def test_contains_count_iterate(store):
+  ids = {new_key(): points for points in range(20)}
+  for receipt_id, points in ids.items():
+    store.put(receipt_id, make_parsed(), points)
+  assert store.count() == 20
+  assert all(store.contains(receipt_id) for receipt_id in ids)
+  assert not store.contains(new_key())
+  assert {receipt_id: entry.points for receipt_id, entry in store.iterate()} == ids
+
+#test case for the per-rule breakdown on records, kept by every engine
+def test_breakdown(store):
+  receipt_id = new_key()
+  record, points, _ = parse_and_score({"retailer": "Target", "purchaseDate": "2022-01-03", "purchaseTime": "14:13", "total": "1.25",
+                                       "items": [{"shortDescription": "Pepsi - 12-oz", "price": "1.25"}]})
+  store.put(receipt_id, record, points)
+  if hasattr(store, "flush"):
+    store.flush() #read the sqlite engine's copy from the database, not from its pending receipts
+  assert list(store.get(receipt_id).receipt.breakdown) == [6, 0, 25, 0, 0, 6, 10]
+  store.put(receipt_id, make_parsed(), 31) #a record without one
+  assert store.get(receipt_id).receipt.breakdown is None
+
+#test case for unknown engine names
+def test_unknown_engine():
+  with pytest.raises(ValueError):
+    create_store("no-such-engine")
+
+#concurrency stress test: writers, readers and an iterator running at the same time
+def test_concurrent_access(store):
+  threads, per_thread = 8, 300
+  ids = [[new_key() for _ in range(per_thread)] for _ in range(threads)]
+  record = make_parsed()
+  errors = []
+  def write_and_read(own):
+    try:
+      for points, receipt_id in enumerate(own):
+        store.put(receipt_id, record, points)
+        assert store.get(receipt_id).points == points #a writer always sees its own write
+    except Exception as error: #reported from the main thread
+      errors.append(error)
+  def iterate():
+    try:
+      for _ in range(20):
+        for receipt_id, entry in store.iterate():
+          assert entry.receipt == record
+    except Exception as error:
+      errors.append(error)
+  workers = [threading.Thread(target=write_and_read, args=(own,)) for own in ids]
+  workers.append(threading.Thread(target=iterate))
+  for worker in workers:
+    worker.start()
+  for worker in workers:
+    worker.join()
+  assert errors == []
+  assert store.count() == threads * per_thread
+  assert [entry.points for entry in store.get_many(ids[3])] == list(range(per_thread))
+
+#test case for which engines an asyncio server must call from a worker thread
+def test_blocking_flags(tmp_path):
+  expected = {"memory": (False, False), "sharded": (False, False), "shm": (False, True),
+              "sqlite": (True, True), "indexed": (True, True), "memory+wal": (False, False)}
+  for name, (reads, writes) in expected.items():
+    store = STORES[name](tmp_path)
+    assert (store.blocking_reads, store.blocking_writes) == (reads, writes), name
+    store.close()
+  store = DurableStore(InMemoryStore(), str(tmp_path / "always.wal"), fsync="always")
+  assert store.blocking_writes and not store.blocking_reads
+  store.close()
+
+#test case for the sharded engine's configuration
+def test_sharded_configuration():
+  with pytest.raises(ValueError):
+    ShardedStore(shards=48)
+  store = store_from_environment({"RECEIPT_STORE": "sharded", "RECEIPT_SHARDS": "16"})
+  assert isinstance(store, ShardedStore) and len(store.shards) == 16
@@ -0,0 +1,76 @@
+import pytest
+from validator import parse_date, parse_time, validate_receipt
+
+def valid_receipt():
+  return {
+    "retailer": "Target",
+    "purchaseDate": "2022-01-02",
+    "purchaseTime": "13:13",
+    "total": "1.25",
+    "items": [{"shortDescription": "Pepsi - 12-oz", "price": "1.25"}]
+  }
+
+#test cases for the fixed-width date parser
+@pytest.mark.parametrize("text, expected", [
+  ("2022-01-02", (2022, 1, 2)),
+  ("2024-02-29", (2024, 2, 29)), #leap year
+  ("2000-02-29", (2000, 2, 29)), #divisible by 400 is a leap year
+  ("1900-02-29", None), #divisible by 100 is not
+  ("2022-02-29", None),
+  ("2022-04-31", None),
+  ("2022-13-01", None),
+  ("2022-00-10", None),
+  ("0000-01-01", None),
+  ("01-02-2022", None), #MM-DD-YYYY
+  ("2022-1-2", None), #not zero padded
+  ("2022/01/02", None),
+  ("2022-0a-02", None),
+  ("２０２２-01-02", None), #non-ascii digits
+])
+def test_parse_date(text, expected):
+  assert parse_date(text) == expected
+
+#test cases for the fixed-width time parser
+@pytest.mark.parametrize("text, expected", [
+  ("13:01", (13, 1)),
+  ("00:00", (0, 0)),
+  ("23:59", (23, 59)),
+  ("24:00", None),
+  ("12:60", None),
+  ("1:01 PM", None),
+  ("1:01", None),
+  ("13-01", None),
+])
+def test_parse_time(text, expected):
+  assert parse_time(text) == expected
+
+#test case for a valid receipt
+def test_valid_receipt():
+  assert validate_receipt(valid_receipt()) == []
+
+#test case for errors being reported per field
+def test_error_list():
+  receipt = valid_receipt()
+  receipt["total"] = "10"
+  receipt["purchaseTime"] = "25:00"
+  receipt["items"].append({"shortDescription": "  ", "price": "1.5"})
+  receipt["items"].append("not an item")
+  fields = [error["field"] for error in validate_receipt(receipt)]
+  assert fields == ["purchaseTime", "total", "items[1].shortDescription", "items[1].price", "items[2]"]
+
+#test case for missing fields and non-object receipts
+def test_missing_fields():
+  receipt = valid_receipt()
+  del receipt["retailer"], receipt["items"]
+  assert [error["field"] for error in validate_receipt(receipt)] == ["retailer", "items"]
+  assert validate_receipt(None)
+  assert validate_receipt(["not", "a", "receipt"])
+
+#test case for money amounts
+@pytest.mark.parametrize("total, valid", [
+  ("0.00", True), ("123.45", True), ("1.5", False), (".50", False), ("1.00\n", False), (1.25, False),
+])
+def test_amounts(total, valid):
+  receipt = valid_receipt()
+  receipt["total"] = total
+  assert (validate_receipt(receipt) == []) == valid
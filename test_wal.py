@@ -0,0 +1,123 @@
+import os
+import threading
+from ids import new_key
+import pytest
+from records import ReceiptRecord
+from scoring import parse_receipt
+from storage import InMemoryStore, store_from_environment
+from wal import DurableStore, WriteAheadLog
+
+RECEIPT = parse_receipt({
+  "retailer": "Target",
+  "purchaseDate": "2022-01-02",
+  "purchaseTime": "13:13",
+  "total": "1.25",
+  "items": [{"shortDescription": "Pepsi - 12-oz", "price": "1.25"}]
+})
+
+#test case for receipts surviving a restart under every fsync policy
+@pytest.mark.parametrize("fsync", ["always", "interval", "never"])
+def test_replay(tmp_path, fsync):
+  path = str(tmp_path / "receipts.wal")
+  store = DurableStore(InMemoryStore(), path, fsync=fsync, interval_ms=1)
+  ids = [new_key() for _ in range(50)]
+  for points, receipt_id in enumerate(ids):
+    store.put(receipt_id, RECEIPT, points)
+  store.close()
+
+  restarted = DurableStore(InMemoryStore(), path, fsync=fsync)
+  assert restarted.count() == 50
+  assert restarted.get(ids[7]).receipt == RECEIPT #parsed receipts round trip exactly
+  assert [restarted.get(receipt_id).points for receipt_id in ids] == list(range(50))
+  restarted.close()
+
+#test case for raw receipt dicts and unscored receipts in the log
+def test_raw_receipts(tmp_path):
+  path = str(tmp_path / "receipts.wal")
+  store = DurableStore(InMemoryStore(), path)
+  receipt_id = new_key()
+  store.put(receipt_id, {"retailer": "Target", "total": "1.25"}, None)
+  store.close()
+  restarted = DurableStore(InMemoryStore(), path)
+  assert restarted.get(receipt_id) == ({"retailer": "Target", "total": "1.25"}, None)
+  restarted.close()
+
+#test case for records with and without a per-rule breakdown in the log
+def test_breakdown(tmp_path):
+  path = str(tmp_path / "receipts.wal")
+  store = DurableStore(InMemoryStore(), path)
+  scored, plain = new_key(), new_key()
+  store.put(scored, ReceiptRecord(*RECEIPT.state()[:6], breakdown=[1, 2, 3, 4, 5, 6, 7]), 28)
+  store.put(plain, RECEIPT, 31)
+  store.close()
+  restarted = DurableStore(InMemoryStore(), path)
+  assert list(restarted.get(scored).receipt.breakdown) == [1, 2, 3, 4, 5, 6, 7]
+  assert restarted.get(plain).receipt.breakdown is None
+  restarted.close()
+
+FIRST, THIRD = new_key(), new_key()
+
+#test case for a torn last line left by a crash in the middle of a write
+def test_torn_write(tmp_path):
+  path = str(tmp_path / "receipts.wal")
+  log = WriteAheadLog(path, fsync="always")
+  log.append(FIRST, RECEIPT, 31)
+  log.close()
+  with open(path, "a") as file:
+    file.write('["second",["Tar')
+  assert [entry[0] for entry in WriteAheadLog.replay(path)] == [FIRST]
+
+  #the torn line is cut off so new entries start on a clean line
+  log = WriteAheadLog(path, fsync="always")
+  log.append(THIRD, RECEIPT, 31)
+  log.close()
+  assert [entry[0] for entry in WriteAheadLog.replay(path)] == [FIRST, THIRD]
+
+#test case for a damaged line in the middle of the log
+def test_corrupt_line(tmp_path):
+  path = str(tmp_path / "receipts.wal")
+  log = WriteAheadLog(path, fsync="always")
+  log.append(FIRST, RECEIPT, 31)
+  log.close()
+  with open(path, "a") as file:
+    file.write('["second",["Tar\n5\n')
+  log = WriteAheadLog(path, fsync="always")
+  log.append(THIRD, RECEIPT, 31)
+  log.close()
+  size = os.path.getsize(path)
+  #damaged lines are skipped, the entries after them are kept and nothing is cut off
+  assert [entry[0] for entry in WriteAheadLog.replay(path)] == [FIRST, THIRD]
+  assert os.path.getsize(path) == size
+
+#test case for group commit with many writers
+def test_concurrent_writers(tmp_path):
+  path = str(tmp_path / "receipts.wal")
+  log = WriteAheadLog(path, fsync="always")
+  def write(thread):
+    for index in range(100):
+      log.append(new_key(), RECEIPT, index)
+  threads = [threading.Thread(target=write, args=(thread,)) for thread in range(8)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  assert log.synced == log.written == 800 #every write was covered by some fsync
+  log.close()
+  assert len(list(WriteAheadLog.replay(path))) == 800
+
+#test case for turning durable mode on from the environment
+def test_store_from_environment(tmp_path):
+  path = str(tmp_path / "receipts.wal")
+  store = store_from_environment({"RECEIPT_WAL": path, "RECEIPT_WAL_FSYNC": "always"})
+  assert isinstance(store, DurableStore) and store.log.fsync == "always"
+  store.close()
+  assert not isinstance(store_from_environment({}), DurableStore)
+  with pytest.raises(ValueError):
+    store_from_environment({"RECEIPT_WAL": path, "RECEIPT_WAL_FSYNC": "sometimes"})
+
+#test case for logs written before records.py, with items as [description, cents] pairs
+#(the log keeps ids as uuid strings, they come back as int keys)
+def test_legacy_entries(tmp_path):
+  path = tmp_path / "receipts.wal"
+  path.write_text('["adb6b560-0eef-42bc-9d16-df48f30e89b2",["Target","2022-01-02","13:13",125,[["Pepsi - 12-oz",125]]],31]\n')
+  assert list(WriteAheadLog.replay(str(path))) == [(0xadb6b5600eef42bc9d16df48f30e89b2, RECEIPT, 31)]
@@ -0,0 +1,86 @@
+#validation rules for submitted receipts
+#patterns are compiled once at import and dates/times are parsed by hand from their
+#fixed-width layout, so checking a receipt never goes through re.match or strptime
+import re
+
+#money amounts like "12.25": ascii digits, a dot and exactly two digits
+AMOUNT = re.compile(r"[0-9]+\.[0-9]{2}").fullmatch
+
+REQUIRED = ("retailer", "purchaseDate", "purchaseTime", "items", "total")
+
+DAYS_IN_MONTH = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+#function to parse a YYYY-MM-DD date, returns (year, month, day) or None if it is not a real date
+def parse_date(text):
+    if len(text) != 10 or text[4] != "-" or text[7] != "-":
+        return None
+    digits = text[0:4] + text[5:7] + text[8:10]
+    if not (digits.isascii() and digits.isdigit()):
+        return None
+    year, month, day = int(text[0:4]), int(text[5:7]), int(text[8:10])
+    if year == 0 or not 1 <= month <= 12 or day == 0:
+        return None
+    days = DAYS_IN_MONTH[month]
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        days = 29 #leap year
+    if day > days:
+        return None
+    return year, month, day
+
+#function to parse a HH:MM (24hr format) time, returns (hour, minute) or None
+def parse_time(text):
+    if len(text) != 5 or text[2] != ":":
+        return None
+    digits = text[0:2] + text[3:5]
+    if not (digits.isascii() and digits.isdigit()):
+        return None
+    hour, minute = int(text[0:2]), int(text[3:5])
+    if hour > 23 or minute > 59:
+        return None
+    return hour, minute
+
+#function to validate a receipt, returns a list of {"field", "error"} dicts (empty when valid)
+def validate_receipt(receipt):
+    if not isinstance(receipt, dict) or not receipt:
+        return [{"field": "", "error": "receipt must be a non-empty json object"}]
+
+    #validation for all required fields
+    missing = [field for field in REQUIRED if field not in receipt]
+    if missing:
+        return [{"field": field, "error": "required field is missing"} for field in missing]
+
+    errors = []
+
+    if not isinstance(receipt["retailer"], str):
+        errors.append({"field": "retailer", "error": "must be a string"})
+
+    date = receipt["purchaseDate"]
+    if not isinstance(date, str) or parse_date(date) is None:
+        errors.append({"field": "purchaseDate", "error": "must be a date like 2022-01-31"})
+
+    time = receipt["purchaseTime"]
+    if not isinstance(time, str) or parse_time(time) is None:
+        errors.append({"field": "purchaseTime", "error": "must be a 24hr time like 13:01"})
+
+    total = receipt["total"]
+    if not isinstance(total, str) or not AMOUNT(total):
+        errors.append({"field": "total", "error": "must be an amount like 6.49"})
+
+    items = receipt["items"]
+    if not isinstance(items, list) or not items:
+        errors.append({"field": "items", "error": "must be a non-empty list"})
+        return errors
+
+    #validation for every item in the item list
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"field": f"items[{index}]", "error": "must be a json object"})
+            continue
+        description = item.get("shortDescription")
+        if not isinstance(description, str) or not description.strip():
+            errors.append({"field": f"items[{index}].shortDescription", "error": "must be a non-blank string"})
+        price = item.get("price")
+        if not isinstance(price, str) or not AMOUNT(price):
+            errors.append({"field": f"items[{index}].price", "error": "must be an amount like 6.49"})
+
+    return errors
@@ -0,0 +1,280 @@
+#append-only write-ahead log for receipts
+#every accepted receipt is appended as one compact NDJSON line before it is stored, and the
+#log is replayed into the store at startup so receipts survive restarts and redeploys
+#with a snapshot path the store is periodically written to a snapshot (see snapshot.py) and
+#the log behind it is dropped, so startup loads the snapshot plus a short log tail
+import atexit
+import json
+import logging
+import os
+import threading
+
+from ids import as_key, format_id
+from records import ReceiptRecord, record_from_state
+from snapshot import read_snapshot, write_snapshot
+from storage import ReceiptStore
+
+logger = logging.getLogger(__name__)
+
+#fsync policies: after every write (group committed), every N milliseconds, or never
+FSYNC_POLICIES = ("always", "interval", "never")
+
+#function to turn a stored receipt into a json value
+def encode_receipt(receipt):
+    if isinstance(receipt, ReceiptRecord):
+        #records are written as a flat list: retailer, date, time, total, descriptions, prices and
+        #the points per rule when the record has them
+        retailer, date, time, total_cents, descriptions, prices, breakdown = receipt.state()
+        value = [retailer, date, time, total_cents, descriptions, list(prices)]
+        if breakdown is not None:
+            value.append(list(breakdown))
+        return value
+    return receipt #raw json receipt dict
+
+#function to turn a json value from encode_receipt back into the stored receipt
+def decode_receipt(value):
+    if isinstance(value, list):
+        return record_from_state(value)
+    return value
+
+#function to encode one stored receipt as a log line
+#the log keeps receipt ids in their uuid string form, the form clients see
+def encode_entry(receipt_id, receipt, points):
+    return json.dumps([format_id(receipt_id), encode_receipt(receipt), points], separators=(",", ":")) + "\n"
+
+#function to decode a log line back into (receipt_id, receipt, points), with the id as a key
+def decode_entry(line):
+    receipt_id, receipt, points = json.loads(line)
+    return as_key(receipt_id), decode_receipt(receipt), points
+
+#function to append the file at source_path (if there is one) to the file at path, durably
+def append_file(path, source_path):
+    with open(path, "ab") as target:
+        if os.path.exists(source_path):
+            with open(source_path, "rb") as source:
+                while True:
+                    block = source.read(1 << 20)
+                    if not block:
+                        break
+                    target.write(block)
+        target.flush()
+        os.fsync(target.fileno())
+
+class WriteAheadLog:
+    """ an append-only NDJSON file,
+    flushed and fsynced according to the fsync policy """
+
+    def __init__(self, path, fsync="interval", interval_ms=10):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"unknown fsync policy: {fsync}")
+        self.path = path
+        self.fsync = fsync
+        self.interval = interval_ms / 1000
+        self.file = open(path, "a", encoding="utf-8", newline="\n")
+        self.size = self.file.tell() #bytes in the file, entries are ascii so characters are bytes
+        self.lock = threading.Lock() #guards writes to the file
+        self.sync_lock = threading.Lock() #only one fsync runs at a time
+        self.written = 0 #number of entries handed to the file
+        self.synced = 0 #number of entries known to be on disk
+        self.closed = False
+        if fsync == "interval":
+            self.stopped = threading.Event()
+            self.syncer = threading.Thread(target=self.sync_periodically, name="wal-fsync", daemon=True)
+            self.syncer.start()
+        atexit.register(self.close)
+
+    #function to read every complete entry of a log file, dropping a torn last line
+    @staticmethod
+    def replay(path):
+        for _, _, entry in WriteAheadLog.scan(path):
+            yield entry
+
+    #function to read (offset, length, entry) for every complete entry of a log file, dropping a
+    #torn last line; offset and length locate the entry's line in the file
+    @staticmethod
+    def scan(path):
+        if not os.path.exists(path):
+            return
+        offset = 0 #offset of the current line
+        torn = None #offset of a torn last line, if there is one
+        with open(path, "rb") as log:
+            for line in log:
+                if not line.endswith(b"\n"):
+                    torn = offset #only the last line can lack its newline: a crash mid-write
+                    break
+                try:
+                    entry = decode_entry(line)
+                except (ValueError, TypeError, KeyError, IndexError):
+                    #a complete line that does not decode is damage, not a torn write: it is
+                    #skipped (and reported), never cut off together with the entries after it
+                    logger.error("skipping unreadable entry at offset %d of %s", offset, path)
+                else:
+                    yield offset, len(line), entry
+                offset += len(line)
+        if torn is not None:
+            with open(path, "r+b") as log:
+                log.truncate(torn)
+
+    def append(self, receipt_id, receipt, points):
+        self.commit(self.write(receipt_id, receipt, points))
+
+    #function to hand an entry to the file, returns its sequence number for commit
+    def write(self, receipt_id, receipt, points):
+        line = encode_entry(receipt_id, receipt, points)
+        with self.lock:
+            self.file.write(line)
+            self.size += len(line)
+            self.written += 1
+            if self.fsync == "never":
+                self.file.flush() #hand it to the OS, durable against process crashes only
+            return self.written
+
+    #function to hand buffered entries to the OS, so other file descriptors can read them
+    def flush(self):
+        with self.lock:
+            self.file.flush()
+
+    #function to wait until the entry with this sequence number is as durable as the policy asks
+    def commit(self, sequence):
+        if self.fsync == "always":
+            self.sync(sequence)
+
+    #function to make every entry up to sequence durable (group commit)
+    #writers that queue up behind a running fsync find their entry already covered by it
+    def sync(self, sequence=None):
+        with self.sync_lock:
+            if sequence is not None and self.synced >= sequence:
+                return
+            with self.lock:
+                if self.closed:
+                    return
+                self.file.flush()
+                target = self.written
+            os.fsync(self.file.fileno())
+            self.synced = target
+
+    def sync_periodically(self):
+        while not self.stopped.wait(self.interval):
+            if self.synced < self.written:
+                self.sync()
+
+    #function to move the current log to another path and continue in a fresh, empty log
+    #a segment already at to_path (left by a snapshot that failed) is kept: the log is appended
+    #to it, never put in its place
+    def rotate(self, to_path):
+        with self.sync_lock, self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            if os.path.exists(to_path):
+                append_file(to_path, self.path)
+                os.remove(self.path) #a crash before this only replays the entries twice
+            else:
+                os.replace(self.path, to_path)
+            self.file = open(self.path, "a", encoding="utf-8", newline="\n")
+            self.written = self.synced = self.size = 0
+
+    def close(self):
+        if self.closed:
+            return
+        if self.fsync == "interval":
+            self.stopped.set()
+        if self.fsync != "never":
+            self.sync()
+        with self.lock:
+            self.closed = True
+            self.file.close()
+
+class DurableStore(ReceiptStore):
+    """ wraps a storage engine with a write-ahead log:
+    puts are logged before they are applied,
+    snapshot plus log are loaded on open """
+
+    def __init__(self, store, path, fsync="interval", interval_ms=10, snapshot_path=None, snapshot_seconds=None):
+        self.store = store
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.rotated_path = path + ".compacting" #log segment a snapshot in progress covers
+
+        #load the snapshot, then the segment of an interrupted snapshot, then the log
+        #replaying an entry twice just stores the same receipt again, so overlap is harmless
+        if snapshot_path:
+            for receipt_id, receipt, points in read_snapshot(snapshot_path):
+                store.put(as_key(receipt_id), receipt, points) #snapshots from before int keys hold strings
+        for log_path in (self.rotated_path, path):
+            for receipt_id, receipt, points in WriteAheadLog.replay(log_path):
+                store.put(receipt_id, receipt, points)
+        if os.path.exists(self.rotated_path):
+            self.fold_rotated_segment()
+
+        self.log = WriteAheadLog(path, fsync, interval_ms)
+        self.write_lock = threading.Lock() #keeps log order and store order the same
+        #puts wait for an fsync with the always policy, and for a snapshot copying the store
+        self.blocking_reads = store.blocking_reads
+        self.blocking_writes = fsync == "always" or bool(snapshot_path) or store.blocking_writes
+        self.snapshot_lock = threading.Lock()
+        self.closed = threading.Event()
+        if snapshot_path and snapshot_seconds:
+            self.snapshotter = threading.Thread(target=self.snapshot_periodically, args=(snapshot_seconds,),
+                                                name="receipt-snapshot", daemon=True)
+            self.snapshotter.start()
+
+    def put(self, receipt_id, receipt, points):
+        with self.write_lock:
+            sequence = self.log.write(receipt_id, receipt, points)
+            self.store.put(receipt_id, receipt, points)
+        self.log.commit(sequence) #fsync outside the lock so concurrent puts share it
+
+    def get(self, receipt_id):
+        return self.store.get(receipt_id)
+
+    def get_points(self, receipt_id):
+        return self.store.get_points(receipt_id)
+
+    def get_many(self, receipt_ids):
+        return self.store.get_many(receipt_ids)
+
+    def contains(self, receipt_id):
+        return self.store.contains(receipt_id)
+
+    def count(self):
+        return self.store.count()
+
+    def iterate(self):
+        return self.store.iterate()
+
+    #function to write every stored receipt to the snapshot and drop the log behind it
+    #returns the number of receipts in the snapshot
+    def snapshot(self):
+        if not self.snapshot_path:
+            raise ValueError("no snapshot path configured")
+        with self.snapshot_lock:
+            #capture the store and start a fresh log at the same instant, writers wait only for this
+            with self.write_lock:
+                entries = list(self.store.iterate())
+                self.log.rotate(self.rotated_path)
+            count = write_snapshot(self.snapshot_path, entries)
+            os.remove(self.rotated_path) #everything in it is in the snapshot now
+            return count
+
+    #function to put the segment of an interrupted snapshot back in front of the log, so the
+    #next snapshot's rotation cannot overwrite entries that are not in any snapshot yet
+    def fold_rotated_segment(self):
+        append_file(self.rotated_path, self.path)
+        os.replace(self.rotated_path, self.path)
+
+    #a failed snapshot (a full disk, say) is reported and tried again next time; its log segment
+    #stays in place meanwhile, so nothing is lost
+    def snapshot_periodically(self, seconds):
+        while not self.closed.wait(seconds):
+            if self.log.written or os.path.exists(self.rotated_path):
+                try:
+                    self.snapshot()
+                except Exception:
+                    logger.exception("snapshot to %s failed", self.snapshot_path)
+
+    def close(self):
+        self.closed.set()
+        with self.snapshot_lock: #let a running snapshot finish first
+            self.log.close()
+        self.store.close()